@@ -24,6 +24,7 @@ from dmt.tk.field import Field, lazyproperty, WithFields
 from dmt.tk.utils import Nothing
 from dmt.tk.collections.data import make_hashable
 from . import index_tree
+from .adaptive import AdaptiveSampling
 
 class Parameters(WithFields):
     """
@@ -0,0 +1,143 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Sample a measurement for a parameter set until it is precise enough.
+"""
+
+import numpy as np
+import pandas
+from dmt.tk.field import Field, WithFields
+from . import index_tree
+
+
+class AdaptiveSampling(WithFields):
+    """
+    Draw samples of a measurement in rounds, tracking the standard error of
+    their mean, and stop once the relative precision (standard error over
+    the absolute value of the mean) reaches a target, or the budget of
+    samples is spent.
+    """
+    relative_precision = Field(
+        """
+        Target relative precision of the mean of the sampled values.
+        """,
+        __default_value__=0.05)
+    size_round = Field(
+        """
+        Number of samples to draw in each round.
+        """,
+        __default_value__=5)
+    size_minimum = Field(
+        """
+        Minimum number of samples to draw before checking the precision.
+        """,
+        __default_value__=5)
+    budget = Field(
+        """
+        Maximum number of samples to draw for a parameter set.
+        """,
+        __default_value__=100)
+
+    @staticmethod
+    def summarize(value):
+        """
+        Number that summarizes a single sample of a measurement,
+        which may be a number, or a collection of numbers.
+        """
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            values = np.asarray(value, dtype=np.float64).ravel()
+            return np.nanmean(values) if values.shape[0] > 0 else np.nan
+
+    @staticmethod
+    def get_precision(summaries):
+        """
+        Mean, its standard error, and relative precision of summaries.
+        """
+        summaries = np.asarray(summaries, dtype=np.float64)
+        summaries = summaries[~np.isnan(summaries)]
+        number = summaries.shape[0]
+        mean = np.mean(summaries) if number > 0 else np.nan
+        standard_error =\
+            np.std(summaries, ddof=1) / np.sqrt(number)\
+            if number > 1 else np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = standard_error / np.abs(mean)
+        if standard_error == 0.:
+            relative = 0.
+        return dict(
+            number_samples=number,
+            mean=mean,
+            standard_error=standard_error,
+            relative_precision=relative)
+
+    def sample(self, measure, parameter_set, budget=None):
+        """
+        Sample `measure(**parameter_set)` until precise enough.
+
+        Arguments
+        -------------
+        measure :: A callable that makes a single measurement for keyword
+        ~          arguments in `parameter_set`.
+        parameter_set :: Mapping of parameter label to value.
+        budget :: Overrides `self.budget`.
+
+        Returns
+        -------------
+        A tuple (list of sampled values, dict describing the achieved precision)
+        """
+        budget = budget if budget is not None else self.budget
+        values = []
+        summaries = []
+        size_next = min(self.size_minimum, budget)
+        while size_next > 0:
+            for _ in range(size_next):
+                value = measure(**parameter_set)
+                values.append(value)
+                summaries.append(self.summarize(value))
+            precision = self.get_precision(summaries)
+            if precision["relative_precision"] <= self.relative_precision:
+                break
+            size_next = min(self.size_round, budget - len(values))
+        precision = self.get_precision(summaries)
+        precision["converged"] =\
+            bool(precision["relative_precision"] <= self.relative_precision)
+        return values, precision
+
+    def collect(self, measure, parameter_sets, budget=None):
+        """
+        Sample a measurement for each of a sequence of parameter sets.
+
+        Returns
+        -------------
+        A tuple (list of (parameter_set, value), `pandas.DataFrame` of
+        the precision achieved for each parameter set)
+        """
+        samples = []
+        precisions = []
+        for parameter_set in parameter_sets:
+            values, precision =\
+                self.sample(measure, parameter_set, budget=budget)
+            samples.extend((parameter_set, value) for value in values)
+            precisions.append(precision)
+        index =\
+            pandas.MultiIndex.from_frame(
+                pandas.DataFrame([
+                    index_tree.as_unnested_dict(parameter_set)
+                    for parameter_set in parameter_sets]))\
+            if len(parameter_sets) > 0 else None
+        return samples, pandas.DataFrame(precisions, index=index)
@@ -0,0 +1,73 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test adaptive sampling.
+"""
+
+import numpy as np
+import pandas as pd
+from ..adaptive import AdaptiveSampling
+
+
+def test_adaptive_sampling_stops_when_precise():
+    """
+    Low variance measurements should stop early, high variance measurements
+    should spend the whole budget, and the achieved precision should be
+    reported for each parameter set.
+    """
+    random = np.random.RandomState(42)
+
+    def measure(region, spread):
+        return 10. + spread * random.standard_normal()
+
+    adaptive_sampling =\
+        AdaptiveSampling(
+            relative_precision=0.01,
+            size_minimum=5,
+            size_round=5,
+            budget=50)
+    parameter_sets = [
+        dict(region="SSp", spread=0.01),
+        dict(region="SSp", spread=100.)]
+    samples, precision =\
+        adaptive_sampling.collect(measure, parameter_sets)
+
+    assert isinstance(precision, pd.DataFrame)
+    assert list(precision.index.names) == ["region", "spread"]
+    narrow = precision.loc[("SSp", 0.01)]
+    wide = precision.loc[("SSp", 100.)]
+    assert narrow.number_samples == 5
+    assert narrow.converged
+    assert narrow.relative_precision <= 0.01
+    assert wide.number_samples == 50
+    assert not wide.converged
+    assert len(samples) == 55
+    assert all(p is parameter_sets[0] for p, _ in samples[:5])
+
+
+def test_adaptive_sampling_of_collections():
+    """
+    Measurements that are collections of values should be summarized
+    by their mean.
+    """
+    values, precision =\
+        AdaptiveSampling(budget=7, size_minimum=3, size_round=3)\
+        .sample(lambda: [1., 2., np.nan, 3.], {})
+
+    assert len(values) == 3
+    assert precision["mean"] == 2.
+    assert precision["standard_error"] == 0.
+    assert precision["converged"]
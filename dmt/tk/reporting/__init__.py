@@ -56,6 +56,12 @@ class Report(WithFields):
         with a properly annotated index.
         """,
         __default_value__=NA)
+    precision = Field(
+        """
+        Precision achieved by sampling the measurement, for each of its
+        parameter sets, as a dataframe indexed by parameter set.
+        """,
+        __default_value__=NA)
     abstract = Field(
         """
         Provide an abstract for the report.
@@ -361,6 +367,13 @@ class Reporter(WithFields):
                     "{}.csv".format(report.label)))
         except AttributeError:
             pass
+        try:
+            self._flattened_columns(report.precision.reset_index()).to_csv(
+                os.path.join(
+                    output_folder,
+                    "{}_precision.csv".format(report.label)))
+        except AttributeError:
+            pass
 
 
 
@@ -83,6 +83,15 @@ class StructuredAnalysis(
         ~           to its report.
         """,
         __default_value__=terminology.processing_methodology.batch)
+    adaptive_sampling = Field(
+        """
+        An `AdaptiveSampling` instance, to sample each parameter set in rounds
+        until the mean measurement is precise enough, instead of drawing a
+        fixed number of samples. `self.sample_size` will be used as the
+        budget of samples for each parameter set. Only applies to random
+        sampling, with batch processing.
+        """,
+        __required__=False)
     phenomenon = Field(
         """
         An object providing the phenomenon analyzed.
@@ -247,6 +256,58 @@ class StructuredAnalysis(
                     circuit_model,
                     sample_size=self.sample_size if using_random_samples else 1)
 
+    @property
+    def _using_adaptive_sampling(self):
+        """..."""
+        try:
+            adaptive_sampling = self.adaptive_sampling
+        except AttributeError:
+            return False
+        return\
+            adaptive_sampling is not None and\
+            self.sampling_methodology == terminology.sampling_methodology.random
+
+    def _check_processing_methodology(self):
+        """
+        Adaptive sampling is available only with batch processing.
+        """
+        if self._using_adaptive_sampling\
+           and self.processing_methodology ==\
+               terminology.processing_methodology.serial:
+            raise ValueError(
+                """
+                Adaptive sampling cannot be used with processing methodology
+                {}. Use batch processing, or remove adaptive sampling.
+                """.format(self.processing_methodology))
+
+    def sample_adaptively(self,
+            adapter, circuit_model,
+            value_measurement,
+            *args, **kwargs):
+        """
+        Sample the measurement for each parameter set until its mean reaches
+        the precision targeted by `self.adaptive_sampling`, or the budget of
+        `self.sample_size` samples is spent.
+
+        Returns
+        -----------
+        A tuple (list of (parameter set, measured value),
+        ~        `pandas.DataFrame` of achieved precision by parameter set)
+        """
+        def _measure(**parameter_set):
+            return\
+                value_measurement(
+                    circuit_model,
+                    sampling_methodology=self.sampling_methodology,
+                    **parameter_set, **kwargs)
+
+        return\
+            self.adaptive_sampling.collect(
+                _measure,
+                self.measurement_parameters(
+                    adapter, circuit_model, sample_size=1),
+                budget=self.sample_size)
+
     def collect_serially(self,
             adapter, circuit_model, 
             value_measurement, 
@@ -254,6 +315,7 @@ class StructuredAnalysis(
         """
         Compute the measurement, on parameter set at a time...
         """
+        self._check_processing_methodology()
         for p in tqdm(self.parameter_sets(adapter, circuit_model)):
             measured_value =\
                 value_measurement(
@@ -314,19 +376,26 @@ class StructuredAnalysis(
         ~                  for the measurement to be collected.
         """
         v = value_measurement
-        measurement =\
-            self.measurement_collection(
+        if self._using_adaptive_sampling:
+            samples, precision =\
+                self.sample_adaptively(
+                    adapter, circuit_model, value_measurement, **kwargs)
+        else:
+            samples =(
                 (p, v(circuit_model,
                       sampling_methodology=self.sampling_methodology,
                       **p, **kwargs))
-                for p in tqdm(self.parameter_sets(adapter, circuit_model))
-            ).rename(
+                for p in tqdm(self.parameter_sets(adapter, circuit_model)))
+            precision = None
+        measurement =\
+            self.measurement_collection(samples).rename(
                 columns={"value": self.phenomenon.label})
         dataset =\
             adapter.get_label(circuit_model)
         return\
             Record(
                 data=pd.concat([measurement], keys=[dataset], names=["dataset"]),
+                precision=precision,
                 method=value_measurement.__method__)
 
     @lazyfield
@@ -431,9 +500,15 @@ class StructuredAnalysis(
             author=Author.anonymous,
             figures=None,
             reference_data=None,
-            provenance_circuit={}):
+            provenance_circuit={},
+            precision=None):
         """
         Get a report for the given `measurement`.
+
+        Arguments
+        ------------
+        precision :: `pandas.DataFrame` of the precision achieved by adaptive
+        ~            sampling of the measurement, for each parameter set.
         """
         reference_data =\
             reference_data if reference_data is not None\
@@ -464,7 +539,8 @@ class StructuredAnalysis(
             discussion=self.discussion(provenance_circuit)["content"],
             conclusion=self.conclusion(provenance_circuit)["content"],
             references=reference_citations,
-            provenance_model=provenance_circuit)
+            provenance_model=provenance_circuit,
+            precision=precision if precision is not None else NA)
 
     @interfacemethod
     def get_provenance(adapter, model, **kwargs):
@@ -519,6 +595,7 @@ class StructuredAnalysis(
                     caption=measurement.method)
 
         if self.processing_methodology == terminology.processing_methodology.serial:
+            self._check_processing_methodology()
             return (
                 Record(
                     label=_get_label(measurement),
@@ -545,7 +622,8 @@ class StructuredAnalysis(
                 author=author,
                 figures=get_figures(measurement),
                 reference_data=reference_data,
-                provenance_circuit=provenance_circuit)
+                provenance_circuit=provenance_circuit,
+                precision=measurement.precision)
 
         try:
             return self.reporter.post(report)
@@ -0,0 +1,111 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published 
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but 
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY 
+# or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+#  General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public License 
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test sampling the measurements of a circuit analysis adaptively.
+"""
+
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from dmt.tk.phenomenon import Phenomenon
+from dmt.tk.parameters import Parameters, AdaptiveSampling
+from dmt.tk.reporting import Reporter
+from neuro_dmt import terminology
+from . import StructuredAnalysis
+
+
+class _Adapter:
+    """
+    Adapter that only labels the circuit model.
+    """
+    def get_label(self, circuit_model):
+        return "mock_circuit"
+
+
+def _analysis(measured, **kwargs):
+    """
+    Analysis that samples a measurement that is precise in layer 1,
+    and noisy in layer 2.
+    """
+    random = np.random.RandomState(0)
+
+    def _sample_measurement(adapter, circuit_model, layer=None, **kwargs):
+        measured.append(layer)
+        return 10. * layer + random.normal(0., 0.01 if layer == 1 else 5.)
+
+    return StructuredAnalysis(
+        phenomenon=Phenomenon(
+            "Cell Density",
+            "Count of cells in a unit volume.",
+            group="composition"),
+        measurement_parameters=Parameters(pd.DataFrame({"layer": [1, 2]})),
+        sample_measurement=_sample_measurement,
+        sample_size=30,
+        adaptive_sampling=AdaptiveSampling(
+            relative_precision=0.01, size_minimum=5, size_round=5),
+        introduction="Cell density by layer.",
+        methods="Cells were counted in random boxes.",
+        results="Cell density by layer.",
+        discussion="None.",
+        conclusion="None.",
+        **kwargs)
+
+
+def test_collect_adaptively(tmpdir):
+    """
+    A precise measurement should be sampled less than a noisy one, and
+    the precision achieved should be saved next to the measurement.
+    """
+    measured = []
+    analysis = _analysis(measured)
+    adapter = _Adapter()
+    measurement =\
+        analysis.collect(
+            adapter, None, analysis.get_measurement_method(adapter))
+
+    assert measured.count(1) == 5
+    assert measured.count(2) == 30
+    assert measurement.data.shape[0] == 35
+    assert list(measurement.precision.index.get_level_values("layer")) == [1, 2]
+    assert list(measurement.precision.converged) == [True, False]
+    assert list(measurement.precision.number_samples) == [5, 30]
+
+    report =\
+        analysis.get_report(
+            analysis.label, measurement.data,
+            figures={},
+            precision=measurement.precision)
+    Reporter()._save_measurement(report, str(tmpdir))
+    saved =\
+        pd.read_csv(
+            os.path.join(str(tmpdir), "{}_precision.csv".format(report.label)),
+            index_col=0)
+    assert list(saved.number_samples) == [5, 30]
+
+
+def test_no_adaptive_serial_processing():
+    """
+    Adaptive sampling should not be ignored with serial processing.
+    """
+    analysis =\
+        _analysis(
+            [],
+            processing_methodology=terminology.processing_methodology.serial)
+    adapter = _Adapter()
+    with pytest.raises(ValueError):
+        next(analysis.collect_serially(
+            adapter, None, analysis.get_measurement_method(adapter)))
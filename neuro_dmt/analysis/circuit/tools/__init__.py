@@ -19,5 +19,15 @@ Tools to analyze circuits.
 """
 
 from .query import QueryDB, SpatialQueryData, PathwayQuery
-from .pathway_measurement import Connectivity, Pandamonad, PathwayMeasurement
+from .accumulator import SummaryAccumulator
+from .columnar import CellTypeCodes
+from .spatial import SomaPositionGrid
+from .checkpoint import CheckpointStore
+from .connectome import ConnectomeMatrices
+from .synapses import summarize_by_pathway
+from .pathway_measurement import\
+    Connectivity,\
+    GroupByEngine,\
+    Pandamonad,\
+    PathwayMeasurement
     
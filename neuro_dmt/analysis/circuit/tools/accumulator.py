@@ -0,0 +1,284 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Accumulate sufficient statistics of a stream of dataframes.
+"""
+
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, WithFields
+from dmt.tk.journal import Logger
+
+LOGGER = Logger(client=__file__)
+
+
+class SummaryAccumulator(WithFields):
+    """
+    Count, sum, sum of squares, minimum and maximum of values,
+    grouped by an index, accumulated over a stream of dataframes.
+
+    Statistics are held in arrays with a row for each group, pre-sized and
+    grown geometrically as new groups are seen. Two accumulators can be
+    merged, so that a stream may be accumulated in pieces (batches, or
+    worker processes) and summarized in one final step.
+    """
+    index = Field(
+        """
+        List of column names / index levels that will be grouped together.
+        """)
+    variables = Field(
+        """
+        List of the variables (columns) to accumulate.
+        If not provided, all the columns of the first dataframe accumulated
+        will be used.
+        """,
+        __required__=False)
+    capacity = Field(
+        """
+        Initial number of groups to allocate space for.
+        """,
+        __default_value__=64)
+
+    #summaries that can be computed from the accumulated statistics.
+    mergeable_summaries = (
+        "count", "sum", "mean", "std", "var", "min", "max")
+
+    @property
+    def groups(self):
+        """
+        Index of the groups seen so far, in the order they were seen.
+        """
+        try:
+            return self._groups
+        except AttributeError:
+            return self._make_index([[] for _ in self.index])
+
+    def _make_index(self, arrays):
+        """..."""
+        if len(self.index) == 1:
+            return pd.Index(arrays[0], name=self.index[0])
+        return pd.MultiIndex.from_arrays(arrays, names=self.index)
+
+    def _allocate(self, number_variables):
+        """..."""
+        shape = (self.capacity, number_variables)
+        self._groups = self._make_index([[] for _ in self.index])
+        self._count = np.zeros(shape, dtype=np.int64)
+        self._sum = np.zeros(shape)
+        self._sum_squares = np.zeros(shape)
+        self._min = np.full(shape, np.inf)
+        self._max = np.full(shape, -np.inf)
+
+    def _grow(self, number_groups):
+        """
+        Make space for at least `number_groups` groups.
+        """
+        if number_groups <= self._count.shape[0]:
+            return
+        capacity = self._count.shape[0]
+        while capacity < number_groups:
+            capacity *= 2
+
+        def _grown(array, fill_value):
+            grown = np.full((capacity, array.shape[1]), fill_value, array.dtype)
+            grown[:array.shape[0]] = array
+            return grown
+
+        self._count = _grown(self._count, 0)
+        self._sum = _grown(self._sum, 0.)
+        self._sum_squares = _grown(self._sum_squares, 0.)
+        self._min = _grown(self._min, np.inf)
+        self._max = _grown(self._max, -np.inf)
+
+    def _get_slots(self, keys):
+        """
+        Positions of `keys` in the accumulated arrays.
+        Keys not seen before will be added.
+        """
+        slots = self._groups.get_indexer(keys)
+        unseen = slots < 0
+        if np.any(unseen):
+            new_keys = keys[unseen].unique()
+            self._groups = self._groups.append(new_keys)
+            self._grow(len(self.groups))
+            slots[unseen] = self._groups.get_indexer(keys[unseen])
+        return slots
+
+    def _get_keys(self, dataframe):
+        """
+        Group keys of each row of a dataframe.
+        """
+        def _level(name):
+            if name in dataframe.index.names:
+                return dataframe.index.get_level_values(name)
+            return dataframe[name].to_numpy()
+        return self._make_index([_level(name) for name in self.index])
+
+    def _initialized(self, dataframe):
+        """..."""
+        if not hasattr(self, "_count"):
+            try:
+                variables = self.variables
+            except AttributeError:
+                variables =[
+                    column for column in dataframe.columns
+                    if column not in self.index]
+                self.variables = variables
+            self._allocate(len(variables))
+        return self
+
+    def update(self, dataframe):
+        """
+        Accumulate values in a dataframe.
+        """
+        if dataframe is None or dataframe.shape[0] == 0:
+            return self
+        if isinstance(dataframe, pd.Series):
+            dataframe = dataframe.to_frame()
+        self._initialized(dataframe)
+
+        slots = self._get_slots(self._get_keys(dataframe))
+        values = dataframe[self.variables].to_numpy(np.float64)
+        size = self._count.shape[0]
+        for j in range(values.shape[1]):
+            valid = ~np.isnan(values[:, j])
+            slots_valid = slots[valid]
+            values_valid = values[valid, j]
+            self._count[:, j] +=\
+                np.bincount(slots_valid, minlength=size)
+            self._sum[:, j] +=\
+                np.bincount(slots_valid, weights=values_valid, minlength=size)
+            self._sum_squares[:, j] +=\
+                np.bincount(
+                    slots_valid, weights=values_valid ** 2, minlength=size)
+            np.minimum.at(self._min[:, j], slots_valid, values_valid)
+            np.maximum.at(self._max[:, j], slots_valid, values_valid)
+        return self
+
+    def accumulate(self, dataframes):
+        """
+        Accumulate a stream of dataframes.
+        """
+        for dataframe in dataframes:
+            self.update(dataframe)
+        return self
+
+    def merge(self, other):
+        """
+        Merge statistics accumulated by another accumulator into this one.
+        """
+        if not hasattr(other, "_count"):
+            return self
+        if not hasattr(self, "_count"):
+            self.variables = list(other.variables)
+            self._allocate(len(self.variables))
+        if list(other.variables) != list(self.variables):
+            raise ValueError(
+                """
+                Cannot merge accumulators of different variables:
+                \t{} and {}
+                """.format(self.variables, other.variables))
+        number_other = len(other.groups)
+        slots = self._get_slots(other.groups)
+        self._count[slots] += other._count[:number_other]
+        self._sum[slots] += other._sum[:number_other]
+        self._sum_squares[slots] += other._sum_squares[:number_other]
+        self._min[slots] =\
+            np.minimum(self._min[slots], other._min[:number_other])
+        self._max[slots] =\
+            np.maximum(self._max[slots], other._max[:number_other])
+        return self
+
+    def _statistic(self, summary):
+        """
+        Values of a summary, for each group and variable.
+        """
+        number_groups = len(self.groups)
+        count = self._count[:number_groups].astype(np.float64)
+        total = self._sum[:number_groups]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if summary == "count":
+                return self._count[:number_groups]
+            if summary == "sum":
+                return total
+            if summary == "mean":
+                return np.where(count > 0, total / count, np.nan)
+            if summary in ("var", "std"):
+                deviation_squares =\
+                    np.maximum(
+                        self._sum_squares[:number_groups]
+                        - total * total / count,
+                        0.)
+                variance =\
+                    np.where(count > 1, deviation_squares / (count - 1), np.nan)
+                return variance if summary == "var" else np.sqrt(variance)
+            if summary == "min":
+                return np.where(count > 0, self._min[:number_groups], np.nan)
+            if summary == "max":
+                return np.where(count > 0, self._max[:number_groups], np.nan)
+        raise ValueError(
+            """
+            Summary {} cannot be computed from accumulated statistics.
+            Available: {}
+            """.format(summary, self.mergeable_summaries))
+
+    def summary(self, summaries):
+        """
+        Summarize the accumulated statistics.
+
+        Arguments
+        -------------
+        summaries :: A single summary name or a list of summary names.
+
+        Returns
+        -------------
+        `pandas.DataFrame` indexed by groups, sorted, with columns
+        organized as `pandas.DataFrame.groupby(index).agg(summaries)`.
+        Summaries that cannot be computed from the accumulated statistics
+        (for example 'median', or 'mad') will be dropped with a warning.
+        """
+        if not hasattr(self, "_count"):
+            return None
+
+        if isinstance(summaries, str):
+            return pd.DataFrame(
+                self._statistic(summaries),
+                columns=self.variables,
+                index=self.groups
+            ).sort_index()
+
+        mergeable =[
+            summary for summary in summaries
+            if summary in self.mergeable_summaries]
+        if len(mergeable) < len(summaries):
+            LOGGER.warn(
+                LOGGER.get_source_info(),
+                """
+                Summaries {} cannot be computed from accumulated statistics,
+                and will be dropped.
+                """.format([
+                    summary for summary in summaries
+                    if summary not in mergeable]))
+        statistics ={
+            summary: self._statistic(summary)
+            for summary in mergeable}
+        return pd.DataFrame(
+            {(variable, summary): statistics[summary][:, j]
+             for j, variable in enumerate(self.variables)
+             for summary in mergeable},
+            index=self.groups
+        ).sort_index()
@@ -0,0 +1,207 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Checkpoint batches of a pathway measurement to disk,
+so that an interrupted run can be resumed.
+"""
+
+import os
+import json
+import hashlib
+import inspect
+from enum import Enum
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, WithFields
+
+
+def fingerprint(value):
+    """
+    A string that identifies `value`, and that remains the same when the
+    value is re-created in another process.
+    Callables are identified by their source code, and arrays by their
+    contents. Values that cannot be identified this way, like objects whose
+    `repr` contains a memory address, raise a `TypeError`.
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return repr(value)
+    if isinstance(value, np.generic):
+        return fingerprint(value.item())
+    if isinstance(value, float):
+        return "nan" if np.isnan(value) else repr(value)
+    if isinstance(value, Enum):
+        return str(value)
+    if isinstance(value, (np.ndarray, pd.Index)):
+        array = np.ascontiguousarray(np.asarray(value))
+        if array.dtype == object:
+            return fingerprint(array.tolist())
+        return "{}{}:{}".format(
+            array.dtype, array.shape, hashlib.sha1(array.tobytes()).hexdigest())
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return "{}({}, {})".format(
+            value.__class__.__name__,
+            fingerprint(value.index),
+            fingerprint(value.to_numpy()))
+    if isinstance(value, WithFields):
+        return "{}{}".format(
+            value.__class__.__name__, fingerprint(value.field_dict))
+    if isinstance(value, Mapping):
+        return "{{{}}}".format(", ".join(sorted(
+            "{}: {}".format(fingerprint(key), fingerprint(item))
+            for key, item in value.items())))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [fingerprint(item) for item in value]
+        if isinstance(value, (set, frozenset)):
+            items = sorted(items)
+        return "{}({})".format(value.__class__.__name__, ", ".join(items))
+    if callable(value):
+        try:
+            return inspect.getsource(value).strip()
+        except (OSError, TypeError):
+            try:
+                return "{}.{}".format(value.__module__, value.__qualname__)
+            except AttributeError:
+                return value.__class__.__name__
+    raise TypeError(
+        """
+        No fingerprint that would remain the same in another process,
+        for a value of type {}: {}
+        """.format(type(value).__name__, value))
+
+
+class CheckpointStore(WithFields):
+    """
+    Store results of measuring batches in a directory, one set of files
+    per batch, under a key that identifies the measurement.
+    A batch's values are saved column by column, in `.npz` archives, along
+    with the names and types required to reconstruct the dataframe.
+    """
+    path = Field(
+        """
+        Path to the root directory of checkpoints.
+        """)
+
+    @staticmethod
+    def get_key(*identifiers):
+        """
+        Hash of the fingerprints of identifiers.
+        """
+        return\
+            hashlib.sha1(
+                "\n".join(
+                    fingerprint(identifier) for identifier in identifiers
+                ).encode("utf-8")
+            ).hexdigest()
+
+    def get_path(self, key):
+        """
+        Directory to checkpoint a measurement with `key`.
+        """
+        path = os.path.join(self.path, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def _path_batch(path, index_batch):
+        """..."""
+        return os.path.join(path, "batch_{:08d}".format(index_batch))
+
+    def get_completed(self, key):
+        """
+        Indices of the batches that have been saved under `key`.
+        """
+        path = self.get_path(key)
+        return {
+            int(name.split('_')[1].split('.')[0])
+            for name in os.listdir(path)
+            if name.startswith("batch_") and name.endswith(".json")
+            and not name.endswith(".tmp.json")}
+
+    def save(self, key, index_batch, measurement):
+        """
+        Save the measurement of a batch.
+        The file that marks a batch as completed is written last,
+        so that a batch interrupted while being saved will be measured again.
+        """
+        path_batch = self._path_batch(self.get_path(key), index_batch)
+        if measurement is None:
+            meta = {"type": "None"}
+        else:
+            is_series = isinstance(measurement, pd.Series)
+            dataframe = measurement.to_frame() if is_series else measurement
+            index = dataframe.index
+            columns =\
+                [measurement.name] if is_series else list(dataframe.columns)
+            arrays = {
+                "index_{}".format(level): index.get_level_values(level).values
+                for level in range(index.nlevels)}
+            arrays.update({
+                "column_{}".format(position): dataframe.iloc[:, position].values
+                for position in range(len(columns))})
+            np.savez("{}.tmp.npz".format(path_batch), **arrays)
+            os.replace("{}.tmp.npz".format(path_batch), "{}.npz".format(path_batch))
+            meta = {
+                "type": "Series" if is_series else "DataFrame",
+                "index": [_encoded(name) for name in index.names],
+                "columns": [_encoded(column) for column in columns]}
+        with open("{}.tmp.json".format(path_batch), 'w') as file_json:
+            json.dump(meta, file_json)
+        os.replace("{}.tmp.json".format(path_batch), "{}.json".format(path_batch))
+        return measurement
+
+    def load(self, key, index_batch):
+        """
+        Load the measurement of a batch.
+        """
+        path_batch = self._path_batch(self.get_path(key), index_batch)
+        with open("{}.json".format(path_batch), 'r') as file_json:
+            meta = json.load(file_json)
+        if meta["type"] == "None":
+            return None
+
+        with np.load("{}.npz".format(path_batch), allow_pickle=True) as arrays:
+            names = [_decoded(name) for name in meta["index"]]
+            levels = [
+                arrays["index_{}".format(level)] for level in range(len(names))]
+            index =\
+                pd.Index(levels[0], name=names[0]) if len(names) == 1 else\
+                pd.MultiIndex.from_arrays(levels, names=names)
+            dataframe =\
+                pd.DataFrame(
+                    {position: arrays["column_{}".format(position)]
+                     for position in range(len(meta["columns"]))},
+                    index=index)
+        dataframe.columns = [_decoded(column) for column in meta["columns"]]
+        return\
+            dataframe.iloc[:, 0] if meta["type"] == "Series" else dataframe
+
+
+def _encoded(name):
+    """
+    Encode an index or column name to JSON, preserving tuples.
+    """
+    if isinstance(name, tuple):
+        return {"tuple": [_encoded(item) for item in name]}
+    return name
+
+
+def _decoded(name):
+    """..."""
+    if isinstance(name, dict):
+        return tuple(_decoded(item) for item in name["tuple"])
+    return name
@@ -0,0 +1,591 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Columnar (array based) tools to group and sum pathway measurements.
+
+Instead of attaching measured values to a copy of the cell table and grouping
+by string valued cell properties, we encode cell-type specifiers as integers,
+gather them by gid, and sum with `np.bincount`.
+"""
+
+import os
+import json
+import weakref
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields
+from neuro_dmt import terminology
+from neuro_dmt.utils.geometry.distance import bin_soma_distances
+
+X = terminology.bluebrain.cell.x
+Y = terminology.bluebrain.cell.y
+Z = terminology.bluebrain.cell.z
+XYZ = [X, Y, Z]
+
+#Cell-type codes shared by all users of a circuit:
+#circuit_model --> Mapping tuple(specifiers) --> CellTypeCodes
+_CACHE_CIRCUIT = weakref.WeakKeyDictionary()
+
+#Cell tables shared with a (worker) process:
+#circuit_model --> CellTable
+_CACHE_CELLS = weakref.WeakKeyDictionary()
+
+
+class CellTypeCodes(WithFields):
+    """
+    Cell-type specifiers of all the cells in a circuit, encoded as integers
+    and stored in dense arrays indexed by cell gid.
+    Codes follow the sorted order of values, so that sorting by codes is
+    the same as sorting by values.
+    """
+    specifiers = Field(
+        """
+        List of cell properties that define a cell type.
+        """,
+        __examples__=[["mtype"], ["layer", "mtype"]])
+    codes = Field(
+        """
+        Mapping cell-type specifier --> `np.ndarray<int32>` indexed by gid.
+        Gids that are not in the circuit are assigned code -1,
+        and cells with a missing value code -2.
+        """)
+    values = Field(
+        """
+        Mapping cell-type specifier --> `np.ndarray` of sorted unique values,
+        to decode the codes.
+        """)
+    positions = Field(
+        """
+        `np.ndarray<float>` of shape (number gids, 3) providing soma positions,
+        indexed by gid.
+        """,
+        __required__=False)
+
+    @classmethod
+    def from_cells(cls, cells, specifiers, positions=None):
+        """
+        Encode cells.
+
+        Arguments
+        --------------
+        cells :: pandas.DataFrame of cells indexed by gid
+        specifiers :: list of cell properties to encode
+        positions :: pandas.DataFrame with soma positions of `cells`
+        """
+        gids = cells.index.to_numpy(np.int64)
+        size = gids.max() + 1 if gids.shape[0] > 0 else 0
+
+        codes = {}
+        values = {}
+        for specifier in specifiers:
+            inverse, unique_values =\
+                pd.factorize(cells[specifier], sort=True)
+            dense = np.full(size, -1, dtype=np.int32)
+            dense[gids] = np.where(inverse < 0, -2, inverse)
+            codes[specifier] = dense
+            values[specifier] = np.asarray(unique_values)
+
+        if positions is not None:
+            dense_positions = np.full((size, 3), np.nan)
+            dense_positions[gids] = positions[XYZ].to_numpy(np.float64)
+        else:
+            dense_positions = None
+
+        return cls(
+            specifiers=list(specifiers),
+            codes=codes,
+            values=values,
+            positions=dense_positions)
+
+    def save(self, path):
+        """
+        Save arrays to `.npy` files in the directory at `path`,
+        so that they can be loaded memory-mapped (by another process).
+        """
+        os.makedirs(path, exist_ok=True)
+        for specifier in self.specifiers:
+            np.save(
+                os.path.join(path, "codes_{}.npy".format(specifier)),
+                self.codes[specifier])
+            np.save(
+                os.path.join(path, "values_{}.npy".format(specifier)),
+                self.values[specifier],
+                allow_pickle=True)
+        try:
+            np.save(os.path.join(path, "positions.npy"), self.positions)
+        except AttributeError:
+            pass
+        with open(os.path.join(path, "specifiers.json"), 'w') as file_json:
+            json.dump(self.specifiers, file_json)
+        return path
+
+    @classmethod
+    def for_circuit(cls, circuit_model, adapter, specifiers):
+        """
+        Cell-type codes and soma positions of all the cells in a circuit,
+        computed only once per circuit and set of specifiers, and shared
+        by all callers.
+        """
+        cache = _CACHE_CIRCUIT.setdefault(circuit_model, {})
+        key = tuple(specifiers)
+        if key not in cache:
+            cells =\
+                adapter.get_cells(
+                    circuit_model,
+                    properties=list(specifiers) + [
+                        axis for axis in XYZ if axis not in specifiers])
+            cache[key] =\
+                cls.from_cells(
+                    cells,
+                    specifiers,
+                    positions=adapter.get_soma_positions(circuit_model, cells))
+        return cache[key]
+
+    def cache_for(self, circuit_model):
+        """
+        Share these codes as the cell-type codes of a circuit.
+        """
+        _CACHE_CIRCUIT.setdefault(
+            circuit_model, {}
+        )[tuple(self.specifiers)] = self
+        return self
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load arrays saved at `path`, memory-mapping the gid indexed arrays.
+        """
+        with open(os.path.join(path, "specifiers.json"), 'r') as file_json:
+            specifiers = json.load(file_json)
+        path_positions = os.path.join(path, "positions.npy")
+        return cls(
+            specifiers=specifiers,
+            codes={
+                specifier: np.load(
+                    os.path.join(path, "codes_{}.npy".format(specifier)),
+                    mmap_mode=mmap_mode)
+                for specifier in specifiers},
+            values={
+                specifier: np.load(
+                    os.path.join(path, "values_{}.npy".format(specifier)),
+                    allow_pickle=True)
+                for specifier in specifiers},
+            positions=(
+                np.load(path_positions, mmap_mode=mmap_mode)
+                if os.path.exists(path_positions) else None))
+
+    @lazyfield
+    def number_gids(self):
+        """
+        Length of the gid indexed arrays.
+        """
+        if self.specifiers:
+            return self.codes[self.specifiers[0]].shape[0]
+        try:
+            return self.positions.shape[0]
+        except AttributeError:
+            return 0
+
+    def get_codes(self, gids):
+        """
+        Codes for each specifier of the cells with given gids.
+
+        Returns
+        -----------
+        A list of `np.ndarray<int32>`, one for each specifier, with code -1
+        for a missing value, as in the codes of a `pandas.MultiIndex`.
+        """
+        gids = np.asarray(gids, dtype=np.int64)
+        return [
+            np.maximum(self.codes[specifier][gids], -1)
+            for specifier in self.specifiers]
+
+    def is_encoded(self, gids):
+        """
+        Boolean mask of the `gids` of cells that have been encoded,
+        even if with a missing value.
+        """
+        gids = np.asarray(gids, dtype=np.int64)
+        encoded = np.logical_and(gids >= 0, gids < self.number_gids)
+        for specifier in self.specifiers:
+            encoded[encoded] = self.codes[specifier][gids[encoded]] != -1
+        return encoded
+
+    def is_known(self, gids):
+        """
+        Boolean mask of the `gids` that have been encoded,
+        with a value for each specifier.
+        """
+        gids = np.asarray(gids, dtype=np.int64)
+        known = np.logical_and(gids >= 0, gids < self.number_gids)
+        for specifier in self.specifiers:
+            known[known] = self.codes[specifier][gids[known]] >= 0
+        return known
+
+    def decode(self, specifier, codes):
+        """
+        Values of `specifier` for given codes.
+        """
+        return self.values[specifier][codes]
+
+    def get_soma_distances(self, gids_from, gids_to):
+        """
+        Distance between somas of cell pairs `(gids_from[i], gids_to[i])`.
+        """
+        try:
+            positions = self.positions
+        except AttributeError:
+            raise AttributeError(
+                "{} instance was created without soma positions."\
+                .format(self.__class__.__name__))
+        delta =\
+            positions[np.asarray(gids_to, dtype=np.int64)]\
+            - positions[np.asarray(gids_from, dtype=np.int64)]
+        return np.sqrt(np.sum(delta * delta, axis=1))
+
+    def get_soma_distance_bins(self,
+            gids_from, gids_to,
+            bin_size,
+            dtype=np.float64):
+        """
+        Index of the soma-distance bin of cell pairs
+        `(gids_from[i], gids_to[i])`.
+        """
+        try:
+            positions = self.positions
+        except AttributeError:
+            raise AttributeError(
+                "{} instance was created without soma positions."\
+                .format(self.__class__.__name__))
+        return\
+            bin_soma_distances(
+                positions, positions, bin_size,
+                indices_from=np.asarray(gids_from, dtype=np.int64),
+                indices_to=np.asarray(gids_to, dtype=np.int64),
+                dtype=dtype)
+
+
+class CellTable(WithFields):
+    """
+    Properties of all the cells in a circuit, stored column by column in
+    arrays that can be saved, and memory-mapped by other processes.
+    String valued properties are stored as integer codes of their values.
+    """
+    properties = Field(
+        """
+        Names of the cell properties in the table.
+        """)
+    columns = Field(
+        """
+        Mapping property --> `np.ndarray` of its values, or of the codes
+        of its values, with a row for each cell.
+        """)
+    values = Field(
+        """
+        Mapping property --> `np.ndarray` of the unique values of a property
+        stored as codes.
+        """)
+    kinds = Field(
+        """
+        Mapping property --> how the property is stored, one of
+        "values", "object" (codes of values), "categorical", or "ordered"
+        (codes of the categories of a `pandas.Categorical`).
+        """)
+    rows = Field(
+        """
+        `np.ndarray<int64>` indexed by gid, providing the row of each cell,
+        or -1 for gids that are not in the table.
+        """)
+    name_index = Field(
+        """
+        Name of the index of the cells, if it has one.
+        """,
+        __required__=False)
+
+    @classmethod
+    def from_cells(cls, cells):
+        """
+        Table of cells, a `pandas.DataFrame` indexed by gid.
+        """
+        gids = cells.index.to_numpy(np.int64)
+        rows = np.full(gids.max() + 1 if gids.shape[0] > 0 else 0, -1)
+        rows[gids] = np.arange(gids.shape[0])
+        columns, values, kinds = {}, {}, {}
+        for variable in cells.columns:
+            column = cells[variable]
+            if pd.api.types.is_categorical_dtype(column.dtype):
+                kinds[variable] =\
+                    "ordered" if column.cat.ordered else "categorical"
+            elif column.dtype == object:
+                kinds[variable] = "object"
+                column = column.astype("category")
+            else:
+                kinds[variable] = "values"
+                columns[variable] = column.to_numpy()
+                continue
+            columns[variable] = column.cat.codes.to_numpy()
+            values[variable] = column.cat.categories.to_numpy()
+        return cls(
+            properties=list(cells.columns),
+            columns=columns,
+            values=values,
+            kinds=kinds,
+            rows=rows,
+            name_index=cells.index.name)
+
+    def save(self, path):
+        """
+        Save arrays to `.npy` files in the directory at `path`,
+        so that they can be loaded memory-mapped (by another process).
+        """
+        os.makedirs(path, exist_ok=True)
+        for position, variable in enumerate(self.properties):
+            np.save(
+                os.path.join(path, "column_{}.npy".format(position)),
+                self.columns[variable])
+            if variable in self.values:
+                np.save(
+                    os.path.join(path, "values_{}.npy".format(position)),
+                    self.values[variable],
+                    allow_pickle=True)
+        np.save(os.path.join(path, "rows.npy"), self.rows)
+        with open(os.path.join(path, "properties.json"), 'w') as file_json:
+            json.dump(
+                {"properties": self.properties,
+                 "kinds": self.kinds,
+                 "name_index": getattr(self, "name_index", None)},
+                file_json)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load arrays saved at `path`, memory-mapping the columns.
+        """
+        with open(os.path.join(path, "properties.json"), 'r') as file_json:
+            saved = json.load(file_json)
+        properties = saved["properties"]
+        return cls(
+            properties=properties,
+            columns={
+                variable: np.load(
+                    os.path.join(path, "column_{}.npy".format(position)),
+                    mmap_mode=mmap_mode)
+                for position, variable in enumerate(properties)},
+            values={
+                variable: np.load(
+                    os.path.join(path, "values_{}.npy".format(position)),
+                    allow_pickle=True)
+                for position, variable in enumerate(properties)
+                if saved["kinds"][variable] != "values"},
+            kinds=saved["kinds"],
+            rows=np.load(os.path.join(path, "rows.npy"), mmap_mode=mmap_mode),
+            name_index=saved["name_index"])
+
+    def cache_for(self, circuit_model):
+        """
+        Share this table as the cells of a circuit.
+        """
+        _CACHE_CELLS[circuit_model] = self
+        return self
+
+    @classmethod
+    def cached_for(cls, circuit_model, properties):
+        """
+        Table of cells shared as the cells of a circuit, if it has all
+        the `properties`, or `None`.
+        """
+        table = _CACHE_CELLS.get(circuit_model, None)
+        if table is None\
+           or any(variable not in table.kinds for variable in properties):
+            return None
+        return table
+
+    def get(self, gids, properties):
+        """
+        Properties of the cells with `gids`, as a `pandas.DataFrame`
+        that would be obtained with `cells.loc[gids, properties]`
+        from the table of cells this table was made from.
+        """
+        gids = np.asarray(gids, dtype=np.int64)
+        known = np.logical_and(gids >= 0, gids < self.rows.shape[0])
+        rows = np.full(gids.shape[0], -1)
+        rows[known] = self.rows[gids[known]]
+        if np.any(rows < 0):
+            raise KeyError(
+                "Gids not in the table of cells: {}".format(gids[rows < 0]))
+
+        def _column(variable):
+            column = self.columns[variable][rows]
+            if self.kinds[variable] == "values":
+                return column
+            categorical =\
+                pd.Categorical.from_codes(
+                    column,
+                    categories=self.values[variable],
+                    ordered=self.kinds[variable] == "ordered")
+            if self.kinds[variable] == "object":
+                return np.asarray(categorical, dtype=object)
+            return categorical
+
+        return pd.DataFrame(
+            {variable: _column(variable) for variable in properties},
+            columns=list(properties),
+            index=pd.Index(gids, name=getattr(self, "name_index", None)))
+
+
+def _factorized(values):
+    """
+    Sorted unique values and the inverse indices to reconstruct `values`.
+    """
+    return np.unique(values, return_inverse=True)
+
+
+def sum_by_group(keys, values):
+    """
+    Sum values grouped by integer keys.
+
+    Arguments
+    -------------
+    keys :: list of integer arrays, all of the same length
+    values :: Mapping variable --> array (or scalar) of values to sum
+
+    Returns
+    -------------
+    A tuple `(group_keys, sums)` where `group_keys` is a list of arrays
+    providing the keys of each group, lexicographically sorted, and `sums`
+    is a dict mapping variable --> sum of its values in each group.
+    """
+    factorized = [_factorized(key) for key in keys]
+    dims = tuple(max(uniques.shape[0], 1) for uniques, _ in factorized)
+    flat =\
+        np.ravel_multi_index(
+            tuple(inverse for _, inverse in factorized), dims)\
+        if factorized else np.zeros(0, dtype=np.int64)
+    flat_groups, inverse_groups = np.unique(flat, return_inverse=True)
+    number_groups = flat_groups.shape[0]
+    number_rows = flat.shape[0]
+
+    def _sum(value):
+        weights =\
+            np.broadcast_to(
+                np.asarray(value, dtype=np.float64),
+                (number_rows,))
+        weights = np.where(np.isnan(weights), 0., weights)
+        return np.bincount(
+            inverse_groups, weights=weights, minlength=number_groups)
+
+    group_keys =[
+        uniques[index]
+        for (uniques, _), index in zip(
+                factorized,
+                np.unravel_index(flat_groups, dims))]
+    return (
+        group_keys,
+        {variable: _sum(value) for variable, value in values.items()})
+
+
+def summed_connections(
+        cell_type_codes,
+        gids_primary,
+        gids_secondary,
+        measurement,
+        label_gid_primary,
+        by_soma_distance=False,
+        bin_size_soma_distance=100.,
+        upper_bound_soma_distance=np.nan):
+    """
+    Sum measured values of connections, grouped by the cell-type of their
+    secondary cell, their primary cell gid and, if required, the binned
+    soma-distance between their cells.
+
+    Arguments
+    --------------
+    cell_type_codes :: `CellTypeCodes` for the circuit
+    gids_primary :: np.ndarray of primary gids, one for each connection
+    gids_secondary :: np.ndarray of secondary gids, one for each connection
+    measurement :: Mapping variable --> values for each connection
+    label_gid_primary :: name to use for primary gid in the index
+    by_soma_distance :: Boolean indicating if soma-distance should be grouped
+    bin_size_soma_distance :: size of soma-distance bins
+    upper_bound_soma_distance :: drop connections with binned soma-distance
+    ~                            beyond this, interpreting NaN as infinity.
+
+    Returns
+    --------------
+    `pandas.DataFrame` indexed by cell-type specifiers, primary gid,
+    and soma-distance, with a column for each measured variable,
+    as would be obtained with a `pandas` groupby followed by a sum.
+    """
+    gids_primary = np.asarray(gids_primary, dtype=np.int64)
+    gids_secondary = np.asarray(gids_secondary, dtype=np.int64)
+    measurement ={
+        variable: np.broadcast_to(
+            np.asarray(value, dtype=np.float64),
+            gids_secondary.shape)
+        for variable, value in measurement.items()}
+
+    encoded = cell_type_codes.is_encoded(gids_secondary)
+    if not np.all(encoded):
+        raise KeyError(
+            """
+            Secondary gids of connections that are not among the cells
+            encoded: {}
+            """.format(np.unique(gids_secondary[~encoded])))
+    known = cell_type_codes.is_known(gids_secondary)
+    filter_by_distance = not np.isnan(upper_bound_soma_distance)
+    if by_soma_distance or filter_by_distance:
+        bin_size = bin_size_soma_distance
+        bins_soma_distance =\
+            cell_type_codes.get_soma_distance_bins(
+                gids_primary, gids_secondary, bin_size)
+        if filter_by_distance:
+            known = np.logical_and(
+                known,
+                bin_size * bins_soma_distance + bin_size / 2.
+                < upper_bound_soma_distance)
+        bins_soma_distance = bins_soma_distance[known]
+    gids_primary = gids_primary[known]
+    gids_secondary = gids_secondary[known]
+    measurement ={
+        variable: value[known]
+        for variable, value in measurement.items()}
+
+    keys =\
+        cell_type_codes.get_codes(gids_secondary) + [gids_primary]
+    names =\
+        cell_type_codes.specifiers + [label_gid_primary]
+    if by_soma_distance:
+        keys.append(bins_soma_distance)
+        names.append("soma_distance")
+
+    group_keys, sums = sum_by_group(keys, measurement)
+
+    levels =[
+        cell_type_codes.decode(specifier, codes)
+        for specifier, codes in zip(cell_type_codes.specifiers, group_keys)]
+    levels.append(group_keys[len(cell_type_codes.specifiers)].astype(np.int32))
+    if by_soma_distance:
+        levels.append(
+            bin_size_soma_distance * group_keys[-1]
+            + bin_size_soma_distance / 2.)
+    return\
+        pd.DataFrame(
+            sums,
+            columns=list(measurement.keys()),
+            index=pd.MultiIndex.from_arrays(levels, names=names))
+
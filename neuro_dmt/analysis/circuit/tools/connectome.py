@@ -0,0 +1,230 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Statistics of all the pathways of a circuit, from one pass over its edges.
+"""
+
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields
+from dmt.tk.journal import Logger
+
+LOGGER = Logger(client=__file__)
+
+
+class ConnectomeMatrices(WithFields):
+    """
+    Pre-synaptic cell-type x post-synaptic cell-type matrices of the
+    number of connections, synapses, and cell pairs among a target
+    population of cells, and the degrees of the target cells,
+    all accumulated while streaming the afferent connections of the
+    target once.
+    """
+    cell_types = Field(
+        """
+        `pandas.Index` (or `pandas.MultiIndex`) of the cell-types,
+        that labels the rows and columns of the matrices.
+        """)
+    number_cells = Field(
+        """
+        `np.ndarray<int64>` with the number of target cells of each cell-type.
+        """)
+    connections = Field(
+        """
+        `np.ndarray<int64>` of shape (number cell-types, number cell-types),
+        number of connections from pre-synaptic type (row) to
+        post-synaptic type (column).
+        """)
+    synapses = Field(
+        """
+        `np.ndarray<float>` of shape (number cell-types, number cell-types),
+        number of synapses from pre-synaptic type (row) to
+        post-synaptic type (column).
+        """)
+    gids = Field(
+        """
+        `np.ndarray<int64>` gids of the target cells.
+        """)
+    codes = Field(
+        """
+        `np.ndarray<int64>` cell-type code of each of the target cells.
+        """)
+    indegree = Field(
+        """
+        `np.ndarray<int64>` number of afferent connections, from the target,
+        of each of the target cells.
+        """)
+    outdegree = Field(
+        """
+        `pandas.Series` number of efferent connections, to the target, of
+        target cells indexed by their position in `self.gids`, and the code of
+        the post-synaptic cell-type. Only non-zero values are stored.
+        """)
+
+    @classmethod
+    def measure(cls,
+            circuit_model, adapter,
+            cells,
+            specifiers_cell_type=["mtype"],
+            batch_size=10000):
+        """
+        Stream afferent connections of `cells`, in batches, and accumulate
+        the statistics of connections among them.
+
+        Arguments
+        ------------
+        cells :: `pandas.DataFrame` of target cells, with a `gid` column and
+        ~        a column for each of the cell-type specifiers.
+        specifiers_cell_type :: cell properties that define a cell-type.
+        batch_size :: number of post-synaptic cells to read connections of
+        ~             at a time.
+        """
+        gids = cells.gid.to_numpy(np.int64)
+        if len(specifiers_cell_type) == 1:
+            codes, cell_types =\
+                pd.factorize(cells[specifiers_cell_type[0]], sort=True)
+            cell_types = pd.Index(cell_types, name=specifiers_cell_type[0])
+        else:
+            codes, cell_types =\
+                pd.MultiIndex.from_frame(cells[specifiers_cell_type])\
+                             .factorize()
+            cell_types = cell_types.set_names(specifiers_cell_type)
+        codes = np.asarray(codes, dtype=np.int64)
+        number_types = len(cell_types)
+
+        position_gid = np.full(gids.max() + 1 if gids.shape[0] else 0, -1)
+        position_gid[gids] = np.arange(gids.shape[0])
+
+        def _positions(gids_other):
+            positions = np.full(gids_other.shape[0], -1)
+            inside = gids_other < position_gid.shape[0]
+            positions[inside] = position_gid[gids_other[inside]]
+            return positions
+
+        connections = np.zeros(number_types * number_types, dtype=np.int64)
+        synapses = np.zeros(number_types * number_types, dtype=np.float64)
+        indegree = np.zeros(gids.shape[0], dtype=np.int64)
+        outdegrees = []
+        for begin in range(0, gids.shape[0], batch_size):
+            batch = adapter.get_connections(
+                circuit_model,
+                gids[begin:begin + batch_size],
+                direction="AFF")
+            LOGGER.debug(
+                LOGGER.get_source_info(),
+                "ConnectomeMatrices: batch of {} cells, {} connections".format(
+                    min(batch_size, gids.shape[0] - begin),
+                    batch.shape[0]))
+            positions_pre = _positions(batch.pre_gid.to_numpy(np.int64))
+            positions_post = _positions(batch.post_gid.to_numpy(np.int64))
+            among_target = (positions_pre >= 0) & (positions_post >= 0)
+            positions_pre = positions_pre[among_target]
+            positions_post = positions_post[among_target]
+            codes_pre = codes[positions_pre]
+            codes_post = codes[positions_post]
+            pathways = codes_pre * number_types + codes_post
+            connections += np.bincount(pathways, minlength=connections.shape[0])
+            synapses += np.bincount(
+                pathways,
+                weights=batch.strength.to_numpy(np.float64)[among_target],
+                minlength=synapses.shape[0])
+            indegree += np.bincount(positions_post, minlength=indegree.shape[0])
+            keys, counts = np.unique(
+                positions_pre * number_types + codes_post, return_counts=True)
+            outdegrees.append(pd.Series(counts, index=keys))
+
+        outdegree =\
+            pd.concat(outdegrees).groupby(level=0).sum()\
+            if outdegrees else pd.Series([], dtype=np.int64)
+        return cls(
+            cell_types=cell_types,
+            number_cells=np.bincount(codes, minlength=number_types),
+            connections=connections.reshape(number_types, number_types),
+            synapses=synapses.reshape(number_types, number_types),
+            gids=gids,
+            codes=codes,
+            indegree=indegree,
+            outdegree=outdegree)
+
+    @lazyfield
+    def pairs(self):
+        """
+        Number of (pre-synaptic, post-synaptic) cell pairs in each pathway.
+        """
+        return np.outer(self.number_cells, self.number_cells)
+
+    def _code(self, cell_type):
+        """
+        Code of a cell-type, given as a value or a mapping of specifiers.
+        Cell-types not in the target are coded -1.
+        """
+        if isinstance(cell_type, dict):
+            cell_type =\
+                cell_type[self.cell_types.name]\
+                if not isinstance(self.cell_types, pd.MultiIndex) else\
+                   tuple(cell_type[name] for name in self.cell_types.names)
+        try:
+            return self.cell_types.get_loc(cell_type)
+        except KeyError:
+            return -1
+
+    def _matrix(self, values):
+        """
+        Values of a matrix as a `pandas.DataFrame` with pre-synaptic cell-types
+        as rows and post-synaptic cell-types as columns.
+        """
+        return pd.DataFrame(
+            values, index=self.cell_types, columns=self.cell_types)
+
+    def get_connection_probability(self):
+        """
+        Probability that a pre-synaptic cell is connected to a post-synaptic
+        cell, for all pathways.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._matrix(self.connections / self.pairs)
+
+    def get_synapse_count(self):
+        """
+        Mean number of synapses per connection, for all pathways.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._matrix(self.synapses / self.connections)
+
+    def get_indegree(self, cell_type_post):
+        """
+        In-degree of the target cells of a post-synaptic cell-type,
+        that have at least one connection, indexed by gid.
+        """
+        cells = (self.codes == self._code(cell_type_post))\
+            & (self.indegree > 0)
+        return pd.Series(
+            self.indegree[cells], index=pd.Index(self.gids[cells], name="gid"))
+
+    def get_outdegree(self, cell_type_post):
+        """
+        Out-degree of target cells to a post-synaptic cell-type,
+        for the target cells that have at least one such connection,
+        indexed by gid.
+        """
+        number_types = len(self.cell_types)
+        keys = self.outdegree.index.to_numpy(np.int64)
+        to_type = keys % number_types == self._code(cell_type_post)
+        return pd.Series(
+            self.outdegree.values[to_type],
+            index=pd.Index(
+                self.gids[keys[to_type] // number_types], name="gid"))
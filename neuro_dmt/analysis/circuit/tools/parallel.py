@@ -0,0 +1,146 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Measure batches of a pathway measurement in a pool of processes.
+"""
+
+import os
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dmt.tk.journal import Logger
+from .columnar import CellTable, CellTypeCodes
+
+LOGGER = Logger(client=__file__)
+
+#State of a worker process, set once by `_initialize_worker`.
+_WORKER = {}
+
+
+def _initialize_worker(
+        pathway_measurement,
+        circuit_model, adapter,
+        target_secondary,
+        path_cell_type_codes,
+        path_cells,
+        kwargs):
+    """
+    Set up a worker process with everything it needs to measure a batch,
+    so that only the batch of primary cells is sent with each task.
+    Cell-type codes saved at `path_cell_type_codes`, and the table of cells
+    saved at `path_cells`, are memory-mapped, and will be shared between
+    the worker processes through the OS page cache.
+    """
+    if path_cell_type_codes is not None:
+        CellTypeCodes.load(path_cell_type_codes).cache_for(circuit_model)
+    if path_cells is not None:
+        CellTable.load(path_cells).cache_for(circuit_model)
+    _WORKER.update(
+        pathway_measurement=pathway_measurement,
+        circuit_model=circuit_model,
+        adapter=adapter,
+        target_secondary=target_secondary,
+        kwargs=kwargs)
+
+
+def _measure_batch(batch):
+    """
+    Measure a batch of primary cells in a worker process.
+    """
+    return\
+        _WORKER["pathway_measurement"].measure_batch(
+            _WORKER["circuit_model"], _WORKER["adapter"],
+            batch,
+            _WORKER["target_secondary"],
+            **_WORKER["kwargs"])
+
+
+def measure_batches(
+        pathway_measurement,
+        circuit_model, adapter,
+        batches,
+        target_secondary,
+        number_processes,
+        size_window=None,
+        **kwargs):
+    """
+    Measure batches in a pool of `number_processes` worker processes.
+
+    Worker processes are forked, so that the (possibly unpicklable) circuit
+    model, adapter, and measurement methods are inherited rather than sent.
+    Cells are read by the worker processes from arrays saved once,
+    and shared read-only.
+    At most `size_window` batches, by default twice the number of processes,
+    are submitted ahead of the measurement that is yielded next.
+
+    Returns
+    ------------
+    A generator of measurements, in the same order as `batches`.
+    """
+    size_window =\
+        size_window if size_window else 2 * number_processes
+    with tempfile.TemporaryDirectory() as path_shared:
+        if pathway_measurement.uses_cell_type_codes:
+            path_cell_type_codes =\
+                pathway_measurement\
+                    .get_cell_type_codes(circuit_model, adapter)\
+                    .save(os.path.join(path_shared, "cell_type_codes"))
+            path_cells = None
+        else:
+            path_cell_type_codes = None
+            path_cells =\
+                CellTable.from_cells(
+                    adapter.get_cells(
+                        circuit_model,
+                        properties=pathway_measurement.get_properties_connected(
+                            pathway_measurement.specifiers_cell_type,
+                            pathway_measurement.by_soma_distance))
+                ).save(os.path.join(path_shared, "cells"))
+
+        LOGGER.status(
+            LOGGER.get_source_info(),
+            "Measure batches with {} processes.".format(number_processes))
+
+        with ProcessPoolExecutor(
+                max_workers=number_processes,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_initialize_worker,
+                initargs=(
+                    pathway_measurement,
+                    circuit_model, adapter,
+                    target_secondary,
+                    path_cell_type_codes,
+                    path_cells,
+                    kwargs)) as executor:
+            batches = iter(batches)
+            measurements = deque()
+
+            def _submit():
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    return False
+                measurements.append(executor.submit(_measure_batch, batch))
+                return True
+
+            while len(measurements) < size_window and _submit():
+                pass
+            while measurements:
+                measurement = measurements.popleft().result()
+                _submit()
+                yield measurement
@@ -17,6 +17,7 @@
 """
 Measure pathways.
 """
+import inspect
 from enum import Enum
 from tqdm import tqdm
 from collections import namedtuple, Iterable, Mapping
@@ -27,10 +28,41 @@ from dmt.tk.field import NA, Field, LambdaField, lazyfield, WithFields
 from dmt.tk.journal.logger import Logger 
 from dmt.tk.journal.utils import count_number_calls
 from neuro_dmt import terminology
+from neuro_dmt.utils.geometry.distance import\
+    bin_distances,\
+    bin_soma_distances,\
+    get_bin_mids
 from .query import PathwayQuery
+from .accumulator import SummaryAccumulator
+from .columnar import\
+    XYZ,\
+    CellTable,\
+    CellTypeCodes,\
+    summed_connections
+from .spatial import SomaPositionGrid, count_pairs_by_soma_distance
+from .parallel import measure_batches
+from .prefetch import ConnectionPrefetcher, PrefetchingAdapter
+from .checkpoint import CheckpointStore
 
 LOGGER = Logger(client=__file__)
 
+
+def _restricts_connections(adapter):
+    """
+    Does `adapter.get_connections(...)` declare an argument `cell_group_other`,
+    to restrict connections to those with cells in a group on their other
+    side? An adapter wrapped to prefetch connections does if the adapter that
+    it wraps does.
+    """
+    while isinstance(adapter, PrefetchingAdapter):
+        adapter = adapter.wrapped
+    try:
+        parameters = inspect.signature(adapter.get_connections).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return "cell_group_other" in parameters
+
+
 class Connectivity(Enum):
     """
     Used for testing, or to compute pathway phenomena on a complete network
@@ -41,6 +73,17 @@ class Connectivity(Enum):
     CIRCUIT  = 3
 
 
+class GroupByEngine(Enum):
+    """
+    How to sum the values measured for connections, grouped by cell-type,
+    primary gid, and soma-distance.
+    `PANDAS` groups a copy of the connected cells' table,
+    `COLUMNAR` groups integer codes of cell-types with `np.bincount`.
+    """
+    PANDAS   = 1
+    COLUMNAR = 2
+
+
 class Pandamonad(WithFields):
     """
     Sort of a monad for `pandas.DataFrame`.
@@ -94,23 +137,64 @@ class Pandamonad(WithFields):
             return x
         return operation(x, y)
 
+    def mergeable(self, aggregators):
+        """
+        Can `aggregators` be computed from accumulated sufficient statistics?
+        """
+        if isinstance(aggregators, str):
+            return aggregators in SummaryAccumulator.mergeable_summaries
+        try:
+            return all(
+                isinstance(aggregator, str)
+                and aggregator in SummaryAccumulator.mergeable_summaries
+                for aggregator in aggregators)
+        except TypeError:
+            return False
+
+    def accumulate(self, dataframes):
+        """
+        Accumulate sufficient statistics of a sequence of dataframes.
+        """
+        return SummaryAccumulator(index=self.index).accumulate(dataframes)
+
     def reduce(self,
             dataframes,
             aggregators,
-            combinator=lambda u, v: u + v):
+            combinator=None):
         """
         Reduce a sequence of dataframes.
+
+        Arguments
+        ------------
+        dataframes :: An iterable of dataframes.
+        aggregators :: Aggregators to apply to the values of each group.
+        combinator :: Combine aggregates of two dataframes.
+        ~             If not provided, and the aggregators can be computed from
+        ~             sufficient statistics, the dataframes will be accumulated
+        ~             and summarized in one final step. Otherwise (for example
+        ~             'median', or 'mad'), the dataframes will be concatenated
+        ~             and aggregated together, as aggregates of separate
+        ~             dataframes cannot be combined.
         """
-        ditr = iter(dataframes)
-        try:
-            head = next(ditr)
-        except StopIteration:
-            return None
-        return\
-            self.combine(
-                head.groupby(self.index).agg(aggregators),
-                self.reduce(ditr, aggregators, combinator),
-                operation=combinator)
+        if combinator is None:
+            if self.mergeable(aggregators):
+                return self.accumulate(dataframes).summary(aggregators)
+            dataframes =[
+                dataframe for dataframe in dataframes if dataframe is not None]
+            if not dataframes:
+                return None
+            return pd.concat(dataframes).groupby(self.index).agg(aggregators)
+
+        result = None
+        for dataframe in dataframes:
+            if dataframe is None:
+                continue
+            result =\
+                self.combine(
+                    result,
+                    dataframe.groupby(self.index).agg(aggregators),
+                    operation=combinator)
+        return result
 
     def transform(self, value, operation):
         """
@@ -162,6 +246,13 @@ class PathwayMeasurement(WithFields):
         Number of samples to consider if random sampling methodology.
         """,
         __default_value__=20)
+    random_state = Field(
+        """
+        Seed for random sampling of cells, so that the same cells are sampled
+        every time a measurement is made. A measurement that is checkpointed,
+        without a seed, will be seeded by its checkpoint key.
+        """,
+        __required__=False)
     processing_methodology = Field(
         """
         Specifies if `Field value` computes it's result for one cell at a time,
@@ -173,6 +264,15 @@ class PathwayMeasurement(WithFields):
         Maximum size of a single batch that can be processed.
         """,
         __default_value__=10000)
+    micro_batch_size = Field(
+        """
+        Number of cells to measure together in a single adapter call,
+        with serial processing methodology. The measurement of a micro-batch
+        will be split back into a measurement for each cell, so that
+        measurements remain one per cell. By default each cell is measured
+        on its own.
+        """,
+        __default_value__=1)
     by_soma_distance = Field(
         """
         Boolean, indicating if the measurements should be made by soma-distance.
@@ -220,6 +320,138 @@ class PathwayMeasurement(WithFields):
         returned in the index.
         """,
         __default_value__=True)
+    engine = Field(
+        """
+        `GroupByEngine` to use to sum the measured values of connections.
+        """,
+        __type__=GroupByEngine,
+        __default_value__=GroupByEngine.PANDAS)
+    number_processes = Field(
+        """
+        Number of processes to measure batches in.
+        The default, 1, measures batches one after the other in the
+        calling process.
+        """,
+        __default_value__=1)
+    prefetch_depth = Field(
+        """
+        Number of batches whose connections will be read in the background,
+        ahead of the batch being measured, when batches are measured in the
+        calling process. By default, connections are read only when a batch
+        is measured.
+        """,
+        __default_value__=0)
+    prefetch_memory_limit = Field(
+        """
+        Maximum number of bytes of connections to hold in memory for
+        the batches ahead.
+        """,
+        __default_value__=2 ** 30)
+    checkpoints = Field(
+        """
+        `CheckpointStore`, or path to a directory, to save the measurement
+        of each batch in. A run that is interrupted and restarted with the same
+        query, measurement fields, target, and circuit, will resume from the
+        batches saved in a previous run.
+        """,
+        __required__=False)
+
+    @lazyfield
+    def uses_cell_type_codes(self):
+        """
+        Will cell-type codes be used to measure a batch?
+        """
+        return self.engine == GroupByEngine.COLUMNAR
+
+    def get_cell_type_codes(self,
+            circuit_model, adapter,
+            specifiers_cell_type=None):
+        """
+        Integer codes of the cell-type specifiers and soma positions of all
+        the cells in a circuit, indexed by gid, computed only once and shared
+        by all the pathway measurements of the circuit.
+        """
+        return\
+            CellTypeCodes.for_circuit(
+                circuit_model, adapter,
+                specifiers_cell_type\
+                if specifiers_cell_type is not None else\
+                   self.specifiers_cell_type)
+
+    def get_properties_connected(self,
+            cell_properties_groupby,
+            by_soma_distance):
+        """
+        Properties of the cells connected to primary cells, that will be
+        read to measure a batch without cell-type codes.
+        """
+        return\
+            cell_properties_groupby + [
+                axis for axis in XYZ
+                if (by_soma_distance or self.filter_by_upper_bound_soma_distance)
+                and axis not in cell_properties_groupby]
+
+    def get_cells_connected(self,
+            circuit_model, adapter,
+            gids,
+            properties):
+        """
+        Properties of the cells with `gids`, read from the table of cells
+        shared with this process, if there is one, or from the adapter.
+        """
+        cells = CellTable.cached_for(circuit_model, properties)
+        if cells is not None:
+            return cells.get(gids, properties)
+        return\
+            adapter.get_cells(circuit_model, properties=properties)\
+                   .loc[gids]
+
+    @lazyfield
+    def _cache_soma_position_grid(self):
+        """
+        Mapping circuit_model --> `SomaPositionGrid`
+        """
+        return {}
+
+    def get_soma_position_grid(self, circuit_model, adapter):
+        """
+        Grid of all the cells in a circuit, by their soma positions,
+        with voxels as large as the reach of the upper bound on soma-distance,
+        and computed only once.
+        """
+        if circuit_model not in self._cache_soma_position_grid:
+            cells = adapter.get_cells(circuit_model, properties=XYZ)
+            self._cache_soma_position_grid[circuit_model] =\
+                SomaPositionGrid.from_cells(
+                    cells,
+                    adapter.get_soma_positions(circuit_model, cells),
+                    voxel_size=self.reach_upper_bound_soma_distance)
+        return self._cache_soma_position_grid[circuit_model]
+
+    @lazyfield
+    def reach_upper_bound_soma_distance(self):
+        """
+        Soma-distance beyond which no pair can pass the upper bound.
+        The upper bound is applied to binned soma-distances, i.e. to the
+        mid-points of bins that may extend past the bound by half a bin.
+        """
+        return self.upper_bound_soma_distance + self.bin_size_soma_distance
+
+    def get_gids_within_upper_bound(self,
+            circuit_model, adapter,
+            gids_primary,
+            gids_secondary):
+        """
+        Secondary gids that are close enough to any of the primary gids
+        to pass the upper bound on soma-distance.
+        """
+        gids_within =\
+            self.get_soma_position_grid(circuit_model, adapter)\
+                .get_gids_within(
+                    gids_primary,
+                    self.reach_upper_bound_soma_distance)
+        return\
+            gids_secondary[np.in1d(gids_secondary, gids_within)]
 
     @lazyfield
     def pandamonad(self):
@@ -362,10 +594,18 @@ class PathwayMeasurement(WithFields):
             circuit_model, adapter,
             pre_synaptic_cell_group={},
             post_synaptic_cell_group={},
-            query=None, size=None):
+            query=None, size=None,
+            random_state=None):
         """
         Primary and secondary cell samples.
+
+        Arguments
+        ------------------
+        random_state :: Seed for the random sample of cells,
+        ~               by default this `PathwayMeasurement`'s `random_state`.
         """
+        if random_state is None:
+            random_state = getattr(self, "random_state", None)
         if not query:
             query = PathwayQuery(
                 pre_synaptic_cell_group=pre_synaptic_cell_group,
@@ -386,7 +626,7 @@ class PathwayMeasurement(WithFields):
                 
             sample_size = size if size is not None else self.sample_size
             if sample_size == 1:
-                return cells.sample(1).iloc[0]\
+                return cells.sample(1, random_state=random_state).iloc[0]\
                     if cells.shape[0] > 0\
                        else None
 
@@ -394,7 +634,7 @@ class PathwayMeasurement(WithFields):
                 return pd.DataFrame(
                     [], columns=cells.columns)
 
-            return cells.sample(sample_size)\
+            return cells.sample(sample_size, random_state=random_state)\
                 if cells.shape[0] > sample_size\
                    else cells
 
@@ -436,11 +676,20 @@ class PathwayMeasurement(WithFields):
                 self.get_pairs(gids_primary, gids_secondary)\
                     .assign(strength=1.)
 
-        all_connections =\
-            adapter.get_connections(
-                circuit_model,
-                gids_primary,
-                direction=self.direction)
+        if self.filter_by_upper_bound_soma_distance\
+           and _restricts_connections(adapter):
+            all_connections =\
+                adapter.get_connections(
+                    circuit_model,
+                    gids_primary,
+                    direction=self.direction,
+                    cell_group_other=gids_secondary)
+        else:
+            all_connections =\
+                adapter.get_connections(
+                    circuit_model,
+                    gids_primary,
+                    direction=self.direction)
 
         LOGGER.debug(
             "PathwayMeasurement get_connections",
@@ -595,26 +844,50 @@ class PathwayMeasurement(WithFields):
                 post_synaptic_cell_group=post_synaptic_cell_group,
                 pre_synaptic_cell_group=pre_synaptic_cell_group,
                 direction=self.direction)
+        checkpoint =\
+            self._get_checkpoint(
+                circuit_model, adapter, query, target, kwargs)
         if target is None:
             target =\
                 self.sample_target(
-                    circuit_model, adapter, query=query)
-        batches =\
-            self._batches(target.primary)
+                    circuit_model, adapter, query=query,
+                    random_state=checkpoint.random_state\
+                    if checkpoint is not None else None)
+        completed =\
+            checkpoint.store.get_completed(checkpoint.key)\
+            if checkpoint is not None else set()
+
+        if self.measures_micro_batches:
+            number_batches = target.primary.shape[0]
+            measurements =\
+                self.measure_micro_batches(
+                    circuit_model, adapter,
+                    target.primary, target.secondary,
+                    skip=completed,
+                    **kwargs)
+        else:
+            batches = self._batches(target.primary)
+            if checkpoint is not None:
+                batches = list(batches)
+                number_batches = len(batches)
+            batches_pending =(
+                batch for index_batch, batch in enumerate(batches)
+                if index_batch not in completed)
+            measurements =\
+                self.measure_batches(
+                    circuit_model, adapter,
+                    batches_pending, target.secondary,
+                    **kwargs)
 
-        for n_batch, batch in tqdm(enumerate(batches)):
+        if checkpoint is not None:
             LOGGER.status(
                 LOGGER.get_source_info(),
-                "batch {}: number cells:  {}".format(n_batch,  batch.shape[0]))
-            measurement =\
-                self._method(
-                    circuit_model, adapter,
-                    target=Record(primary=batch, secondary=target.secondary),
-                    cell_properties_groupby=self.specifiers_cell_type,
-                    by_soma_distance=self.by_soma_distance,
-                    bin_size_soma_distance=self.bin_size_soma_distance,
-                    **kwargs)
+                "Resume from {} of {} batches saved at {}".format(
+                    len(completed), number_batches, checkpoint.store.path))
+            measurements =\
+                self._checkpointed(checkpoint, number_batches, measurements)
 
+        for measurement in tqdm(measurements):
             if measurement is None:
                 LOGGER.status(
                     LOGGER.get_source_info(),
@@ -640,6 +913,243 @@ class PathwayMeasurement(WithFields):
                     circuit_model, adapter, query, measurement)\
                 if prefixed else measurement
 
+    def _get_checkpoint(self,
+            circuit_model, adapter,
+            query, target,
+            kwargs):
+        """
+        Store and key to checkpoint batches of a measurement.
+        The key hashes everything that determines the batch measurements:
+        the query, the fields of this `PathwayMeasurement`, gids of the target
+        if one is given, keyword arguments, and the circuit's provenance.
+        A target that will be sampled is identified by the sampling fields,
+        and its random sample seeded by the key, unless a `random_state` was
+        set, so that a resumed run samples the same cells.
+
+        Arguments
+        ------------------
+        target :: Record(primary, secondary) of cells to measure, or None
+        ~         if a target will be sampled.
+        """
+        try:
+            store = self.checkpoints
+        except AttributeError:
+            return None
+        if not isinstance(store, CheckpointStore):
+            store = CheckpointStore(path=store)
+
+        def _gids(cells):
+            return\
+                cells.gid.to_numpy(np.int64)\
+                if isinstance(cells, pd.DataFrame) else\
+                   np.array([cells.gid], dtype=np.int64)
+        try:
+            provenance = adapter.get_provenance(circuit_model)
+        except AttributeError:
+            if not isinstance(circuit_model, WithFields):
+                raise TypeError(
+                    """
+                    Cannot checkpoint a measurement of a circuit model
+                    without a provenance: adapter {} does not provide
+                    `get_provenance(circuit_model)`.
+                    """.format(adapter.__class__.__name__))
+            provenance = circuit_model
+        fields ={
+            field: value for field, value in self.field_dict.items()
+            if field not in (
+                    "checkpoints", "number_processes", "micro_batch_size",
+                    "prefetch_depth", "prefetch_memory_limit")}
+        gids =\
+            (_gids(target.primary), _gids(target.secondary))\
+            if target is not None else ()
+        key =\
+            CheckpointStore.get_key(
+                query, fields, *gids, kwargs, provenance)
+        random_state = getattr(self, "random_state", None)
+        return Record(
+            store=store,
+            key=key,
+            random_state=random_state\
+                if random_state is not None else int(key[:8], 16))
+
+    def _checkpointed(self, checkpoint, number_batches, measurements):
+        """
+        Measurements of all the batches, in order, loading those saved
+        in a previous run, and saving the others as they are measured.
+        """
+        completed = checkpoint.store.get_completed(checkpoint.key)
+        for index_batch in range(number_batches):
+            if index_batch in completed:
+                yield checkpoint.store.load(checkpoint.key, index_batch)
+            else:
+                yield checkpoint.store.save(
+                    checkpoint.key, index_batch, next(measurements))
+
+    @property
+    def measures_micro_batches(self):
+        """
+        Should cells processed serially be measured in micro-batches?
+        """
+        return\
+            self.processing_methodology == terminology.processing_methodology.serial\
+            and self.micro_batch_size > 1
+
+    @property
+    def prefetches_connections(self):
+        """
+        Should connections of upcoming batches be read in the background?
+        Connections are read ahead only when they will be requested
+        for the primary cells of a batch alone.
+        """
+        return\
+            self.prefetch_depth > 0\
+            and self.connectivity == Connectivity.CIRCUIT\
+            and not self.filter_by_upper_bound_soma_distance
+
+    def measure_batches(self,
+            circuit_model, adapter,
+            batches,
+            target_secondary,
+            **kwargs):
+        """
+        Measure a sequence of batches of primary cells, in order,
+        in worker processes if so configured.
+        """
+        if self.number_processes > 1:
+            return\
+                measure_batches(
+                    self, circuit_model, adapter,
+                    batches, target_secondary,
+                    self.number_processes,
+                    **kwargs)
+        if self.prefetches_connections:
+            prefetcher =\
+                ConnectionPrefetcher(
+                    circuit_model=circuit_model,
+                    adapter=adapter,
+                    direction=self.direction,
+                    queue_depth=self.prefetch_depth,
+                    memory_limit=self.prefetch_memory_limit)
+            return(
+                self.measure_batch(
+                    circuit_model, prefetcher.prefetching_adapter,
+                    batch, target_secondary,
+                    **kwargs)
+                for batch in prefetcher.iterate(batches))
+        return(
+            self.measure_batch(
+                circuit_model, adapter,
+                batch, target_secondary,
+                **kwargs)
+            for batch in batches)
+
+    def measure_micro_batches(self,
+            circuit_model, adapter,
+            cells,
+            target_secondary,
+            skip=(),
+            **kwargs):
+        """
+        Measure primary cells one at a time, with an adapter call for each
+        micro-batch of cells instead of each cell.
+
+        Arguments
+        --------------
+        cells :: `pandas.DataFrame` of primary cells.
+        skip :: positions (in `cells`) of the cells that need not be measured.
+
+        Returns
+        --------------
+        A generator of a measurement for each cell that is not skipped,
+        in order, as `measure_batch` would return for a single cell.
+        """
+        positions =\
+            np.setdiff1d(
+                np.arange(cells.shape[0]),
+                np.fromiter(skip, dtype=np.int64, count=len(skip)))
+        micro_batches =[
+            cells.iloc[positions[begin:begin + self.micro_batch_size]]
+            for begin in range(0, positions.shape[0], self.micro_batch_size)]
+        measurements =\
+            self.measure_batches(
+                circuit_model, adapter,
+                micro_batches, target_secondary,
+                **kwargs)
+        for micro_batch, measurement in zip(micro_batches, measurements):
+            measurements_cells =\
+                self._split_by_cell(micro_batch, measurement)
+            if measurements_cells is None:
+                LOGGER.warn(
+                    LOGGER.get_source_info(),
+                    """
+                    Measurement of a micro-batch of {} cells is not indexed
+                    by {}, and cannot be split by cell.
+                    Cells will be measured one at a time.
+                    """.format(micro_batch.shape[0], self.label_gid_primary))
+                measured_again = np.ones(micro_batch.shape[0], dtype=bool)
+                measurements_cells = [None] * micro_batch.shape[0]
+            elif measurement is not None\
+                 and self.filter_by_upper_bound_soma_distance:
+                #a cell missing from the measurement may have had connections
+                #that were all filtered out, which measure to an empty frame...
+                measured_again =\
+                    np.array([m is None for m in measurements_cells], dtype=bool)
+            else:
+                measured_again = np.zeros(micro_batch.shape[0], dtype=bool)
+            for position, measurement_cell in enumerate(measurements_cells):
+                yield\
+                    self.measure_batch(
+                        circuit_model, adapter,
+                        micro_batch.iloc[position], target_secondary,
+                        **kwargs)\
+                    if measured_again[position] else measurement_cell
+
+    def _split_by_cell(self, cells, measurement):
+        """
+        Split the measurement of a batch of cells into a measurement
+        for each of the cells, in the order of `cells`, with `None` for cells
+        missing from the measurement, as for a cell without connections.
+        Returns `None` if the measurement is not a `pandas` object
+        indexed by primary gid.
+        """
+        if measurement is None:
+            return [None] * cells.shape[0]
+        if not isinstance(measurement, (pd.DataFrame, pd.Series))\
+           or self.label_gid_primary not in measurement.index.names:
+            return None
+        gids_measured =\
+            measurement.index.get_level_values(self.label_gid_primary)\
+                             .to_numpy(np.int64)
+        order = np.argsort(gids_measured, kind="stable")
+        gids_sorted = gids_measured[order]
+        gids = cells.gid.to_numpy(np.int64)
+        begins = np.searchsorted(gids_sorted, gids, side="left")
+        ends = np.searchsorted(gids_sorted, gids, side="right")
+        return [
+            measurement.iloc[order[begin:end]] if end > begin else None
+            for begin, end in zip(begins, ends)]
+
+    def measure_batch(self,
+            circuit_model, adapter,
+            batch,
+            target_secondary,
+            **kwargs):
+        """
+        Measure a batch of primary cells.
+        """
+        LOGGER.status(
+            LOGGER.get_source_info(),
+            "batch number cells:  {}".format(
+                batch.shape[0] if isinstance(batch, pd.DataFrame) else 1))
+        return\
+            self._method(
+                circuit_model, adapter,
+                target=Record(primary=batch, secondary=target_secondary),
+                cell_properties_groupby=self.specifiers_cell_type,
+                by_soma_distance=self.by_soma_distance,
+                bin_size_soma_distance=self.bin_size_soma_distance,
+                **kwargs)
+
     def _prefixed_with_synaptic_roles(self,
             circuit_model, adapter,
             query, measurement):
@@ -647,56 +1157,54 @@ class PathwayMeasurement(WithFields):
         Add indexes, prefix columns...
         """
         if self.return_primary_info:
-            specifiers_secondary =\
-                pd.DataFrame({
-                    level: measurement.index.get_level_values(level).values
-                    for level in self.specifiers_cell_type})
-            values =\
-                measurement.values
-            columns =\
-                measurement.columns
-            _gids_primary =\
-                measurement.index.get_level_values(self.label_gid_primary)\
-                                 .to_numpy(np.int32)
-            _specifiers_primary =\
-                adapter.get_cells(circuit_model)\
-                       .iloc[_gids_primary]\
-                       [self.specifiers_cell_type]\
-                       .reset_index(drop=True)
-            gids_primary =\
-                pd.Series(_gids_primary, name="gid")
-            specifiers_primary =\
-                pd.concat(
-                    [gids_primary, _specifiers_primary],
-                    axis=1)
+            index = measurement.index
+
+            def _level(name):
+                if not isinstance(index, pd.MultiIndex):
+                    codes, uniques = pd.factorize(index)
+                    return pd.Index(uniques), codes
+                position = index.names.index(name)
+                return index.levels[position], index.codes[position]
+
+            gids, codes_gids = _level(self.label_gid_primary)
+            gids_primary = gids.to_numpy(np.int64)[codes_gids]
+            cell_type_codes =\
+                self.get_cell_type_codes(circuit_model, adapter)
+            levels_secondary =[
+                _level(specifier) for specifier in self.specifiers_cell_type]
+            levels_distance =\
+                [_level("soma_distance")] if self.by_soma_distance else []
+            levels =\
+                [gids.astype(np.int32)]\
+                + [cell_type_codes.values[specifier]
+                   for specifier in self.specifiers_cell_type]\
+                + [level for level, _ in levels_secondary + levels_distance]
+            codes =\
+                [codes_gids]\
+                + cell_type_codes.get_codes(gids_primary)\
+                + [code for _, code in levels_secondary + levels_distance]
+            names =\
+                [(query.primary_synaptic_side, "gid")]\
+                + [(query.primary_synaptic_side, specifier)
+                   for specifier in self.specifiers_cell_type]\
+                + [(query.secondary_synaptic_side, specifier)
+                   for specifier in self.specifiers_cell_type]\
+                + (["soma_distance"] if self.by_soma_distance else [])
             LOGGER.debug(
                 LOGGER.get_source_info(),
                 "pre-synaptic cell group {}".format(query.pre_synaptic_cell_group),
                 "post-synaptic cell group {}".format(query.post_synaptic_cell_group),
-                "specifiers primary: {}".format(specifiers_primary.columns),
-                "size {}".format(specifiers_primary.shape))
-
-                
-            index =\
-                pd.concat(
-                    [specifiers_primary, specifiers_secondary],
-                    axis=1,
-                    keys=[query.primary_synaptic_side,
-                          query.secondary_synaptic_side])
-            index.columns =\
-                pd.Index(index.columns.values)
-
-            if self.by_soma_distance:
-                index =\
-                    index.assign(
-                        soma_distance=measurement.index.get_level_values(
-                            "soma_distance"))
-            print(index.head())
+                "index levels: {}".format(names),
+                "size {}".format(gids_primary.shape[0]))
             return\
                 pd.DataFrame(
-                    values,
-                    columns=columns,
-                    index=pd.MultiIndex.from_frame(index))
+                    measurement.values,
+                    columns=measurement.columns,
+                    index=pd.MultiIndex(
+                        levels=levels,
+                        codes=codes,
+                        names=names,
+                        verify_integrity=False))
         else:
             return\
                 self._prefix_secondary_synaptic_side(
@@ -713,23 +1221,20 @@ class PathwayMeasurement(WithFields):
         Get binned distance of `cell`'s soma from soma of all the cells in
         `cell_group`.
         """
-        def _binned(distances):
-            bin_size =\
-                bin_size_soma_distance if bin_size_soma_distance\
-                else self.bin_size_soma_distance
-            bin_starts =\
-                bin_size * np.floor(distances / bin_size)
-            return\
-                np.array([
-                    bin_start + bin_size / 2.
-                    for bin_start in bin_starts])
+        bin_size =\
+            bin_size_soma_distance if bin_size_soma_distance\
+            else self.bin_size_soma_distance
 
         if isinstance(cell_group_from, pd.Series):
             return\
-                _binned(adapter.get_soma_distance(
-                    circuit_model,
-                    cell_group_from,
-                    cell_group_to))
+                get_bin_mids(
+                    bin_distances(
+                        adapter.get_soma_distance(
+                            circuit_model,
+                            cell_group_from,
+                            cell_group_to),
+                        bin_size),
+                    bin_size)
         elif isinstance(cell_group_from, pd.DataFrame):
             positions_from =\
                 adapter.get_soma_positions(
@@ -741,9 +1246,12 @@ class PathwayMeasurement(WithFields):
                     circuit_model,
                     cell_group_to)
             return\
-                _binned(np.linalg.norm(
-                    positions_to.values - positions_from.values,
-                    axis=1))
+                get_bin_mids(
+                    bin_soma_distances(
+                        positions_from.to_numpy(np.float64),
+                        positions_to.to_numpy(np.float64),
+                        bin_size),
+                    bin_size)
 
     @lazyfield
     def label_gid_secondary(self):
@@ -883,16 +1391,40 @@ class PathwayMeasurement(WithFields):
             `PathwayMeasurement._method(...)` does not know how to handle
             `cell_info` {}.
             """.format(target.primary))
+        target_secondary =\
+            target.secondary.gid.to_numpy(np.int32)
+        if self.filter_by_upper_bound_soma_distance:
+            target_secondary =\
+                self.get_gids_within_upper_bound(
+                    circuit_model, adapter,
+                    target_primary,
+                    target_secondary)
+            if target_secondary.shape[0] == 0:
+                return None
         connections =\
             self.get_connections(
                 circuit_model, adapter,
                 target_primary,
-                target.secondary.gid.to_numpy(np.int32))
+                target_secondary)
         if connections.empty:
             return None
 
         measurement = self.get_measurement(connections)
         variables = list(measurement.keys())
+        if self.engine == GroupByEngine.COLUMNAR:
+            return\
+                summed_connections(
+                    self.get_cell_type_codes(
+                        circuit_model, adapter,
+                        specifiers_cell_type=cell_properties_groupby),
+                    _gids_measured(connections),
+                    _gids_connected(connections),
+                    measurement,
+                    self.label_gid_primary,
+                    by_soma_distance=by_soma_distance,
+                    bin_size_soma_distance=bin_size_soma_distance,
+                    upper_bound_soma_distance=self.upper_bound_soma_distance)
+
         variables_groupby =\
             cell_properties_groupby +(
                 [self.label_gid_primary, "soma_distance"]
@@ -909,10 +1441,13 @@ class PathwayMeasurement(WithFields):
         secondary_gids =\
             connections[self.label_gid_secondary].to_numpy(np.int32)
         cells_connected =\
-            adapter.get_cells(circuit_model)\
-                   .loc[secondary_gids]\
-                   .assign(**{self.label_gid_primary: primary_gids})\
-                   .assign(**measurement)
+            self.get_cells_connected(
+                circuit_model, adapter,
+                secondary_gids,
+                self.get_properties_connected(
+                    cell_properties_groupby, by_soma_distance))\
+                .assign(**{self.label_gid_primary: primary_gids})\
+                .assign(**measurement)
 
         if by_soma_distance or self.filter_by_upper_bound_soma_distance:
             def _soma_distance(other_cells):
@@ -958,9 +1493,21 @@ class PathwayMeasurement(WithFields):
 
     def collector(self,
                 aggregate=None,
-                combine=lambda u, v: u + v,
+                combine=None,
                 transform=None):
-        """"..."""
+        """
+        Get a method to collect measurements of a pathway.
+
+        Arguments
+        -------------
+        aggregate :: Aggregators to summarize each group of measurements.
+        ~            If not provided, all the measurements will be collected.
+        combine :: Combine aggregates of two batches. If not provided, and
+        ~          `aggregate` can be computed from sufficient statistics,
+        ~          batches will be accumulated and summarized in one step,
+        ~          otherwise they will be aggregated together.
+        transform :: Applied to each row of the summarized result.
+        """
         def _collect(
                 circuit_model, adapter,
                 pre_synaptic_cell_group={},
@@ -1034,6 +1581,17 @@ class PathwayMeasurement(WithFields):
             return result.dropna()
         return _collect
 
+    def summary(self,
+            circuit_model, adapter,
+            **kwargs):
+        """
+        Summarize measurements of a pathway with `self.summaries`.
+        """
+        return\
+            self.collector(self.summaries)(
+                circuit_model, adapter,
+                **kwargs)
+
     def number_pairs(self,
             circuit_model, adapter,
             pre_synaptic_cell_group={},
@@ -1062,21 +1620,63 @@ class PathwayMeasurement(WithFields):
                     "size"
                 )
             )
-        if target.primary.shape[0] * target.secondary.shape[0] > 1.e9:
-            raise ValueError(
-                """
-                A target of size primary: {}, secondary {}
-                is too big to process.
-                \t choose a smaller target.
-                """.format(target.primary.shape[0],
-                           target.secondary.shape[0]))
-        return self.with_field_values(
-            connectivity=Connectivity.COMPLETE,
-            target=self.target
-        ).collector("sum")(
+        number_pairs =\
+            self.get_number_pairs_by_soma_distance(
+                circuit_model, adapter,
+                target.primary,
+                target.secondary,
+                bin_size_soma_distance=kwargs.get(
+                    "bin_size_soma_distance", self.bin_size_soma_distance))
+        return\
+            self._prefix_secondary_synaptic_side(query, number_pairs)\
+            if prefixed else number_pairs
+
+    def get_number_pairs_by_soma_distance(self,
             circuit_model, adapter,
-            pre_synaptic_cell_group=pre_synaptic_cell_group,
-            post_synaptic_cell_group=post_synaptic_cell_group,
-            prefixed=prefixed,
-            **kwargs
-        )
+            cells_primary,
+            cells_secondary,
+            bin_size_soma_distance=None):
+        """
+        Number of pairs of primary and secondary cells, by cell-type of the
+        secondary cell and binned soma-distance, counted without
+        materializing the pairs.
+
+        Returns
+        ------------
+        `pandas.Series` indexed by cell-type specifiers and soma-distance
+        (bin mid-points), with only the non-zero counts.
+        """
+        bin_size =\
+            bin_size_soma_distance if bin_size_soma_distance\
+            else self.bin_size_soma_distance
+        specifiers = list(self.specifiers_cell_type)
+        if specifiers:
+            codes, values =\
+                pd.MultiIndex.from_frame(cells_secondary[specifiers])\
+                             .factorize()
+            number_cell_types = len(values)
+        else:
+            codes = np.zeros(cells_secondary.shape[0], dtype=np.int64)
+            number_cell_types = 1
+        counts =\
+            count_pairs_by_soma_distance(
+                adapter.get_soma_positions(circuit_model, cells_primary)\
+                       .to_numpy(np.float64),
+                adapter.get_soma_positions(circuit_model, cells_secondary)\
+                       .to_numpy(np.float64),
+                codes,
+                number_cell_types,
+                bin_size_soma_distance=bin_size)
+        index_codes, index_bins = np.nonzero(counts)
+        soma_distances = bin_size * index_bins + bin_size / 2.
+        index =\
+            pd.MultiIndex.from_arrays(
+                [values.get_level_values(level)[index_codes]
+                 for level, _ in enumerate(specifiers)]
+                + [soma_distances],
+                names=specifiers + ["soma_distance"])\
+            if specifiers else\
+               pd.Index(soma_distances, name="soma_distance")
+        return\
+            pd.Series(counts[index_codes, index_bins], index=index)\
+              .sort_index()
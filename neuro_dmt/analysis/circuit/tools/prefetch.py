@@ -0,0 +1,230 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Read the connections of upcoming batches in the background,
+while the current batch is being measured.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields
+from dmt.tk.journal import Logger
+
+LOGGER = Logger(client=__file__)
+
+
+def _get_gids(cells):
+    """
+    Gids of a batch of cells, or of a single cell.
+    """
+    if isinstance(cells, pd.DataFrame):
+        return cells.gid.to_numpy(np.int32)
+    if isinstance(cells, pd.Series):
+        return np.array([cells.gid], dtype=np.int32)
+    return np.asarray(cells, dtype=np.int32)
+
+
+def _get_size(connections):
+    """
+    Number of bytes used by connections that have been read.
+    """
+    try:
+        return int(connections.memory_usage(index=True).sum())
+    except AttributeError:
+        return 0
+
+
+class PrefetchingAdapter:
+    """
+    Wrap an adapter, answering calls to `get_connections(...)`
+    for gids whose connections have been prefetched, and delegating
+    everything else to the wrapped adapter.
+    """
+    def __init__(self, adapter):
+        """..."""
+        self._adapter = adapter
+        self._prefetched = {}
+
+    @property
+    def wrapped(self):
+        """
+        The adapter that is wrapped.
+        """
+        return self._adapter
+
+    def __getattr__(self, attribute):
+        """..."""
+        return getattr(self._adapter, attribute)
+
+    @staticmethod
+    def get_key(gids, direction):
+        """..."""
+        return (direction, np.asarray(gids, dtype=np.int32).tobytes())
+
+    def add(self, key, future):
+        """..."""
+        self._prefetched[key] = future
+
+    def discard(self, key):
+        """
+        Forget prefetched connections.
+        Returns `True` if they were never asked for.
+        """
+        return self._prefetched.pop(key, None) is not None
+
+    def get_connections(self, circuit_model, cell_group, direction, **kwargs):
+        """
+        Connections of cells in `cell_group`, that were prefetched, if
+        they were requested without any other arguments.
+        """
+        if not kwargs:
+            future =\
+                self._prefetched.pop(
+                    self.get_key(_get_gids(cell_group), direction), None)
+            if future is not None:
+                return future.result()
+        return\
+            self._adapter.get_connections(
+                circuit_model, cell_group, direction, **kwargs)
+
+
+class ConnectionPrefetcher(WithFields):
+    """
+    Pipeline the reading of connections (I/O bound) with the measurement
+    of batches (CPU bound). While a batch is measured, the connections of
+    up to `queue_depth` following batches are read by a bounded pool of
+    threads. Reading ahead pauses while the connections read, or being read,
+    and not yet measured, reach `memory_limit` bytes.
+    """
+    circuit_model = Field(
+        """
+        Circuit model to read connections from.
+        """)
+    adapter = Field(
+        """
+        Adapter whose `get_connections(...)` reads the connections.
+        """)
+    direction = Field(
+        """
+        AFF / EFF.
+        """)
+    queue_depth = Field(
+        """
+        Number of batches to read connections of ahead of the batch
+        being measured.
+        """,
+        __default_value__=2)
+    memory_limit = Field(
+        """
+        Maximum number of bytes of connections read ahead.
+        """,
+        __default_value__=2 ** 30)
+    number_threads = Field(
+        """
+        Number of threads to read connections in.
+        """,
+        __default_value__=1)
+
+    @lazyfield
+    def prefetching_adapter(self):
+        """
+        Adapter to measure batches with, that will find the connections
+        read ahead.
+        """
+        return PrefetchingAdapter(self.adapter)
+
+    def _read(self, gids):
+        """..."""
+        return\
+            self.adapter.get_connections(
+                self.circuit_model, gids, direction=self.direction)
+
+    def _size_ahead(self, queue):
+        """
+        Number of bytes of connections read ahead, counting a read still in
+        flight as large as the largest read done so far. Reads in flight
+        are waited for, oldest first, while that estimate reaches the
+        memory limit, or cannot be made. The oldest read will be needed
+        first, to measure the next batch.
+        """
+        def _size(future):
+            return\
+                _get_size(future.result())\
+                if future.exception() is None else 0
+
+        futures = [future for _, _, future in queue if future is not None]
+        while True:
+            sizes = [_size(future) for future in futures if future.done()]
+            reading = [future for future in futures if not future.done()]
+            if not reading:
+                return sum(sizes)
+            if sizes:
+                size = sum(sizes) + len(reading) * max(sizes)
+                if size < self.memory_limit:
+                    return size
+            reading[0].exception()
+
+    def iterate(self, batches):
+        """
+        Iterate over batches, reading the connections of batches
+        to come in the background.
+        Measure the yielded batches with `self.prefetching_adapter`.
+
+        If the connections of a batch were not used to measure it,
+        no more connections will be read ahead.
+        """
+        batches = iter(batches)
+        queue = deque()
+        reading = True
+        with ThreadPoolExecutor(max_workers=self.number_threads) as executor:
+            def _enqueue():
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    return False
+                if not reading\
+                   or self._size_ahead(queue) >= self.memory_limit:
+                    queue.append((batch, None, None))
+                    return True
+                gids = _get_gids(batch)
+                key = PrefetchingAdapter.get_key(gids, self.direction)
+                future = executor.submit(self._read, gids)
+                self.prefetching_adapter.add(key, future)
+                queue.append((batch, key, future))
+                return True
+
+            while len(queue) <= self.queue_depth and _enqueue():
+                pass
+            while queue:
+                batch, key, future = queue.popleft()
+                yield batch
+                if key is not None\
+                   and self.prefetching_adapter.discard(key):
+                    LOGGER.info(
+                        LOGGER.get_source_info(),
+                        """
+                        Connections read ahead were not used to measure
+                        a batch. Stop reading connections ahead.
+                        """)
+                    reading = False
+                    for _, key_ahead, _ in queue:
+                        if key_ahead is not None:
+                            self.prefetching_adapter.discard(key_ahead)
+                while len(queue) <= self.queue_depth and _enqueue():
+                    pass
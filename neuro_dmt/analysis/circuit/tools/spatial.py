@@ -0,0 +1,586 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Spatial index of cell soma positions.
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+from dmt.tk.field import Field, lazyfield, WithFields
+from neuro_dmt.utils.geometry.distance import bin_distances, bin_soma_distances
+from .columnar import XYZ
+
+
+class SomaPositionGrid(WithFields):
+    """
+    Cell gids binned into a uniform grid of cubic voxels by their soma
+    positions, to find cells near a group of cells without computing
+    distances to all the cells in a circuit.
+
+    Gids in each voxel are stored contiguously, in CSR layout:
+    gids of the i-th voxel are `gids_sorted[starts[i]:starts[i+1]]`.
+    """
+    positions = Field(
+        """
+        `np.ndarray<float>` of shape (number gids, 3) providing soma positions,
+        indexed by gid. Gids that are not in the circuit should have NaN
+        positions.
+        """)
+    voxel_size = Field(
+        """
+        Length of the side of a (cubic) voxel.
+        Queries will be fastest for radii close to the voxel size.
+        """)
+    size_block = Field(
+        """
+        Maximum number of pairwise distances to compute at once.
+        """,
+        __default_value__=2 ** 22)
+
+    @classmethod
+    def from_cells(cls, cells, positions, voxel_size, **kwargs):
+        """
+        Grid for cells.
+
+        Arguments
+        --------------
+        cells :: pandas.DataFrame of cells indexed by gid
+        positions :: pandas.DataFrame with soma positions of `cells`
+        voxel_size :: length of the side of a voxel
+        """
+        gids = cells.index.to_numpy(np.int64)
+        size = gids.max() + 1 if gids.shape[0] > 0 else 0
+        dense_positions = np.full((size, 3), np.nan)
+        dense_positions[gids] = positions[XYZ].to_numpy(np.float64)
+        return cls(positions=dense_positions, voxel_size=voxel_size, **kwargs)
+
+    @lazyfield
+    def gids(self):
+        """
+        Gids with a position.
+        """
+        return np.flatnonzero(~np.any(np.isnan(self.positions), axis=1))
+
+    @lazyfield
+    def origin(self):
+        """..."""
+        if self.gids.shape[0] == 0:
+            return np.zeros(3)
+        return np.min(self.positions[self.gids], axis=0)
+
+    @lazyfield
+    def shape(self):
+        """
+        Number of voxels along each axis.
+        """
+        if self.gids.shape[0] == 0:
+            return np.ones(3, dtype=np.int64)
+        return 1 + self._voxel_coordinates(
+            np.max(self.positions[self.gids], axis=0)[np.newaxis, :])[0]
+
+    def _voxel_coordinates(self, positions):
+        """..."""
+        return np.floor(
+            (positions - self.origin) / self.voxel_size
+        ).astype(np.int64)
+
+    def _flat(self, voxel_coordinates):
+        """
+        Flat voxel indices, -1 for coordinates outside the grid.
+        """
+        inside = np.all(
+            (voxel_coordinates >= 0) & (voxel_coordinates < self.shape),
+            axis=1)
+        flat = np.full(voxel_coordinates.shape[0], -1, dtype=np.int64)
+        flat[inside] = np.ravel_multi_index(
+            voxel_coordinates[inside].T, self.shape)
+        return flat
+
+    @lazyfield
+    def voxels(self):
+        """
+        Flat voxel index of each gid in `self.gids`.
+        """
+        return self._flat(self._voxel_coordinates(self.positions[self.gids]))
+
+    @lazyfield
+    def gids_sorted(self):
+        """
+        Gids ordered by voxel.
+        """
+        return self.gids[np.argsort(self.voxels, kind="stable")]
+
+    @lazyfield
+    def starts(self):
+        """
+        Offsets of each voxel's gids in `self.gids_sorted`.
+        """
+        counts = np.bincount(self.voxels, minlength=np.prod(self.shape))
+        return np.concatenate([[0], np.cumsum(counts)])
+
+    @lazyfield
+    def voxels_occupied(self):
+        """
+        Flat indices of the voxels that contain cells, in order.
+        """
+        return np.flatnonzero(np.diff(self.starts))
+
+    @lazyfield
+    def bounds_occupied(self):
+        """
+        Lower and upper corners of the box bounding the somas in each of
+        `self.voxels_occupied`, tighter than the voxels themselves.
+        """
+        positions = self.positions[self.gids_sorted]
+        begins = self.starts[self.voxels_occupied]
+        return (
+            np.minimum.reduceat(positions, begins, axis=0),
+            np.maximum.reduceat(positions, begins, axis=0))
+
+    def _gids_in_voxels(self, flat_voxels):
+        """..."""
+        flat_voxels = flat_voxels[flat_voxels >= 0]
+        begins = self.starts[flat_voxels]
+        ends = self.starts[flat_voxels + 1]
+        lengths = ends - begins
+        if lengths.sum() == 0:
+            return np.array([], dtype=np.int64)
+        offsets = np.repeat(begins - np.cumsum(lengths) + lengths, lengths)
+        return self.gids_sorted[offsets + np.arange(lengths.sum())]
+
+    def get_gids_within(self, gids_from, radius):
+        """
+        Gids of cells with soma within `radius` of any of the somas of
+        cells `gids_from`.
+
+        Returns
+        -------------
+        A sorted `np.ndarray` of gids.
+        """
+        positions_from = self.positions[np.asarray(gids_from, dtype=np.int64)]
+        positions_from = positions_from[~np.any(np.isnan(positions_from), axis=1)]
+        if positions_from.shape[0] == 0:
+            return np.array([], dtype=np.int64)
+
+        reach = int(np.ceil(radius / self.voxel_size))
+        offsets = np.stack(
+            np.meshgrid(*(3 * [np.arange(-reach, reach + 1)]), indexing="ij"),
+            axis=-1
+        ).reshape(-1, 3)
+        coordinates_from = self._voxel_coordinates(positions_from)
+        voxels_from, inverse = np.unique(
+            coordinates_from, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order_from = np.argsort(inverse, kind="stable")
+        starts_from = np.concatenate([
+            [0], np.cumsum(np.bincount(inverse, minlength=voxels_from.shape[0]))])
+
+        radius_squared = radius * radius
+        within = []
+        for index_voxel, voxel in enumerate(voxels_from):
+            candidates =\
+                self._gids_in_voxels(self._flat(voxel + offsets))
+            if candidates.shape[0] == 0:
+                continue
+            sources =\
+                positions_from[
+                    order_from[starts_from[index_voxel]:starts_from[index_voxel + 1]]]
+            positions_candidates = self.positions[candidates]
+            size_chunk = max(1, self.size_block // sources.shape[0])
+            for begin in range(0, candidates.shape[0], size_chunk):
+                chunk = positions_candidates[begin:begin + size_chunk]
+                distances_squared = np.sum(
+                    (chunk[:, np.newaxis, :] - sources[np.newaxis, :, :]) ** 2,
+                    axis=2)
+                within.append(
+                    candidates[begin:begin + size_chunk][
+                        np.any(distances_squared <= radius_squared, axis=1)])
+        if not within:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(within))
+
+    @staticmethod
+    def _shape_roi(roi):
+        """
+        Describe a region of interest, which may be a `Cuboid`, a `Sphere`,
+        or a bounding box given as a pair of opposite corners.
+
+        Returns
+        -------------
+        Record-like tuple (kind, a, b, closed) where for a box `a` and `b`
+        are the lower and upper corners, and for a sphere the center and
+        the radius.
+        """
+        closed = getattr(roi, "closed", True)
+        if hasattr(roi, "radius"):
+            return (
+                "sphere",
+                np.asarray(roi.position_center, dtype=np.float64),
+                float(roi.radius),
+                closed)
+        if hasattr(roi, "position_corner_0"):
+            corners = (roi.position_corner_0, roi.position_corner_1)
+        elif isinstance(roi, Mapping):
+            corners = (roi["position_corner_0"], roi["position_corner_1"])
+        else:
+            corners = roi
+        corners = np.asarray(corners, dtype=np.float64)
+        return (
+            "box",
+            np.min(corners, axis=0),
+            np.max(corners, axis=0),
+            closed)
+
+    def _contains(self, shape_roi, positions):
+        """
+        Mask of `positions` inside a region of interest.
+        """
+        kind, a, b, closed = shape_roi
+        check = np.less_equal if closed else np.less
+        if kind == "sphere":
+            return check(np.sum((positions - a) ** 2, axis=1), b * b)
+        return np.all(check(a, positions) & check(positions, b), axis=1)
+
+    def _voxels_roi(self, shape_roi):
+        """
+        Voxels that overlap a region of interest.
+
+        Returns
+        -------------
+        A tuple of arrays (flat indices of the voxels whose cells are all in the
+        region, flat indices of the voxels whose cells may be in the region).
+        """
+        kind, a, b, closed = shape_roi
+        lower, upper =\
+            (a - b, a + b) if kind == "sphere" else (a, b)
+        begin = np.maximum(self._voxel_coordinates(lower[np.newaxis, :])[0], 0)
+        end = np.minimum(
+            self._voxel_coordinates(upper[np.newaxis, :])[0] + 1, self.shape)
+        if np.any(end <= begin):
+            empty = np.array([], dtype=np.int64)
+            return empty, empty
+        coordinates = np.stack(
+            np.meshgrid(
+                *(np.arange(b_, e_) for b_, e_ in zip(begin, end)),
+                indexing="ij"),
+            axis=-1
+        ).reshape(-1, 3)
+        voxel_lower = self.origin + coordinates * self.voxel_size
+        voxel_upper = voxel_lower + self.voxel_size
+        if kind == "sphere":
+            farthest = np.maximum(np.abs(voxel_lower - a), np.abs(voxel_upper - a))
+            nearest = np.maximum(0., np.maximum(voxel_lower - a, a - voxel_upper))
+            inside = np.sum(farthest ** 2, axis=1) < b * b
+            overlaps = np.sum(nearest ** 2, axis=1) <= b * b
+        else:
+            inside = np.all(
+                (voxel_lower > a) | (closed & (voxel_lower >= a)), axis=1
+            ) & np.all(voxel_upper < b, axis=1)
+            overlaps = np.ones(coordinates.shape[0], dtype=bool)
+        flat = np.ravel_multi_index(coordinates.T, self.shape)
+        return flat[inside], flat[overlaps & ~inside]
+
+    def get_gids_in(self, roi):
+        """
+        Gids of cells with soma in a region of interest.
+
+        Arguments
+        -------------
+        roi :: A `Cuboid`, a `Sphere`, or a bounding box given as a pair of
+        ~      opposite corners.
+
+        Returns
+        -------------
+        A sorted `np.ndarray` of gids.
+        """
+        shape_roi = self._shape_roi(roi)
+        voxels_inside, voxels_partial = self._voxels_roi(shape_roi)
+        candidates = self._gids_in_voxels(voxels_partial)
+        return np.sort(np.concatenate([
+            self._gids_in_voxels(voxels_inside),
+            candidates[
+                self._contains(shape_roi, self.positions[candidates])]]))
+
+    def count_in(self, rois):
+        """
+        Number of cells with soma in each of several regions of interest.
+        Cells of voxels entirely inside a region are counted without looking
+        at their positions, and the positions of cells in voxels that straddle
+        the boundary of a region are checked for all regions at once.
+
+        Returns
+        -------------
+        `np.ndarray<int64>` of counts, one for each region of interest.
+        """
+        shapes = [self._shape_roi(roi) for roi in rois]
+        counts_voxels = np.diff(self.starts)
+        counts = np.zeros(len(shapes), dtype=np.int64)
+        partial_roi = []
+        partial_voxels = []
+        for index_roi, shape_roi in enumerate(shapes):
+            voxels_inside, voxels_partial = self._voxels_roi(shape_roi)
+            counts[index_roi] = counts_voxels[voxels_inside].sum()
+            partial_roi.append(
+                np.repeat(index_roi, counts_voxels[voxels_partial].sum()))
+            partial_voxels.append(voxels_partial)
+        if not partial_voxels:
+            return counts
+
+        candidates =\
+            self._gids_in_voxels(np.concatenate(partial_voxels))
+        roi_candidates = np.concatenate(partial_roi).astype(np.int64)
+        positions = self.positions[candidates]
+        inside = np.zeros(candidates.shape[0], dtype=bool)
+        for kind, closed in (("box", True), ("box", False),
+                             ("sphere", True), ("sphere", False)):
+            of_kind = np.array([
+                shape_roi[0] == kind and bool(shape_roi[3]) == closed
+                for shape_roi in shapes], dtype=bool)
+            if not np.any(of_kind):
+                continue
+            selected = of_kind[roi_candidates]
+            a = np.array([
+                shape_roi[1] if of_kind[i] else np.zeros(3)
+                for i, shape_roi in enumerate(shapes)])
+            b = np.array([
+                shape_roi[2] if of_kind[i] else
+                   (0. if kind == "sphere" else np.zeros(3))
+                for i, shape_roi in enumerate(shapes)])
+            check = np.less_equal if closed else np.less
+            rois_selected = roi_candidates[selected]
+            if kind == "sphere":
+                inside[selected] = check(
+                    np.sum((positions[selected] - a[rois_selected]) ** 2, axis=1),
+                    b[rois_selected] ** 2)
+            else:
+                inside[selected] = np.all(
+                    check(a[rois_selected], positions[selected])
+                    & check(positions[selected], b[rois_selected]),
+                    axis=1)
+        return counts + np.bincount(
+            roi_candidates[inside], minlength=len(shapes))
+
+
+#Number of `to` cells above which pairs are binned one `from` cell at a time.
+SIZE_ROW = 2 ** 12
+
+#Mean number of pairs of cells in pairs of voxels below which bounding the
+#soma-distances of pairs of voxels costs more than it saves.
+PAIRS_PER_VOXEL_PAIR = 64
+
+
+def _norms(deltas):
+    """
+    Norms along the last axis of `deltas`, summing the squares in the same
+    order as `bin_soma_distances`.
+    """
+    squares = deltas * deltas
+    return np.sqrt((squares[..., 0] + squares[..., 1]) + squares[..., 2])
+
+
+def _count_pairs(
+        positions_from,
+        positions_to,
+        codes_to,
+        bin_size,
+        counts,
+        size_block):
+    """
+    Add the number of all the pairs of cells `from` and `to`, by the code of
+    the `to` cell and the soma-distance bin, to `counts` of shape
+    (number codes, number bins), in blocks of at most `size_block` pairs.
+    """
+    number_to = positions_to.shape[0]
+    if number_to == 0:
+        return counts
+    number_bins = counts.shape[1]
+    counts_flat = counts.reshape(-1)
+    if number_to >= SIZE_ROW:
+        #a single `from` position shared by all the pairs is not gathered
+        codes_to = codes_to * number_bins
+        bins = np.empty(number_to, dtype=np.int64)
+        for position_from in positions_from:
+            bin_soma_distances(position_from, positions_to, bin_size, out=bins)
+            np.minimum(bins, number_bins - 1, out=bins)
+            counts_flat +=\
+                np.bincount(
+                    codes_to + bins, minlength=counts_flat.shape[0])
+        return counts
+    size_chunk = max(1, size_block // number_to)
+    for begin in range(0, positions_from.shape[0], size_chunk):
+        number_from = min(size_chunk, positions_from.shape[0] - begin)
+        bins =\
+            bin_soma_distances(
+                positions_from[begin:begin + number_from], positions_to,
+                bin_size,
+                indices_from=np.repeat(np.arange(number_from), number_to),
+                indices_to=np.tile(np.arange(number_to), number_from))
+        np.minimum(bins, number_bins - 1, out=bins)
+        counts_flat +=\
+            np.bincount(
+                np.tile(codes_to, number_from) * number_bins + bins,
+                minlength=counts_flat.shape[0])
+    return counts
+
+
+def count_pairs_by_soma_distance(
+        positions_primary,
+        positions_secondary,
+        codes_secondary,
+        number_codes,
+        bin_size_soma_distance=100.,
+        voxel_size=None,
+        size_block=2 ** 22):
+    """
+    Count pairs of primary and secondary cells, by the cell-type of the
+    secondary cell and the binned soma-distance between the pair's cells,
+    without materializing the pairs.
+    Cells on each side are binned into a `SomaPositionGrid`. All the pairs
+    of cells in a pair of voxels are counted together when the bounds of
+    their soma-distances fall in the same bin. Soma-distances are computed,
+    with `bin_soma_distances`, only for pairs of voxels that straddle a bin
+    boundary, or for all the pairs when cells are too sparse for pairs of
+    voxels to hold many pairs of cells.
+
+    Arguments
+    --------------
+    positions_primary :: np.ndarray of shape (number primary cells, 3)
+    positions_secondary :: np.ndarray of shape (number secondary cells, 3)
+    codes_secondary :: np.ndarray<int> cell-type code of secondary cells,
+    ~                  between 0 and `number_codes`
+    number_codes :: number of cell-type codes
+    bin_size_soma_distance :: size of soma-distance bins
+    voxel_size :: length of the side of the voxels. By default, a quarter of
+    ~             the bin size, halved while pairs of voxels hold many pairs of
+    ~             cells, with at most 128 voxels along each axis.
+    size_block :: maximum number of pairs of voxels, or of cells, to compute
+    ~             distances for at a time.
+
+    Returns
+    --------------
+    np.ndarray<int64> of shape (number_codes, number bins) with the number of
+    pairs having secondary cell-type code and soma-distance bin index.
+    """
+    positions_primary = np.asarray(positions_primary, dtype=np.float64)
+    positions_secondary = np.asarray(positions_secondary, dtype=np.float64)
+    codes_secondary = np.asarray(codes_secondary, dtype=np.int64)
+    if positions_primary.shape[0] == 0 or positions_secondary.shape[0] == 0:
+        return np.zeros((number_codes, 1), dtype=np.int64)
+
+    bin_size = bin_size_soma_distance
+    corners = np.vstack([positions_primary, positions_secondary])
+    extent = corners.max(axis=0) - corners.min(axis=0)
+    number_bins = 1 + int(np.floor(np.linalg.norm(extent) / bin_size))
+    counts = np.zeros((number_codes, number_bins), dtype=np.int64)
+
+    def _grids(voxel_size):
+        return(
+            SomaPositionGrid(positions=positions_primary, voxel_size=voxel_size),
+            SomaPositionGrid(positions=positions_secondary, voxel_size=voxel_size))
+
+    def _pairs_per_voxel_pair(grid_primary, grid_secondary):
+        return\
+            positions_primary.shape[0] / grid_primary.voxels_occupied.shape[0]\
+            * positions_secondary.shape[0] / grid_secondary.voxels_occupied.shape[0]
+
+    size_smallest = np.max(extent) / 128.
+    if voxel_size:
+        grid_primary, grid_secondary = _grids(voxel_size)
+    else:
+        voxel_size = max(bin_size / 4., size_smallest)
+        grid_primary, grid_secondary = _grids(voxel_size)
+        #halving voxels leaves about 64 times fewer pairs in a pair of voxels
+        while voxel_size / 2. >= size_smallest > 0.\
+              and _pairs_per_voxel_pair(grid_primary, grid_secondary)\
+              >= 64 * PAIRS_PER_VOXEL_PAIR:
+            voxel_size = voxel_size / 2.
+            grid_primary, grid_secondary = _grids(voxel_size)
+    if _pairs_per_voxel_pair(grid_primary, grid_secondary) < PAIRS_PER_VOXEL_PAIR:
+        return\
+            _count_pairs(
+                positions_primary, positions_secondary, codes_secondary,
+                bin_size, counts, size_block)
+
+    sizes_secondary =\
+        np.diff(grid_secondary.starts)[grid_secondary.voxels_occupied]
+    number_voxels_secondary = sizes_secondary.shape[0]
+    lower_primary, upper_primary = grid_primary.bounds_occupied
+    lower_secondary, upper_secondary = grid_secondary.bounds_occupied
+    begins_primary = grid_primary.starts[grid_primary.voxels_occupied]
+    ends_primary = grid_primary.starts[grid_primary.voxels_occupied + 1]
+    codes_voxels_secondary =\
+        np.bincount(
+            np.repeat(np.arange(number_voxels_secondary), sizes_secondary)
+            * number_codes
+            + codes_secondary[grid_secondary.gids_sorted],
+            minlength=number_voxels_secondary * number_codes
+        ).reshape(number_voxels_secondary, number_codes)
+
+    #Rounding is monotonic, and bounds are computed with the same operations
+    #as distances, so the bounds computed for a pair of voxels bound
+    #the soma-distances computed for their pairs of cells exactly.
+    weights_voxels = np.zeros(number_voxels_secondary * number_bins)
+    size_chunk = max(1, size_block // number_voxels_secondary)
+    for begin in range(0, begins_primary.shape[0], size_chunk):
+        end = min(begin + size_chunk, begins_primary.shape[0])
+        gaps =\
+            np.maximum(0., np.maximum(
+                lower_secondary[np.newaxis, :, :]
+                - upper_primary[begin:end, np.newaxis, :],
+                lower_primary[begin:end, np.newaxis, :]
+                - upper_secondary[np.newaxis, :, :]))
+        spans =\
+            np.maximum(
+                upper_secondary[np.newaxis, :, :]
+                - lower_primary[begin:end, np.newaxis, :],
+                upper_primary[begin:end, np.newaxis, :]
+                - lower_secondary[np.newaxis, :, :])
+        bins_nearest =\
+            np.minimum(
+                bin_distances(_norms(gaps), bin_size), number_bins - 1)
+        bins_farthest =\
+            np.minimum(
+                bin_distances(_norms(spans), bin_size), number_bins - 1)
+        resolved = bins_nearest == bins_farthest
+
+        voxels_primary, voxels_secondary = np.nonzero(resolved)
+        weights_voxels +=\
+            np.bincount(
+                voxels_secondary * number_bins
+                + bins_nearest[voxels_primary, voxels_secondary],
+                weights=ends_primary[begin + voxels_primary]
+                - begins_primary[begin + voxels_primary],
+                minlength=weights_voxels.shape[0])
+
+        for index, straddling in enumerate(~resolved):
+            cells_primary =\
+                grid_primary.gids_sorted[
+                    begins_primary[begin + index]:ends_primary[begin + index]]
+            cells_secondary =\
+                grid_secondary._gids_in_voxels(
+                    grid_secondary.voxels_occupied[straddling])
+            _count_pairs(
+                positions_primary[cells_primary],
+                positions_secondary[cells_secondary],
+                codes_secondary[cells_secondary],
+                bin_size, counts, size_block)
+
+    counts_resolved =\
+        codes_voxels_secondary.T.astype(np.float64)\
+        .dot(weights_voxels.reshape(number_voxels_secondary, number_bins))
+    return counts + np.rint(counts_resolved).astype(np.int64)
@@ -0,0 +1,107 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Summarize properties of synapses, streamed in chunks, by pathway.
+"""
+
+import numpy as np
+import pandas as pd
+from .accumulator import SummaryAccumulator
+
+
+def _pathway_codes(cell_type_codes, gids_pre, gids_post):
+    """
+    A single integer code for the pathway of each synapse, and a mask of
+    the synapses whose cells have known cell-types.
+    """
+    known =\
+        cell_type_codes.is_known(gids_pre)\
+        & cell_type_codes.is_known(gids_post)
+    codes =\
+        cell_type_codes.get_codes(gids_pre[known])\
+        + cell_type_codes.get_codes(gids_post[known])
+    shape =\
+        [len(cell_type_codes.values[specifier])
+         for specifier in cell_type_codes.specifiers] * 2
+    return np.ravel_multi_index(codes, shape), known, shape
+
+
+def summarize_by_pathway(
+        chunks,
+        cell_type_codes,
+        variables=None,
+        summaries=("count", "mean", "std", "min", "max"),
+        label_pre="pre_gid",
+        label_post="post_gid"):
+    """
+    Summaries of synapse properties for each pathway, accumulated over
+    chunks of synapses without holding more than one chunk in memory.
+
+    Arguments
+    -------------
+    chunks :: iterable of `pandas.DataFrame`s, with a column for the pre-,
+    ~         and post-synaptic gids, and a column for each property.
+    cell_type_codes :: `CellTypeCodes` of the circuit's cells, whose
+    ~                  specifiers define the pathways.
+    variables :: properties to summarize, all except the gids by default.
+    summaries :: summaries that can be computed by `SummaryAccumulator`.
+
+    Returns
+    -------------
+    `pandas.DataFrame` indexed by the pre-synaptic and post-synaptic
+    cell-type specifiers, (`("pre_synaptic_cell_group", "mtype")`, ...),
+    with columns organized as
+    `pandas.DataFrame.groupby(index).agg(summaries)`, or `None` if
+    there were no synapses.
+    """
+    accumulator = None
+    shape = None
+    for chunk in chunks:
+        if chunk.shape[0] == 0:
+            continue
+        if accumulator is None:
+            if variables is None:
+                variables =[
+                    column for column in chunk.columns
+                    if column not in (label_pre, label_post)]
+            accumulator =\
+                SummaryAccumulator(index=["pathway"], variables=list(variables))
+        pathways, known, shape =\
+            _pathway_codes(
+                cell_type_codes,
+                chunk[label_pre].to_numpy(np.int64),
+                chunk[label_post].to_numpy(np.int64))
+        accumulator.update(
+            pd.DataFrame(
+                {variable: chunk[variable].to_numpy()[known]
+                 for variable in variables}
+            ).assign(pathway=pathways))
+
+    if accumulator is None:
+        return None
+    summary = accumulator.summary(list(summaries))
+    codes = np.unravel_index(summary.index.to_numpy(np.int64), shape)
+    specifiers = cell_type_codes.specifiers
+    summary.index =\
+        pd.MultiIndex.from_arrays(
+            [cell_type_codes.decode(specifier, code)
+             for specifier, code in zip(specifiers * 2, codes)],
+            names=(
+                [("pre_synaptic_cell_group", specifier) for specifier in specifiers]
+                + [("post_synaptic_cell_group", specifier)
+                   for specifier in specifiers]))
+    return summary
@@ -0,0 +1,173 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+A small circuit, and an adapter for it, to test circuit tools.
+"""
+
+from collections.abc import Iterable
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields
+
+XYZ = ["x", "y", "z"]
+
+
+class TinyCircuit(WithFields):
+    """
+    A circuit with randomly placed cells of a few mtypes,
+    randomly connected.
+    """
+    number_cells = Field(
+        """
+        Number of cells in the circuit.
+        """,
+        __default_value__=400)
+    mtypes = Field(
+        """
+        Mtypes of the circuit's cells.
+        """,
+        __default_value__=["L23_MC", "L4_TPC", "L5_TPC:A", "L6_UPC"])
+    layers = Field(
+        """
+        Layers of the circuit's cells.
+        """,
+        __default_value__=[2, 4, 5, 6])
+    mean_afferent_degree = Field(
+        """
+        Mean number of afferent connections of a cell.
+        """,
+        __default_value__=40)
+    size = Field(
+        """
+        Length of a side of the cube the cells are placed in.
+        """,
+        __default_value__=500.)
+    seed = Field(
+        """
+        Random seed.
+        """,
+        __default_value__=13)
+
+    @lazyfield
+    def random_state(self):
+        return np.random.RandomState(self.seed)
+
+    @lazyfield
+    def cells(self):
+        """
+        Cells, indexed by their gid.
+        """
+        rs = self.random_state
+        n = self.number_cells
+        index_mtype = rs.randint(len(self.mtypes), size=n)
+        positions = self.size * rs.random_sample((n, 3))
+        cells = pd.DataFrame({
+            "layer": np.array(self.layers)[index_mtype],
+            "mtype": np.array(self.mtypes)[index_mtype],
+            "etype": np.array(["bNAC", "cADpyr"])[rs.randint(2, size=n)],
+            "x": positions[:, 0],
+            "y": positions[:, 1],
+            "z": positions[:, 2]})
+        return cells.assign(gid=cells.index.values)
+
+    @lazyfield
+    def connections(self):
+        """
+        Connections, `pandas.DataFrame<pre_gid, post_gid, strength>`,
+        sorted by post-synaptic and then pre-synaptic gid.
+        """
+        rs = self.random_state
+        n = self.number_cells
+        degrees = rs.poisson(self.mean_afferent_degree, size=n)
+        post_gids = np.repeat(np.arange(n), degrees)
+        pre_gids = rs.randint(n, size=post_gids.shape[0])
+        connections = pd.DataFrame({
+            "pre_gid": pre_gids,
+            "post_gid": post_gids})
+        connections = connections[
+            connections.pre_gid != connections.post_gid
+        ].drop_duplicates(
+        ).sort_values(
+            ["post_gid", "pre_gid"]
+        ).reset_index(drop=True)
+        return connections.assign(
+            strength=1. + rs.poisson(4., size=connections.shape[0]))
+
+
+class TinyCircuitAdapter:
+    """
+    Adapter for `TinyCircuit`, providing the methods used by circuit tools.
+    """
+    def get_cells(self, circuit_model, properties=None, target=None, **query):
+        """..."""
+        cells = circuit_model.cells
+        for variable, value in query.items():
+            if isinstance(value, (list, set, frozenset)):
+                cells = cells[cells[variable].isin(value)]
+            else:
+                cells = cells[cells[variable] == value]
+        if isinstance(target, Iterable) and not isinstance(target, str):
+            cells = cells.reindex(np.unique(list(target))).dropna()
+        return cells if properties is None else cells[properties]
+
+    def get_mtypes(self, circuit_model):
+        """..."""
+        return sorted(circuit_model.mtypes)
+
+    def get_cell_types(self, circuit_model, query):
+        """..."""
+        return\
+            circuit_model.cells[list(query)]\
+                         .drop_duplicates()\
+                         .sort_values(list(query))\
+                         .reset_index(drop=True)
+
+    def get_soma_positions(self, circuit_model, cells):
+        """..."""
+        try:
+            return cells[XYZ]
+        except KeyError:
+            return circuit_model.cells.loc[cells.index.to_numpy(np.int32)][XYZ]
+
+    def get_soma_distance(self, circuit_model, cell, cell_group, bin_size=100):
+        """..."""
+        return np.linalg.norm(
+            cell_group[XYZ].to_numpy(np.float64)
+            - cell[XYZ].to_numpy(np.float64),
+            axis=1)
+
+    def get_connections(self,
+            circuit_model, cell_group, direction,
+            cell_group_other=None):
+        """..."""
+        def _gids(cells):
+            return\
+                cells.gid.values if isinstance(cells, pd.DataFrame) else\
+                np.asarray(cells)
+        label, label_other =\
+            ("post_gid", "pre_gid") if direction in ("AFF", "afferent") else\
+            ("pre_gid", "post_gid")
+        connections = circuit_model.connections
+        selected = np.in1d(connections[label].values, _gids(cell_group))
+        if cell_group_other is not None:
+            selected &= np.in1d(
+                connections[label_other].values, _gids(cell_group_other))
+        return connections[selected].reset_index(drop=True)
+
+
+circuit_model = TinyCircuit()
+adapter = TinyCircuitAdapter()
@@ -0,0 +1,99 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmark binning soma-distances of cell pairs.
+
+Run as
+    python -m neuro_dmt.analysis.circuit.tools.test.benchmark_soma_distance \
+        [number_pairs] [number_cells]
+to bin the soma-distances of `number_pairs` (10^8 by default) random pairs of
+`number_cells` cells, in chunks of 10^7 pairs, with the full-array NumPy
+expressions used before, and with the blocked kernel in float64 and float32.
+"""
+
+import sys
+import time
+import numpy as np
+from neuro_dmt.utils.geometry.distance import bin_soma_distances
+
+SIZE_CHUNK = 10 ** 7
+
+
+def _reference(positions, indices_from, indices_to, bin_size):
+    """
+    Bins computed for the whole chunk of pairs at once.
+    """
+    return\
+        np.floor(
+            np.linalg.norm(
+                positions[indices_to] - positions[indices_from], axis=1)
+            / bin_size
+        ).astype(np.int64)
+
+
+def _kernel(dtype):
+    """..."""
+    def _bins(positions, indices_from, indices_to, bin_size, out):
+        return\
+            bin_soma_distances(
+                positions, positions, bin_size,
+                indices_from=indices_from, indices_to=indices_to,
+                dtype=dtype, out=out)
+    return _bins
+
+
+def run(number_pairs=10 ** 8, number_cells=10 ** 5, bin_size=100.):
+    """
+    Time each method, and return the elapsed seconds by method.
+    """
+    random = np.random.RandomState(0)
+    positions = 2000. * random.random_sample((number_cells, 3))
+    positions_float32 = positions.astype(np.float32)
+    out = np.empty(SIZE_CHUNK, dtype=np.int64)
+    methods ={
+        "reference": lambda i, j, out:
+            _reference(positions, i, j, bin_size),
+        "kernel_float64": lambda i, j, out:
+            _kernel(np.float64)(positions, i, j, bin_size, out),
+        "kernel_float32": lambda i, j, out:
+            _kernel(np.float32)(positions_float32, i, j, bin_size, out)}
+    elapsed = {method: 0. for method in methods}
+    mismatches = {method: 0 for method in methods}
+    for begin in range(0, number_pairs, SIZE_CHUNK):
+        size = min(SIZE_CHUNK, number_pairs - begin)
+        indices_from = random.randint(0, number_cells, size=size)
+        indices_to = random.randint(0, number_cells, size=size)
+        expected = None
+        for method, bins in methods.items():
+            start = time.perf_counter()
+            result = bins(indices_from, indices_to, out[:size])
+            elapsed[method] += time.perf_counter() - start
+            if expected is None:
+                expected = result.copy()
+            else:
+                mismatches[method] += int(np.sum(result != expected))
+    for method in methods:
+        print("{:>16}: {:8.3f} s, {:8.1f} M pairs / s, {} bins differ".format(
+            method,
+            elapsed[method],
+            number_pairs / elapsed[method] / 1.e6,
+            mismatches[method]))
+    return elapsed
+
+
+if __name__ == "__main__":
+    run(*[int(argument) for argument in sys.argv[1:3]])
@@ -0,0 +1,130 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test develop accumulating sufficient statistics of dataframes.
+"""
+import numpy as np
+import pandas as pd
+from .. import SummaryAccumulator, Pandamonad
+
+SUMMARIES = ["count", "sum", "mean", "std", "var", "min", "max"]
+
+
+def _batches(number_batches, size=20, seed=7):
+    """
+    Batches of measurements indexed by a mtype and a soma distance.
+    """
+    rs = np.random.RandomState(seed)
+    for _ in range(number_batches):
+        index = pd.MultiIndex.from_arrays(
+            [rs.choice(["L2_TPC", "L4_SS", "L5_TPC", "L6_BC"], size=size),
+             rs.choice([50., 150., 250.], size=size)],
+            names=["mtype", "soma_distance"])
+        values = rs.poisson(5., size=(size, 2)).astype(np.float64)
+        values[rs.random_sample(size) < 0.1, 1] = np.nan
+        yield pd.DataFrame(values, columns=["number", "strength"], index=index)
+
+
+def _expected(batches, summaries):
+    """..."""
+    return pd.concat(batches).groupby(["mtype", "soma_distance"]).agg(summaries)
+
+
+def test_summary_matches_pandas():
+    """
+    Summaries of accumulated statistics should be what pandas computes.
+    """
+    batches = list(_batches(10))
+    accumulated =\
+        SummaryAccumulator(index=["mtype", "soma_distance"], capacity=2)\
+        .accumulate(batches)
+
+    pd.testing.assert_frame_equal(
+        accumulated.summary(SUMMARIES),
+        _expected(batches, SUMMARIES),
+        check_dtype=False)
+    pd.testing.assert_frame_equal(
+        accumulated.summary("sum"),
+        _expected(batches, "sum"),
+        check_dtype=False)
+
+
+def test_merged_accumulators():
+    """
+    Merging accumulators of parts of a stream should be the same as
+    accumulating the whole stream.
+    """
+    batches = list(_batches(9))
+    index = ["mtype", "soma_distance"]
+    merged = SummaryAccumulator(index=index)
+    for part in (batches[:2], batches[2:3], batches[3:]):
+        merged.merge(SummaryAccumulator(index=index).accumulate(part))
+
+    pd.testing.assert_frame_equal(
+        merged.summary(SUMMARIES),
+        SummaryAccumulator(index=index).accumulate(batches).summary(SUMMARIES))
+
+
+def test_reduce_long_stream():
+    """
+    Reducing a stream longer than the recursion limit should work,
+    with accumulated statistics as well as with a custom combinator.
+    """
+    pandamonad = Pandamonad(index=["mtype", "soma_distance"], value="number")
+    accumulated = pandamonad.reduce(_batches(5000, size=4), "count")
+    folded = pandamonad.reduce(
+        _batches(5000, size=4), "count",
+        combinator=lambda u, v: u.add(v, fill_value=0))
+
+    assert accumulated.number.sum() == 5000 * 4
+    pd.testing.assert_frame_equal(accumulated, folded, check_dtype=False)
+
+
+def test_reduce_summaries_that_cannot_be_accumulated():
+    """
+    Batches reduced to summaries that cannot be computed from accumulated
+    statistics, such as the median, should be summarized as pandas would
+    summarize all of them together, including groups missing from some
+    of the batches.
+    """
+    batches = list(_batches(6, size=10))
+    assert any(
+        len(batch.groupby(["mtype", "soma_distance"])) < 12
+        for batch in batches)
+    pandamonad = Pandamonad(index=["mtype", "soma_distance"], value="number")
+    summaries = ["mean", "median", "mad", "std"]
+
+    pd.testing.assert_frame_equal(
+        pandamonad.reduce(iter(batches), summaries),
+        _expected(batches, summaries))
+    pd.testing.assert_frame_equal(
+        pandamonad.reduce(iter(batches), ["mean", "median"]),
+        _expected(batches, ["mean", "median"]))
+    assert pandamonad.reduce(iter([None, None]), summaries) is None
+
+
+def test_accumulate_series():
+    """
+    A series should be accumulated as a dataframe with a single column.
+    """
+    batches = [batch.number for batch in _batches(4)]
+    pd.testing.assert_frame_equal(
+        SummaryAccumulator(index=["mtype", "soma_distance"])\
+        .accumulate(batches)\
+        .summary(SUMMARIES),
+        _expected([batch.to_frame() for batch in batches], SUMMARIES),
+        check_dtype=False)
@@ -0,0 +1,126 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test develop checkpointing batches of pathway measurements.
+"""
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from neuro_dmt import terminology
+from .. import PathwayMeasurement, CheckpointStore
+from ..checkpoint import fingerprint
+from .import circuit_model, adapter
+
+
+def _pathway_measurement(**kwargs):
+    """..."""
+    return PathwayMeasurement(
+        direction="EFF",
+        value={"number": lambda connections: 1.},
+        specifiers_cell_type=["mtype"],
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        processing_methodology=terminology.processing_methodology.batch,
+        batch_size=40,
+        return_primary_info=True,
+        **kwargs)
+
+
+def test_save_load(tmpdir):
+    """
+    A saved batch should load as the same dataframe.
+    """
+    store = CheckpointStore(path=str(tmpdir))
+    measurement =\
+        pd.DataFrame(
+            {("number", "sum"): [1., 2., 3.], "strength": [4, 5, 6]},
+            index=pd.MultiIndex.from_arrays(
+                [["L2", "L3", "L3"], [50., 50., 150.]],
+                names=[("pre_synaptic_cell", "mtype"), "soma_distance"]))
+    store.save("key", 0, measurement)
+    store.save("key", 1, measurement.strength)
+    store.save("key", 3, None)
+
+    assert store.get_completed("key") == {0, 1, 3}
+    pd.testing.assert_frame_equal(store.load("key", 0), measurement)
+    pd.testing.assert_series_equal(store.load("key", 1), measurement.strength)
+    assert store.load("key", 3) is None
+
+
+def test_resume(tmpdir):
+    """
+    A resumed run should measure only the batches that were not saved,
+    and collect the same result as an uninterrupted run.
+    """
+    expected = _pathway_measurement().collector("sum")(circuit_model, adapter)
+
+    pathway_measurement = _pathway_measurement(checkpoints=str(tmpdir))
+    first = pathway_measurement.collector("sum")(circuit_model, adapter)
+    pd.testing.assert_frame_equal(first, expected)
+
+    paths = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(str(tmpdir)) for name in names]
+    assert len([path for path in paths if path.endswith(".json")]) == 10
+    for path in paths:
+        if os.path.basename(path).startswith(("batch_00000002", "batch_00000007")):
+            os.remove(path)
+
+    measured = []
+    measure_batch = pathway_measurement.measure_batch
+    def _measure_batch(circuit_model, adapter, batch, *args, **kwargs):
+        measured.append(batch.gid.values[0])
+        return measure_batch(circuit_model, adapter, batch, *args, **kwargs)
+    pathway_measurement.measure_batch = _measure_batch
+
+    resumed = pathway_measurement.collector("sum")(circuit_model, adapter)
+    assert measured == [80, 280]
+    pd.testing.assert_frame_equal(resumed, expected)
+
+
+def test_resume_random_sample(tmpdir):
+    """
+    A resumed run of a measurement of randomly sampled cells should sample
+    the same cells, and load the batches saved in the previous run.
+    """
+    pathway_measurement =\
+        _pathway_measurement(checkpoints=str(tmpdir)).with_fields(
+            sampling_methodology=terminology.sampling_methodology.random,
+            sample_size=20,
+            batch_size=5)
+    first = pathway_measurement.collector("sum")(circuit_model, adapter)
+
+    measured = []
+    measure_batch = pathway_measurement.measure_batch
+    def _measure_batch(circuit_model, adapter, batch, *args, **kwargs):
+        measured.append(batch.gid.values[0])
+        return measure_batch(circuit_model, adapter, batch, *args, **kwargs)
+    pathway_measurement.measure_batch = _measure_batch
+
+    resumed = pathway_measurement.collector("sum")(circuit_model, adapter)
+    assert measured == []
+    pd.testing.assert_frame_equal(resumed, first)
+
+
+def test_fingerprint_requires_stable_identity():
+    """
+    A value that cannot be identified in another process should not be
+    fingerprinted by its memory address.
+    """
+    assert fingerprint(np.int64(3)) == fingerprint(3)
+    with pytest.raises(TypeError):
+        fingerprint(object())
@@ -0,0 +1,271 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test develop the columnar group-by engine for pathway measurements.
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Record
+from neuro_dmt import terminology
+from .. import GroupByEngine, PathwayMeasurement, CellTypeCodes
+from ..columnar import summed_connections
+from .import circuit_model, adapter
+
+
+def _measurements(direction, **kwargs):
+    """
+    Pandas and columnar engine measurements of the same batch.
+    """
+    pathway_measurement = PathwayMeasurement(
+        direction=direction,
+        value={
+            "number": lambda connections: 1.,
+            "strength": lambda connections: connections.strength.values},
+        specifiers_cell_type=["layer", "mtype"],
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        processing_methodology=terminology.processing_methodology.batch,
+        **kwargs)
+    cells = adapter.get_cells(circuit_model)
+    target = Record(primary=cells.iloc[:100], secondary=cells)
+
+    def _measure(engine):
+        return pathway_measurement.with_fields(engine=engine)._method(
+            circuit_model, adapter,
+            target=target,
+            cell_properties_groupby=pathway_measurement.specifiers_cell_type,
+            by_soma_distance=pathway_measurement.by_soma_distance,
+            bin_size_soma_distance=pathway_measurement.bin_size_soma_distance)
+
+    return Record(
+        pandas=_measure(GroupByEngine.PANDAS),
+        columnar=_measure(GroupByEngine.COLUMNAR))
+
+
+def test_cell_type_codes():
+    """
+    Codes should decode to the cell-type values they encode.
+    """
+    cells = adapter.get_cells(circuit_model)
+    codes = CellTypeCodes.from_cells(cells, ["layer", "mtype"], positions=cells)
+    gids = cells.index.values[::7]
+    layer_codes, mtype_codes = codes.get_codes(gids)
+
+    assert np.all(codes.decode("layer", layer_codes) == cells.layer.values[gids])
+    assert np.all(codes.decode("mtype", mtype_codes) == cells.mtype.values[gids])
+    assert np.all(codes.is_known(gids))
+    assert not np.any(codes.is_known(np.array([-1, cells.shape[0] + 10])))
+
+
+def test_cell_type_codes_missing_and_mixed_values():
+    """
+    Cells with missing, or mixed types of, values should be summed like a
+    pandas group-by sums them, and connections to cells that were not
+    encoded should not be dropped silently.
+    """
+    cells =\
+        pd.DataFrame(
+            {"layer": [2, "L3", 4, 2, "L3"],
+             "mtype": ["L2_TPC", np.nan, "L4_SS", "L2_TPC", "L3_TPC"]},
+            index=pd.Index([0, 1, 2, 4, 5]))
+    codes = CellTypeCodes.from_cells(cells, ["layer", "mtype"])
+    gids_primary = np.array([0, 0, 1, 2, 2])
+    gids_secondary = np.array([1, 2, 4, 5, 4])
+    summed =\
+        summed_connections(
+            codes, gids_primary, gids_secondary, {"number": 1.}, "post_gid")
+    expected =\
+        cells.loc[gids_secondary]\
+             .assign(post_gid=gids_primary, number=1.)\
+             .groupby(["layer", "mtype", "post_gid"])\
+             .agg("sum")
+    assert set(summed.index) == set(expected.index)
+    assert np.all(summed.number.loc[expected.index].values == expected.number.values)
+    with pytest.raises(KeyError):
+        summed_connections(codes, [0], [3], {"number": 1.}, "post_gid")
+
+
+def test_columnar_engine_afferent():
+    """
+    Columnar engine should sum connections just like pandas.
+    """
+    measured = _measurements("AFF")
+    pd.testing.assert_frame_equal(
+        measured.columnar, measured.pandas, check_dtype=False)
+
+
+def test_columnar_engine_efferent_by_soma_distance():
+    """
+    Columnar engine should bin soma-distances just like pandas.
+    """
+    measured = _measurements(
+        "EFF", by_soma_distance=True, bin_size_soma_distance=50.)
+    pd.testing.assert_frame_equal(
+        measured.columnar, measured.pandas, check_dtype=False)
+
+
+def test_columnar_engine_upper_bound_soma_distance():
+    """
+    Columnar engine should drop pairs beyond soma-distance upper bound.
+    """
+    measured = _measurements("AFF", upper_bound_soma_distance=250.)
+    pd.testing.assert_frame_equal(
+        measured.columnar, measured.pandas, check_dtype=False)
+
+
+def test_number_pairs_by_soma_distance():
+    """
+    Pairs counted without materializing them should be the same as counted
+    from all the pairs.
+    """
+    pathway_measurement = PathwayMeasurement(
+        direction="AFF",
+        value={"number": lambda connections: 1.},
+        specifiers_cell_type=["layer", "mtype"],
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        by_soma_distance=True,
+        bin_size_soma_distance=75.)
+    cells = adapter.get_cells(circuit_model)
+    primary = cells.iloc[:30]
+    number_pairs =\
+        pathway_measurement.number_pairs(
+            circuit_model, adapter,
+            target=Record(primary=primary, secondary=cells),
+            prefixed=False)
+
+    pairs = pathway_measurement.get_pairs(primary.gid.values, cells.gid.values)
+    distances = np.linalg.norm(
+        cells.loc[pairs.pre_gid.values][["x", "y", "z"]].values
+        - cells.loc[pairs.post_gid.values][["x", "y", "z"]].values,
+        axis=1)
+    expected =\
+        cells.loc[pairs.pre_gid.values, ["layer", "mtype"]]\
+             .assign(soma_distance=75. * np.floor(distances / 75.) + 37.5)\
+             .groupby(["layer", "mtype", "soma_distance"])\
+             .agg("size")
+    pd.testing.assert_series_equal(number_pairs, expected, check_dtype=False)
+    assert number_pairs.sum() == primary.shape[0] * cells.shape[0]
+
+
+def test_number_pairs_by_soma_distance_without_specifiers():
+    """
+    Pairs should be counted by soma distance alone, when there are no
+    cell-type specifiers.
+    """
+    pathway_measurement = PathwayMeasurement(
+        direction="AFF",
+        value={"number": lambda connections: 1.},
+        specifiers_cell_type=[],
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        by_soma_distance=True,
+        bin_size_soma_distance=75.)
+    cells = adapter.get_cells(circuit_model)
+    primary = cells.iloc[:30]
+    number_pairs =\
+        pathway_measurement.number_pairs(
+            circuit_model, adapter,
+            target=Record(primary=primary, secondary=cells),
+            prefixed=False)
+
+    pairs = pathway_measurement.get_pairs(primary.gid.values, cells.gid.values)
+    distances = np.linalg.norm(
+        cells.loc[pairs.pre_gid.values][["x", "y", "z"]].values
+        - cells.loc[pairs.post_gid.values][["x", "y", "z"]].values,
+        axis=1)
+    expected =\
+        pd.DataFrame({"soma_distance": 75. * np.floor(distances / 75.) + 37.5})\
+          .groupby(["soma_distance"])\
+          .agg("size")
+    pd.testing.assert_series_equal(number_pairs, expected, check_dtype=False)
+
+
+def test_prefixed_with_primary_info():
+    """
+    Primary cell-type specifiers gathered from shared codes should be those
+    of the primary cells, and codes should be shared between measurements.
+    """
+    def _pathway_measurement(direction):
+        return PathwayMeasurement(
+            direction=direction,
+            value={"number": lambda connections: 1.},
+            specifiers_cell_type=["layer", "mtype"],
+            sampling_methodology=terminology.sampling_methodology.exhaustive,
+            processing_methodology=terminology.processing_methodology.batch,
+            by_soma_distance=True,
+            return_primary_info=True)
+    afferent = _pathway_measurement("AFF")
+    efferent = _pathway_measurement("EFF")
+    assert afferent.get_cell_type_codes(circuit_model, adapter) is\
+        efferent.get_cell_type_codes(circuit_model, adapter)
+
+    cells = adapter.get_cells(circuit_model)
+    measurement = afferent._method(
+        circuit_model, adapter,
+        target=Record(primary=cells.iloc[:50], secondary=cells),
+        cell_properties_groupby=["layer", "mtype"],
+        by_soma_distance=True)
+    query = Record(
+        primary_synaptic_side="post_synaptic_cell",
+        secondary_synaptic_side="pre_synaptic_cell",
+        pre_synaptic_cell_group={},
+        post_synaptic_cell_group={})
+    prefixed = afferent._prefixed_with_synaptic_roles(
+        circuit_model, adapter, query, measurement)
+
+    gids = measurement.index.get_level_values("post_gid").values
+    index = prefixed.index.to_frame(index=False)
+    assert np.all(index[("post_synaptic_cell", "gid")].values == gids)
+    for specifier in ("layer", "mtype"):
+        assert np.all(
+            index[("post_synaptic_cell", specifier)].values
+            == cells[specifier].values[gids])
+        assert np.all(
+            index[("pre_synaptic_cell", specifier)].values
+            == measurement.index.get_level_values(specifier).values)
+    assert np.all(
+        index["soma_distance"].values
+        == measurement.index.get_level_values("soma_distance").values)
+    assert np.all(prefixed.values == measurement.values)
+
+
+def test_prefixed_without_specifiers():
+    """
+    Measurements grouped only by primary gid should be prefixed with it.
+    """
+    pathway_measurement = PathwayMeasurement(
+        direction="AFF",
+        value={"indegree": lambda connections: 1.},
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        processing_methodology=terminology.processing_methodology.batch,
+        return_primary_info=True)
+    cells = adapter.get_cells(circuit_model)
+    measurement = pathway_measurement._method(
+        circuit_model, adapter,
+        target=Record(primary=cells.iloc[:50], secondary=cells),
+        cell_properties_groupby=[])
+    query = Record(
+        primary_synaptic_side="post_synaptic_cell",
+        secondary_synaptic_side="pre_synaptic_cell",
+        pre_synaptic_cell_group={},
+        post_synaptic_cell_group={})
+    prefixed = pathway_measurement._prefixed_with_synaptic_roles(
+        circuit_model, adapter, query, measurement)
+
+    assert prefixed.index.names == [("post_synaptic_cell", "gid")]
+    assert np.all(
+        prefixed.index.get_level_values(0).values == measurement.index.values)
+    assert np.all(prefixed.indegree.values == measurement.indegree.values)
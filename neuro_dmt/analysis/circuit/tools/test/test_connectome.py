@@ -0,0 +1,65 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test develop pathway matrices from one pass over a connectome.
+"""
+import numpy as np
+import pandas as pd
+from .. import ConnectomeMatrices
+from .import circuit_model, adapter
+
+
+def test_matrices():
+    """
+    Matrices should agree with statistics computed from the edge list.
+    """
+    cells = adapter.get_cells(circuit_model)
+    target = cells[cells.layer != 6]
+    matrices = ConnectomeMatrices.measure(
+        circuit_model, adapter, target, batch_size=37)
+
+    connections = circuit_model.connections
+    connections = connections[
+        np.in1d(connections.pre_gid, target.gid)
+        & np.in1d(connections.post_gid, target.gid)]
+    pathways =\
+        connections.assign(
+            pre_mtype=cells.mtype.values[connections.pre_gid],
+            post_mtype=cells.mtype.values[connections.post_gid])\
+        .groupby(["pre_mtype", "post_mtype"])
+    number_cells = target.mtype.value_counts()
+
+    probability = matrices.get_connection_probability()
+    synapse_count = matrices.get_synapse_count()
+    for (pre, post), pathway in pathways:
+        assert probability.loc[pre, post] ==\
+            pathway.shape[0] / (number_cells[pre] * number_cells[post])
+        assert np.isclose(
+            synapse_count.loc[pre, post], pathway.strength.mean())
+
+    indegree = matrices.get_indegree({"mtype": "L4_TPC"})
+    expected = connections[
+        cells.mtype.values[connections.post_gid] == "L4_TPC"
+    ].groupby("post_gid").size()
+    assert np.all(indegree.sort_index().values == expected.values)
+
+    outdegree = matrices.get_outdegree("L23_MC")
+    expected = connections[
+        cells.mtype.values[connections.post_gid] == "L23_MC"
+    ].groupby("pre_gid").size()
+    assert np.all(outdegree.index.values == expected.index.values)
+    assert np.all(outdegree.values == expected.values)
@@ -0,0 +1,122 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test measuring cells processed serially in micro-batches.
+"""
+import pandas as pd
+from neuro_dmt import terminology
+from .. import PathwayMeasurement
+from .import circuit_model, adapter
+
+
+def _pathway_measurement(**kwargs):
+    """..."""
+    return PathwayMeasurement(
+        direction="AFF",
+        value={"number": lambda connections: 1.},
+        specifiers_cell_type=["mtype"],
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        processing_methodology=terminology.processing_methodology.serial,
+        return_primary_info=True,
+        **kwargs)
+
+
+def test_micro_batches_measure_each_cell():
+    """
+    Measuring cells in micro-batches should produce the same measurement
+    for each cell as measuring them one at a time, with fewer adapter calls.
+    """
+    one_at_a_time = _pathway_measurement(micro_batch_size=1)
+    micro_batched = _pathway_measurement(micro_batch_size=16)
+
+    calls = []
+    get_connections = adapter.get_connections
+    def _get_connections(*args, **kwargs):
+        calls.append(1)
+        return get_connections(*args, **kwargs)
+    adapter.get_connections = _get_connections
+    try:
+        expected = list(one_at_a_time.sample(circuit_model, adapter))
+        number_calls_expected = len(calls)
+        del calls[:]
+        measured = list(micro_batched.sample(circuit_model, adapter))
+    finally:
+        del adapter.get_connections
+
+    assert len(calls) < number_calls_expected
+    _assert_same_measurements(measured, expected)
+
+
+def _assert_same_measurements(measured, expected):
+    """
+    Measurements should match one to one, `None` for `None`.
+    """
+    assert len(measured) == len(expected)
+    for value, value_expected in zip(measured, expected):
+        if value_expected is None:
+            assert value is None
+        else:
+            pd.testing.assert_frame_equal(value, value_expected)
+
+
+def test_cells_are_measured_one_at_a_time_by_default():
+    """
+    Micro-batching should have to be asked for.
+    """
+    assert not _pathway_measurement().measures_micro_batches
+
+
+def test_micro_batches_filtered_by_soma_distance():
+    """
+    A cell whose connections are all filtered out by soma distance should
+    be measured as it would be on its own.
+    """
+    def _measured(micro_batch_size):
+        return list(
+            _pathway_measurement(
+                micro_batch_size=micro_batch_size,
+                upper_bound_soma_distance=50.,
+                bin_size_soma_distance=25.)\
+            .sample(circuit_model, adapter))
+
+    expected = _measured(1)
+    assert any(
+        value is not None and value.empty for value in expected)
+    _assert_same_measurements(_measured(16), expected)
+
+
+def test_split_measurement_not_indexed_by_gid():
+    """
+    A measurement that is not indexed by primary gid cannot be split by cell.
+    """
+    measurement = _pathway_measurement(micro_batch_size=16)
+    cells = circuit_model.cells.iloc[:4]
+    assert measurement._split_by_cell(cells, 1.) is None
+    assert measurement._split_by_cell(
+        cells, pd.DataFrame({"number": [1., 2.]})) is None
+    assert measurement._split_by_cell(cells, None) == [None] * 4
+
+
+def test_micro_batches_collect():
+    """
+    Micro-batching should not change a collected summary.
+    """
+    pd.testing.assert_frame_equal(
+        _pathway_measurement(micro_batch_size=7)\
+            .collector("sum")(circuit_model, adapter),
+        _pathway_measurement(micro_batch_size=1)\
+            .collector("sum")(circuit_model, adapter))
@@ -0,0 +1,153 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test develop measuring pathway batches in a pool of processes.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from neuro_dmt import terminology
+from .. import GroupByEngine, PathwayMeasurement, CellTypeCodes
+from ..columnar import CellTable
+from ..parallel import measure_batches
+from .import circuit_model, adapter, TinyCircuitAdapter
+
+
+def _pathway_measurement(**kwargs):
+    """..."""
+    return PathwayMeasurement(
+        direction="AFF",
+        value={"number": lambda connections: 1.},
+        specifiers_cell_type=["mtype"],
+        sampling_methodology=terminology.sampling_methodology.exhaustive,
+        processing_methodology=terminology.processing_methodology.batch,
+        batch_size=50,
+        **{"engine": GroupByEngine.COLUMNAR, **kwargs})
+
+
+class _ParentAdapter(TinyCircuitAdapter):
+    """
+    Adapter that reads cells only in the process it was created in.
+    """
+    def __init__(self):
+        self.pid = os.getpid()
+
+    def get_cells(self, *args, **kwargs):
+        """..."""
+        assert os.getpid() == self.pid, "Cells read in a worker process."
+        return super().get_cells(*args, **kwargs)
+
+
+def test_saved_cell_type_codes_are_memory_mapped(tmpdir):
+    """
+    Saved cell-type codes should load as memory-mapped arrays.
+    """
+    cells = adapter.get_cells(circuit_model)
+    codes = CellTypeCodes.from_cells(cells, ["layer", "mtype"], positions=cells)
+    loaded = CellTypeCodes.load(codes.save(str(tmpdir.join("codes"))))
+
+    assert loaded.specifiers == ["layer", "mtype"]
+    assert isinstance(loaded.codes["mtype"], np.memmap)
+    assert isinstance(loaded.positions, np.memmap)
+    assert np.all(loaded.codes["mtype"] == codes.codes["mtype"])
+    assert np.all(loaded.values["mtype"] == codes.values["mtype"])
+    assert np.allclose(loaded.positions, codes.positions)
+
+
+def test_parallel_sample_matches_serial():
+    """
+    Batches measured in a pool of processes should be collected in order,
+    to obtain the same result as serial measurement.
+    """
+    serial =\
+        _pathway_measurement().collector()(
+            circuit_model, adapter, prefixed=False)
+    parallel =\
+        _pathway_measurement(number_processes=3).collector()(
+            circuit_model, adapter, prefixed=False)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+    serial_sum =\
+        _pathway_measurement().collector("sum")(
+            circuit_model, adapter, prefixed=False)
+    parallel_sum =\
+        _pathway_measurement(number_processes=3).collector("sum")(
+            circuit_model, adapter, prefixed=False)
+    pd.testing.assert_frame_equal(parallel_sum, serial_sum)
+
+
+def test_saved_cell_table_is_memory_mapped(tmpdir):
+    """
+    A saved table of cells should load memory-mapped, and provide the same
+    properties of cells as the table it was made from.
+    """
+    cells =\
+        adapter.get_cells(circuit_model)\
+               .assign(region=lambda cells: cells.layer.map(
+                   {2: "L2", 4: "L4", 5: "L5", 6: "L6"}).astype("category"))
+    loaded =\
+        CellTable.load(
+            CellTable.from_cells(cells).save(str(tmpdir.join("cells"))))
+    assert isinstance(loaded.columns["mtype"], np.memmap)
+    assert isinstance(loaded.columns["x"], np.memmap)
+
+    gids = np.array([17, 3, 3, 250])
+    properties = ["layer", "mtype", "region", "x"]
+    pd.testing.assert_frame_equal(
+        loaded.get(gids, properties), cells.loc[gids, properties])
+    assert CellTable.cached_for(circuit_model, properties) is None
+    with pytest.raises(KeyError):
+        loaded.get(np.array([cells.shape[0]]), properties)
+
+
+def test_parallel_pandas_engine_shares_cells():
+    """
+    Worker processes should measure batches with the PANDAS engine
+    reading cells from the table shared with them.
+    """
+    serial =\
+        _pathway_measurement(engine=GroupByEngine.PANDAS).collector("sum")(
+            circuit_model, adapter, prefixed=False)
+    parallel =\
+        _pathway_measurement(
+            engine=GroupByEngine.PANDAS, number_processes=3
+        ).collector("sum")(
+            circuit_model, _ParentAdapter(), prefixed=False)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+def test_batches_are_submitted_in_a_window():
+    """
+    Batches should not all be submitted to the worker processes at once.
+    """
+    pathway_measurement = _pathway_measurement()
+    cells = adapter.get_cells(circuit_model)
+    submitted = []
+    def _batches():
+        for begin in range(0, cells.shape[0], 10):
+            submitted.append(begin)
+            yield cells.iloc[begin:begin + 10]
+
+    measurements =\
+        measure_batches(
+            pathway_measurement, circuit_model, adapter,
+            _batches(), cells,
+            number_processes=2)
+    next(measurements)
+    assert len(submitted) <= 5
+    assert len(list(measurements)) == cells.shape[0] // 10 - 1
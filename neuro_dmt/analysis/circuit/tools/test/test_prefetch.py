@@ -0,0 +1,150 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test reading connections of batches ahead of their measurement.
+"""
+import threading
+import time
+import pandas as pd
+from neuro_dmt import terminology
+from .. import PathwayMeasurement
+from ..prefetch import ConnectionPrefetcher
+from .import circuit_model, adapter
+
+
+class _CountingAdapter:
+    """
+    Adapter that counts the calls to `get_connections`, by thread,
+    taking `delay` seconds to read connections.
+    """
+    def __init__(self, delay=0.):
+        self.threads = []
+        self.delay = delay
+
+    def get_connections(self, circuit_model, cell_group, direction, **kwargs):
+        """..."""
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return\
+            adapter.get_connections(
+                circuit_model, cell_group, direction, **kwargs)
+
+
+def _batches(size=8):
+    """..."""
+    cells = adapter.get_cells(circuit_model)
+    return [
+        cells.iloc[begin:begin + size]
+        for begin in range(0, cells.shape[0], size)]
+
+
+def test_prefetched_connections_are_used():
+    """
+    Connections of batches should be read in the background, and found
+    when the batches are measured.
+    """
+    counting = _CountingAdapter()
+    prefetcher =\
+        ConnectionPrefetcher(
+            circuit_model=circuit_model, adapter=counting,
+            direction="AFF", queue_depth=2)
+    for batch in prefetcher.iterate(_batches()):
+        connections =\
+            prefetcher.prefetching_adapter.get_connections(
+                circuit_model, batch, direction="AFF")
+        pd.testing.assert_frame_equal(
+            connections,
+            adapter.get_connections(circuit_model, batch, direction="AFF"))
+    assert len(counting.threads) == len(_batches())
+    assert threading.main_thread() not in counting.threads
+
+
+def test_reading_ahead_stops():
+    """
+    Connections should not be read ahead when they are not used,
+    or when the memory limit is reached.
+    """
+    batches = _batches()
+
+    counting = _CountingAdapter()
+    prefetcher =\
+        ConnectionPrefetcher(
+            circuit_model=circuit_model, adapter=counting,
+            direction="AFF", queue_depth=2)
+    assert len(list(prefetcher.iterate(batches))) == len(batches)
+    assert len(counting.threads) <= 3
+
+    counting = _CountingAdapter()
+    prefetcher =\
+        ConnectionPrefetcher(
+            circuit_model=circuit_model, adapter=counting,
+            direction="AFF", queue_depth=2, memory_limit=0)
+    assert len(list(prefetcher.iterate(batches))) == len(batches)
+    assert len(counting.threads) == 0
+
+
+def test_memory_limit_counts_reads_in_flight():
+    """
+    Connections still being read should count against the memory limit.
+    """
+    prefetcher =\
+        ConnectionPrefetcher(
+            circuit_model=circuit_model, adapter=_CountingAdapter(delay=0.02),
+            direction="AFF", queue_depth=4, memory_limit=1)
+    for batch in prefetcher.iterate(_batches()):
+        assert len(prefetcher.prefetching_adapter._prefetched) <= 1
+        prefetcher.prefetching_adapter.get_connections(
+            circuit_model, batch, direction="AFF")
+
+
+def test_prefetching_is_opt_in():
+    """
+    Connections should be read ahead only when asked for.
+    """
+    assert not PathwayMeasurement(
+        direction="AFF",
+        value={"number": lambda connections: 1.},
+        specifiers_cell_type=["mtype"]).prefetches_connections
+
+
+def test_sample_with_prefetching():
+    """
+    Measurements should not depend on connections being read ahead.
+    """
+    def _pathway_measurement(**kwargs):
+        return PathwayMeasurement(
+            direction="AFF",
+            value={"number": lambda connections: 1.},
+            specifiers_cell_type=["mtype"],
+            sampling_methodology=terminology.sampling_methodology.exhaustive,
+            processing_methodology=terminology.processing_methodology.batch,
+            batch_size=8,
+            return_primary_info=True,
+            **kwargs)
+
+    expected =\
+        list(_pathway_measurement(prefetch_depth=0).sample(
+            circuit_model, adapter))
+    measured =\
+        list(_pathway_measurement(prefetch_depth=2).sample(
+            circuit_model, adapter))
+    assert len(measured) == len(expected)
+    for m, e in zip(measured, expected):
+        if e is None:
+            assert m is None
+        else:
+            pd.testing.assert_frame_equal(m, e)
@@ -0,0 +1,229 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test develop the spatial index of soma positions.
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Record
+from neuro_dmt import terminology
+from neuro_dmt.utils.geometry.roi import Sphere
+from .. import PathwayMeasurement, SomaPositionGrid
+from .. import spatial
+from ..prefetch import PrefetchingAdapter
+from .import circuit_model, adapter, XYZ
+
+
+def test_gids_within_radius():
+    """
+    Cells found using the grid should be the same as found by brute force.
+    """
+    cells = adapter.get_cells(circuit_model)
+    positions = cells[XYZ].to_numpy(np.float64)
+    gids_from = cells.index.values[:25]
+    for voxel_size, radius in [(100., 100.), (60., 150.), (400., 75.)]:
+        grid = SomaPositionGrid.from_cells(
+            cells, cells, voxel_size=voxel_size, size_block=100)
+        distances = np.linalg.norm(
+            positions[:, np.newaxis, :] - positions[np.newaxis, gids_from, :],
+            axis=2)
+        expected = cells.index.values[np.any(distances <= radius, axis=1)]
+        assert np.all(grid.get_gids_within(gids_from, radius) == expected)
+
+
+def test_upper_bound_soma_distance():
+    """
+    Restricting secondary cells before fetching connections should measure
+    the same as filtering all the connections by binned soma-distance.
+    """
+    upper_bound = 180.
+    bin_size = 50.
+    cells = adapter.get_cells(circuit_model)
+    primary = cells.iloc[:100]
+    measured =\
+        PathwayMeasurement(
+            direction="AFF",
+            value={"number": lambda connections: 1.},
+            specifiers_cell_type=["mtype"],
+            sampling_methodology=terminology.sampling_methodology.exhaustive,
+            processing_methodology=terminology.processing_methodology.batch,
+            upper_bound_soma_distance=upper_bound,
+            bin_size_soma_distance=bin_size
+        )._method(
+            circuit_model, adapter,
+            target=Record(primary=primary, secondary=cells),
+            cell_properties_groupby=["mtype"])
+
+    connections =\
+        adapter.get_connections(circuit_model, primary, direction="AFF")
+    distances = np.linalg.norm(
+        cells.loc[connections.pre_gid.values][XYZ].values
+        - cells.loc[connections.post_gid.values][XYZ].values,
+        axis=1)
+    binned = bin_size * np.floor(distances / bin_size) + bin_size / 2.
+    expected =\
+        connections[binned < upper_bound]\
+        .assign(
+            mtype=lambda c: cells.mtype.values[c.pre_gid.values],
+            number=1.)\
+        .groupby(["mtype", "post_gid"])\
+        .agg("sum")[["number"]]
+    pd.testing.assert_frame_equal(measured, expected, check_dtype=False)
+
+
+class _AdapterWithoutOtherGroup:
+    """
+    Adapter whose `get_connections(...)` cannot restrict connections
+    to cells on their other side.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, attribute):
+        return getattr(adapter, attribute)
+
+    def get_connections(self, circuit_model, cell_group, direction):
+        self.calls.append(cell_group)
+        return adapter.get_connections(circuit_model, cell_group, direction)
+
+
+class _FailingAdapter:
+    """
+    Adapter whose `get_connections(...)` fails, with a `TypeError`,
+    when connections are restricted to cells on their other side.
+    """
+    def __getattr__(self, attribute):
+        return getattr(adapter, attribute)
+
+    def get_connections(self,
+            circuit_model, cell_group, direction, cell_group_other=None):
+        if cell_group_other is not None:
+            raise TypeError("A bug in the adapter.")
+        return adapter.get_connections(circuit_model, cell_group, direction)
+
+
+def test_restrict_connections_by_declared_argument():
+    """
+    Connections should be restricted to secondary cells only by adapters
+    that declare it, and errors of those that do should not be hidden.
+    """
+    cells = adapter.get_cells(circuit_model)
+    pathway_measurement =\
+        PathwayMeasurement(
+            direction="AFF",
+            value={"number": lambda connections: 1.},
+            specifiers_cell_type=["mtype"],
+            upper_bound_soma_distance=180.,
+            bin_size_soma_distance=50.)
+    gids_primary = cells.gid.values[:10]
+    gids_secondary = cells.gid.values[::2]
+    def _connections(adapter_reading):
+        return\
+            pathway_measurement.get_connections(
+                circuit_model, adapter_reading, gids_primary, gids_secondary
+            ).sort_values(["pre_gid", "post_gid"]).reset_index(drop=True)
+
+    expected = _connections(adapter)
+    adapter_without = _AdapterWithoutOtherGroup()
+    for adapter_reading in (adapter_without,
+                            PrefetchingAdapter(adapter_without)):
+        pd.testing.assert_frame_equal(_connections(adapter_reading), expected)
+    assert len(adapter_without.calls) == 2
+
+    with pytest.raises(TypeError):
+        _connections(_FailingAdapter())
+
+
+def test_cells_in_regions_of_interest():
+    """
+    Cells found in boxes and spheres using the grid, and their counts,
+    should be the same as found by brute force.
+    """
+    cells = adapter.get_cells(circuit_model)
+    positions = cells[XYZ].to_numpy(np.float64)
+    grid = SomaPositionGrid.from_cells(cells, cells, voxel_size=75.)
+    random = np.random.RandomState(7)
+    centers = positions[random.choice(positions.shape[0], 20)]
+    sizes = random.uniform(10., 300., (20, 3))
+    boxes = [(center - size / 2., center + size / 2.)
+             for center, size in zip(centers, sizes)]
+    spheres = [Sphere(position_center=center, radius=size[0])
+               for center, size in zip(centers, sizes)]
+
+    def _expected_box(box):
+        return cells.index.values[np.all(
+            (box[0] <= positions) & (positions <= box[1]), axis=1)]
+
+    def _expected_sphere(sphere):
+        return cells.index.values[
+            np.linalg.norm(positions - sphere.position_center, axis=1)
+            <= sphere.radius]
+
+    expected =\
+        [_expected_box(box) for box in boxes]\
+        + [_expected_sphere(sphere) for sphere in spheres]
+    rois = boxes + spheres
+    for roi, gids in zip(rois, expected):
+        np.testing.assert_array_equal(grid.get_gids_in(roi), gids)
+    np.testing.assert_array_equal(
+        grid.count_in(rois), [gids.shape[0] for gids in expected])
+    assert grid.count_in([(np.full(3, 1.e6), np.full(3, 2.e6))])[0] == 0
+
+
+def test_count_pairs_by_soma_distance(monkeypatch):
+    """
+    Pairs of clustered cells counted through grids of their somas should be
+    the same as counted from all the pairs, computing fewer distances.
+    """
+    random = np.random.RandomState(11)
+
+    def _clustered(number_cells, number_sites):
+        sites =\
+            30. * np.stack(
+                np.meshgrid(*(3 * [np.arange(number_sites)]), indexing="ij"),
+                axis=-1).reshape(-1, 3)
+        return\
+            sites[random.randint(sites.shape[0], size=number_cells)]\
+            + random.uniform(-2., 2., (number_cells, 3))
+
+    positions_primary = _clustered(2000, 4)
+    positions_secondary = _clustered(6000, 6)
+    codes = random.randint(5, size=6000)
+    distances =\
+        np.linalg.norm(
+            positions_primary[:, np.newaxis, :]
+            - positions_secondary[np.newaxis, :, :],
+            axis=2)
+    bins = np.floor(distances / 40.).astype(np.int64)
+    expected = np.zeros((5, bins.max() + 1), dtype=np.int64)
+    np.add.at(expected, (np.broadcast_to(codes, bins.shape), bins), 1)
+
+    number_distances = []
+    bin_soma_distances = spatial.bin_soma_distances
+    def _bin_soma_distances(*args, **kwargs):
+        bins = bin_soma_distances(*args, **kwargs)
+        number_distances.append(bins.shape[0])
+        return bins
+    monkeypatch.setattr(spatial, "bin_soma_distances", _bin_soma_distances)
+
+    counts =\
+        spatial.count_pairs_by_soma_distance(
+            positions_primary, positions_secondary, codes, 5,
+            bin_size_soma_distance=40., size_block=10000)
+    np.testing.assert_array_equal(counts, expected)
+    assert 0 < sum(number_distances) < distances.size / 2
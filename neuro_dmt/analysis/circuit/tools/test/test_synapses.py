@@ -0,0 +1,69 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+# more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Test summarizing synapse properties by pathway.
+"""
+import numpy as np
+import pandas as pd
+from .. import CellTypeCodes
+from ..synapses import summarize_by_pathway
+from .import circuit_model, adapter
+
+
+def test_summarize_by_pathway():
+    """
+    Summaries accumulated over chunks of synapses should be those
+    of all the synapses grouped by pathway.
+    """
+    cells = adapter.get_cells(circuit_model)
+    cell_type_codes = CellTypeCodes.from_cells(cells, ["layer", "mtype"])
+    random = np.random.RandomState(0)
+    gids = cells.index.to_numpy(np.int64)
+    synapses =\
+        pd.DataFrame({
+            "pre_gid": random.choice(gids, size=1000),
+            "post_gid": random.choice(gids, size=1000),
+            "conductance": random.random_sample(1000),
+            "delay": random.random_sample(1000)})
+
+    summary =\
+        summarize_by_pathway(
+            (synapses.iloc[begin:begin + 64]
+             for begin in range(0, synapses.shape[0], 64)),
+            cell_type_codes,
+            summaries=["count", "mean", "max"])
+
+    expected =\
+        synapses.assign(
+            pre_layer=cells.layer.loc[synapses.pre_gid].values,
+            pre_mtype=cells.mtype.loc[synapses.pre_gid].values,
+            post_layer=cells.layer.loc[synapses.post_gid].values,
+            post_mtype=cells.mtype.loc[synapses.post_gid].values
+        ).groupby(
+            ["pre_layer", "pre_mtype", "post_layer", "post_mtype"]
+        )[["conductance", "delay"]].agg(["count", "mean", "max"])
+
+    assert summary.index.names ==[
+        ("pre_synaptic_cell_group", "layer"),
+        ("pre_synaptic_cell_group", "mtype"),
+        ("post_synaptic_cell_group", "layer"),
+        ("post_synaptic_cell_group", "mtype")]
+    assert summary.shape == expected.shape
+    assert np.array_equal(
+        summary.index.to_frame().values, expected.index.to_frame().values)
+    assert np.allclose(summary.values, expected.values)
+    assert summarize_by_pathway(iter([]), cell_type_codes) is None
@@ -17,7 +17,6 @@
 """
 Document connectome of a circuit.
 """
-import numpy as np
 import pandas as pd
 from matplotlib import  pyplot as plt
 from dmt.model.interface import interfacemethod
@@ -36,7 +35,9 @@ from neuro_dmt.library.data.sscx_mouse.composition.cell_density import\
     cell_density_defelipe
 from neuro_dmt.library.data.sscx_mouse.composition.cell_ratio import\
     inhibitory_fraction_defelipe
-from neuro_dmt.analysis.circuit.tools import PathwayMeasurement
+from neuro_dmt.analysis.circuit.tools import\
+    ConnectomeMatrices,\
+    PathwayMeasurement
 
 X = terminology.bluebrain.cell.x
 Y = terminology.bluebrain.cell.y
@@ -105,6 +106,44 @@ def get(sample_size=100, target={}, **kwargs):
                     ("post_synaptic_cell_group", "mtype")])
             )
         ).for_sampling(size=1)
+    matrices_connectome = {}
+
+    def get_connectome_matrices(adapter, circuit_model):
+        """
+        Pathway matrices of the target, from a single pass over its afferent
+        connections, shared by all the connectome measurements.
+        """
+        if circuit_model not in matrices_connectome:
+            LOGGER.info(
+                LOGGER.get_source_info(),
+                """
+                Compute mtype --> mtype pathway matrices.
+                """)
+            matrices_connectome[circuit_model] =\
+                ConnectomeMatrices.measure(
+                    circuit_model, adapter,
+                    adapter.get_cells(circuit_model, **target),
+                    specifiers_cell_type=["mtype"],
+                    batch_size=10000)
+        return matrices_connectome[circuit_model]
+
+    def _pre_synaptic(pathway_matrix, post_synaptic_cell_group):
+        """
+        Values of a pathway matrix for a post-synaptic mtype,
+        indexed by pre-synaptic mtype.
+        """
+        pathway_values =\
+            pathway_matrix.get(post_synaptic_cell_group["mtype"])
+        if pathway_values is None:
+            return None
+        return\
+            pd.Series(
+                pathway_values.values,
+                index=pd.Index(
+                    pathway_values.index.values,
+                    name=("pre_synaptic_cell_group", "mtype"))
+            ).dropna()
+
     @document.methods.measurements
     def connection_probability(adapter, circuit_model, *args, **kwargs):
         """
@@ -117,38 +156,11 @@ def get(sample_size=100, target={}, **kwargs):
             """
             Compute connection probability.
             """)
-        pathway_measurement = PathwayMeasurement(
-            direction="AFF",
-            value={"number": lambda c: 1.},
-            specifiers_cell_type=["mtype"],
-            sampling_methodology=terminology.sampling_methodology.exhaustive,
-            processing_methodology=terminology.processing_methodology.batch,
-            batch_size=10000,
-            return_primary_info=True,
-            target=lambda model, adapter: adapter.get_cells(circuit_model, **target)
-        )
-        def get_one(post_synaptic_cell_group):
-            target = pathway_measurement.sample_target(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group
-            )
-            connections = pathway_measurement.collector("sum")(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group,
-                target=target,
-                prefixed=True
-            )
+        matrices = get_connectome_matrices(adapter, circuit_model)
+        probabilities = matrices.get_connection_probability()
 
-            if connections is None:
-                return None
-
-            number_pairs = pathway_measurement.number_pairs(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group,
-                target=target,
-                prefixed=True
-            )
-            return (connections.number / number_pairs).dropna()
+        def get_one(post_synaptic_cell_group):
+            return _pre_synaptic(probabilities, post_synaptic_cell_group)
 
         return measurement.collection.series_type(
             (p, get_one(**p))
@@ -167,34 +179,11 @@ def get(sample_size=100, target={}, **kwargs):
             """
             Compute synapse count.
             """)
-        strength = lambda connections: connections.strength.to_numpy(np.float)
-        pathway_measurement = PathwayMeasurement(
-            direction="AFF",
-            value=PathwayMeasurement.moments("strength", strength, n=1),
-            variable="synapse_count",
-            specifiers_cell_type=["mtype"],
-            sampling_methodology=terminology.sampling_methodology.exhaustive,
-            processing_methodology=terminology.processing_methodology.batch,
-            batch_size=10000,
-            return_primary_info=True,
-            target=lambda model, adapter: adapter.get_cells(circuit_model, **target)
-        )
-        def get_one(post_synaptic_cell_group):
-            target = pathway_measurement.sample_target(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group
-            )
-            strengths = pathway_measurement.collector("sum")(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group,
-                target=target,
-                prefixed=True
-            )
-
-            if strengths is None:
-                return None
+        matrices = get_connectome_matrices(adapter, circuit_model)
+        counts = matrices.get_synapse_count()
 
-            return (strengths.strength_1 / strengths.strength_0).dropna()
+        def get_one(post_synaptic_cell_group):
+            return _pre_synaptic(counts, post_synaptic_cell_group)
 
         return measurement.collection.series_type(
             (p, get_one(**p))
@@ -213,27 +202,12 @@ def get(sample_size=100, target={}, **kwargs):
             """
             Compute in-degree.
             """)
-        pathway_measurement = PathwayMeasurement(
-            direction="AFF",
-            value={"indegree": lambda c: 1.},
-            sampling_methodology=terminology.sampling_methodology.exhaustive,
-            processing_methodology=terminology.processing_methodology.batch,
-            batch_size=10000,
-            return_primary_info=True,
-            target=lambda model, adapter: adapter.get_cells(circuit_model, **target)
-        ).collector()
+        matrices = get_connectome_matrices(adapter, circuit_model)
 
         def get_one(post_synaptic_cell_group):
-            connections = pathway_measurement(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group,
-                prefixed=True
-            )
-
-            if connections is None:
-                return None
-
-            return connections.indegree
+            indegree = matrices.get_indegree(post_synaptic_cell_group)
+            indegree.index.name = ("post_synaptic_cell_group", "gid")
+            return indegree.rename("indegree") if not indegree.empty else None
 
         return measurement.collection.series_type(
             (p, get_one(**p))
@@ -252,27 +226,12 @@ def get(sample_size=100, target={}, **kwargs):
             """
             Compute out-degree.
             """)
-        pathway_measurement = PathwayMeasurement(
-            direction="EFF",
-            value={"outdegree": lambda c: 1.},
-            sampling_methodology=terminology.sampling_methodology.exhaustive,
-            processing_methodology=terminology.processing_methodology.batch,
-            batch_size=10000,
-            return_primary_info=True,
-            target=lambda model, adapter: adapter.get_cells(circuit_model, **target)
-        ).collector()
+        matrices = get_connectome_matrices(adapter, circuit_model)
 
         def get_one(post_synaptic_cell_group):
-            connections = pathway_measurement(
-                circuit_model, adapter,
-                post_synaptic_cell_group=post_synaptic_cell_group,
-                prefixed=True
-            )
-
-            if connections is None:
-                return None
-
-            return connections.outdegree
+            outdegree = matrices.get_outdegree(post_synaptic_cell_group)
+            outdegree.index.name = ("pre_synaptic_cell_group", "gid")
+            return outdegree.rename("outdegree") if not outdegree.empty else None
 
         return measurement.collection.series_type(
             (p, get_one(**p))
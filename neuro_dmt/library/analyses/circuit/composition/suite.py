@@ -259,10 +259,16 @@ class CompositionAnalysisSuite(WithFields):
         if cuboid_to_measure is None:
             return 0.
 
-        cell_count =\
-            adapter.get_cells(
-                circuit_model, roi=cuboid_to_measure
-            ).shape[0]
+        try:
+            get_cell_counts = adapter.get_cell_counts
+        except AttributeError:
+            cell_count =\
+                adapter.get_cells(
+                    circuit_model, roi=cuboid_to_measure
+                ).shape[0]
+        else:
+            cell_count =\
+                get_cell_counts(circuit_model, [cuboid_to_measure])[0]
         spatial_volume =\
             cuboid_to_measure.volume
 
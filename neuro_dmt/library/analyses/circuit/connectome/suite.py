@@ -24,6 +24,8 @@ from neuro_dmt.analysis.reporting import\
 from neuro_dmt.utils import measurement_method
 from neuro_dmt.utils.geometry import Cuboid
 from neuro_dmt.analysis.circuit.tools import PathwayMeasurement
+from neuro_dmt.utils.geometry.distance import\
+    bin_distances, get_bin_mids
 
 LOGGER = Logger(client=__file__, level="DEBUG")
 
@@ -254,12 +256,14 @@ class ConnectomeAnalysesSuite(WithFields):
             adapter.get_soma_distance(
                 circuit_model,
                 cell, cell_group)
-        bin_starts =\
-            bin_size * np.floor(distance / bin_size)
+        bins = bin_distances(distance, bin_size)
         return\
-            [bin_start + bin_size / 2. for bin_start in bin_starts]\
+            get_bin_mids(bins, bin_size)\
             if bin_mids else\
-               [[bin_start, bin_size] for bin_start in bin_starts]
+               np.column_stack([
+                   bin_size * bins.astype(np.float64),
+                   np.full(bins.shape[0], bin_size, dtype=np.float64)
+               ]).tolist()
 
     @staticmethod
     def get_random_cells(
@@ -23,8 +23,7 @@ from tqdm import tqdm
 from neuro_dmt import terminology
 from dmt.tk.field import Field, WithFields
 from dmt.tk.journal import Logger
-from neuro_dmt.utils.geometry import Position
-from .cell import Cell, CellCollection
+from .cell import CellCollection
 from .composition import CircuitComposition
 from .connectivity import CircuitConnectivity
 from .connectome import Connectome
@@ -85,23 +84,80 @@ class CircuitBuilder(WithFields):
                 region, layer, mtype)["mean"]
         return int(1.e-9 * density * volume)
 
+    def get_cell_counts(self):
+        """
+        Number of cells of each (region, layer, mtype, etype).
+
+        Returns
+        ------------
+        `pandas.Series` indexed by region, layer, mtype, and etype, ordered
+        by region, then layer, then mtype, and then etype.
+        """
+        index =\
+            pd.MultiIndex.from_product(
+                [self.composition.regions,
+                 self.composition.layers,
+                 self.composition.mtypes,
+                 self.composition.etypes],
+                names=["region", "layer", "mtype", "etype"])
+        number_cells ={
+            (region, layer, mtype): self.get_number_cells(region, layer, mtype)
+            for region in self.composition.regions
+            for layer in self.composition.layers
+            for mtype in self.composition.mtypes}
+        return pd.Series(
+            [number_cells[(region, layer, mtype)]
+             for region, layer, mtype, _ in index],
+            index=index,
+            dtype=np.int64,
+            name="number_cells")
+
     def get_cells(self):
         """
         Create cells for each layer and mtype combination.
+
+        Cells are assembled column by column, with the positions of all the
+        cells sampled together in their bounding boxes.
+        Columns of the returned `pandas.DataFrame` are the fields documented
+        by `Cell`, with position as 'x', 'y', 'z'.
         """
-        return [
-            Cell(
-                region=region,
-                layer=layer,
-                position=Position.sample(
-                    self.composition.bounding_box(layer, mtype)),
-                mtype=mtype,
-                etype=etype)
-            for region in self.composition.regions
+        counts = self.get_cell_counts()
+        sizes = counts.to_numpy()
+        number_cells = int(np.sum(sizes))
+
+        def _column(level):
+            return np.repeat(
+                counts.index.get_level_values(level).to_numpy(), sizes)
+
+        boxes ={
+            (layer, mtype): self.composition.bounding_box(layer, mtype)
             for layer in self.composition.layers
-            for mtype in self.composition.mtypes
-            for etype in self.composition.etypes
-            for _ in range(self.get_number_cells(region, layer, mtype))]
+            for mtype in self.composition.mtypes}
+        corners =\
+            np.array([
+                boxes[(layer, mtype)]
+                for _, layer, mtype, _ in counts.index],
+                dtype=np.float64
+            ).reshape((len(counts), 2, 3))
+        lower = np.repeat(corners[:, 0, :], sizes, axis=0)
+        upper = np.repeat(corners[:, 1, :], sizes, axis=0)
+        positions =\
+            lower + np.random.random((number_cells, 3)) * (upper - lower)
+
+        mtype = _column("mtype")
+        return pd.DataFrame({
+            "region": _column("region"),
+            "layer": _column("layer"),
+            "nucleus": np.full(number_cells, "not-defined", dtype=object),
+            "mtype": mtype,
+            "etype": _column("etype"),
+            "morph_class": np.full(number_cells, "not-defined", dtype=object),
+            "synapse_class": np.where(
+                np.char.find(mtype.astype(str), "PC") >= 0, "EXC", "INH"
+            ).astype(object),
+            "x": positions[:, 0],
+            "y": positions[:, 1],
+            "z": positions[:, 2]})
 
     def get_cell_collection(self):
         """
@@ -151,11 +207,8 @@ class CircuitBuilder(WithFields):
         #         "Length {} of afferent gids should equal that of synapse counts"\
         #         .format(len(gids), len(syn_counts))
         connections =\
-            pd.concat([
-                self.connectivity.get_afferent_connections(post_gid, post_cell, cells)
-                for post_gid, post_cell in tqdm(cells.iterrows())])\
-              .assign(synapse_count=self.connectivity.get_synapse_counts)
-                  
+            self.connectivity.get_connections(cells)
+
         return Connectome(
             cells=cell_collection,
             connections=connections)
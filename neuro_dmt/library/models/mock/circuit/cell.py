@@ -43,6 +43,8 @@ class Cell(WithFields):
     """
     Defines a cell, and documents it's (data) fields.
     This class is mostly for documenting and learning purposes.
+    `CircuitBuilder` does not create `Cell`s, but assembles the columns
+    of a cell collection's dataframe directly.
     """
     region = Field(
         """
@@ -24,6 +24,48 @@ from dmt.tk.journal import Logger
 from dmt.tk.field import Field, WithFields
 
 
+def sample_without_replacement(number_values, sizes, random_state=np.random):
+    """
+    Draw, for each of several rows, a sample of distinct positions among
+    `number_values`, in a few vectorized calls.
+    Positions are drawn with replacement, and those that repeat in a row are
+    redrawn until none do. Rows that sample more than half of the values are
+    drawn with a permutation, so that redrawing converges quickly.
+
+    Arguments
+    -------------
+    number_values :: number of values to sample positions among
+    sizes :: `np.ndarray<int>` number of positions to draw for each row.
+    ~        Sizes larger than `number_values` are reduced to it.
+
+    Returns
+    -------------
+    A tuple of `np.ndarray<int64>`s (rows, positions), sorted by row
+    and position.
+    """
+    sizes = np.minimum(np.asarray(sizes, dtype=np.int64), number_values)
+    rows = np.repeat(np.arange(sizes.shape[0], dtype=np.int64), sizes)
+    positions =\
+        random_state.randint(0, max(number_values, 1), size=rows.shape[0])\
+                    .astype(np.int64)
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+    for row in np.flatnonzero(2 * sizes > number_values):
+        positions[starts[row]:starts[row + 1]] =\
+            random_state.choice(number_values, sizes[row], replace=False)
+    #A row and a position are packed in a single key, so that sorting
+    #the keys sorts the pairs. Keys are almost sorted after redrawing
+    #the few repeated positions, which a stable sort handles in linear time.
+    keys = np.sort(rows * number_values + positions)
+    while True:
+        repeated = np.flatnonzero(keys[1:] == keys[:-1]) + 1
+        if repeated.shape[0] == 0:
+            return keys // max(number_values, 1), keys % max(number_values, 1)
+        keys[repeated] =\
+            keys[repeated] // number_values * number_values\
+            + random_state.randint(0, number_values, size=repeated.shape[0])
+        keys = np.sort(keys, kind="stable")
+
+
 class CircuitConnectivity(ABC):
     """
     A data-class to parameterize a (mock) circuit's connectome.
@@ -51,6 +93,55 @@ class CircuitConnectivity(ABC):
         """
         raise NotImplementedError
 
+    def get_afferent_degrees(self, cells):
+        """
+        In-degree of each of the `cells`.
+        Override to draw all the in-degrees in a single call.
+        """
+        return np.array(
+            [self.get_afferent_degree(cell) for _, cell in cells.iterrows()],
+            dtype=np.int64)
+
+    def get_connection_synapse_counts(self, cells, connections):
+        """
+        Number of synapses of each of the `connections` among `cells`.
+        Override to draw all the synapse counts in a single call.
+        """
+        return np.array([
+            self._synapse_count(
+                cells.loc[connection.pre_gid],
+                cells.loc[connection.post_gid])
+            for connection in connections.itertuples()])
+
+    def get_connections(self, cells):
+        """
+        Connections to all the `cells`, generated in bulk:
+        all the in-degrees, and all the pre-synaptic gids, are drawn
+        in a handful of vectorized calls.
+
+        Arguments
+        -------------
+        cells :: pandas.DataFrame containing cells in the circuit,
+        ~        indexed by gid.
+
+        Returns
+        -------------
+        pandas.DataFrame <pre_gid, post_gid, synapse_count>,
+        sorted by post-synaptic and pre-synaptic gids.
+        """
+        if not cells.index.is_monotonic_increasing:
+            cells = cells.sort_index()
+        gids = cells.index.to_numpy(np.int64)
+        rows, positions =\
+            sample_without_replacement(
+                gids.shape[0], self.get_afferent_degrees(cells))
+        connections =\
+            pd.DataFrame({
+                "pre_gid": gids[positions],
+                "post_gid": gids[rows]})
+        return connections.assign(
+            synapse_count=self.get_connection_synapse_counts(cells, connections))
+
 
 class SimpleUniformRandomConnectivity(
         CircuitConnectivity,
@@ -79,9 +170,21 @@ class SimpleUniformRandomConnectivity(
         return\
             np.random.poisson(self.mean_afferent_degree)
 
+    def get_afferent_degrees(self, cells):
+        """
+        In-degree of each of the `cells`.
+        """
+        return np.random.poisson(self.mean_afferent_degree, size=cells.shape[0])
+
     def _synapse_count(self, *args, **kwargs):
         return 1. + np.random.poisson(self.mean_synapse_count)
 
+    def get_connection_synapse_counts(self, cells, connections):
+        """
+        Number of synapses of each of the `connections`.
+        """
+        return self.get_synapse_counts(connections)
+
     def get_synapse_counts(self,
             connections):
         """
@@ -147,10 +250,38 @@ class SimpleUniformRandomConnectivityWithMtypeDependence(
                 self.afferent_degree_mtype[
                     post_synaptic_cell.mtype])
 
+    def get_afferent_degrees(self, cells):
+        """
+        In-degree of each of the `cells`, depending on their mtype.
+        """
+        return\
+            np.random.poisson(
+                cells.mtype.map(self.afferent_degree_mtype)\
+                           .to_numpy(np.float64))
+
     def _synapse_count(self, pre_cell, post_cell):
         return 1. + np.random.poisson(
             self.synapse_count_pathway[pre_cell.mtype][post_cell.mtype])
 
+    def get_connection_synapse_counts(self, cells, connections):
+        """
+        Number of synapses of each of the `connections`, drawn for all the
+        connections at once, with the expected number of their pathway.
+        """
+        mtypes, codes =\
+            np.unique(cells.mtype.to_numpy(str), return_inverse=True)
+        expected =\
+            np.array([
+                [self.synapse_count_pathway[pre_mtype][post_mtype]
+                 for post_mtype in mtypes]
+                for pre_mtype in mtypes],
+                dtype=np.float64)
+        return\
+            1. + np.random.poisson(
+                expected[
+                    codes[cells.index.get_indexer(connections.pre_gid.values)],
+                    codes[cells.index.get_indexer(connections.post_gid.values)]])
+
     def get_synapse_counts(self,
             afferent_adjacency,
             cell_collection):
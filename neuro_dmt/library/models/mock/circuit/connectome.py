@@ -17,12 +17,10 @@
 The connectome of a circuit.
 """
 
-from tqdm import tqdm
 import numpy as np
 import pandas as pd
 from dmt.tk.field import Field, WithFields, lazyfield
 from dmt.tk.journal import Logger
-from neuro_dmt import terminology
 from .synapse import Synapse
 
 LOGGER = Logger(client=__file__)
@@ -47,6 +45,133 @@ class Connection(WithFields):
         """)
     
 
+
+def _concatenate_ranges(starts, lengths):
+    """
+    Concatenation of the ranges `starts[i]:starts[i] + lengths[i]`,
+    computed without a Python loop.
+    """
+    ends = np.cumsum(lengths)
+    return\
+        np.repeat(starts - (ends - lengths), lengths)\
+        + np.arange(ends[-1] if len(ends) > 0 else 0, dtype=np.int64)
+
+
+class Adjacency(WithFields):
+    """
+    Connections compressed by their row gids.
+    Connections are sorted by row gid, and then by column gid, and the
+    connections of row gid `g` are at positions `offsets[g]:offsets[g + 1]`.
+    Rows are the post-synaptic gids for afferent adjacency (CSR),
+    and the pre-synaptic gids for efferent adjacency (CSC).
+    """
+    offsets = Field(
+        """
+        Position of the first connection of each row gid,
+        followed by the number of connections.
+        """)
+    gids = Field(
+        """
+        Column gid of each connection.
+        """)
+    synapse_counts = Field(
+        """
+        Number of synapses in each connection.
+        """)
+
+    @classmethod
+    def from_edges(cls, rows, columns, synapse_counts, number_gids):
+        """
+        Compress edges `rows[i] --> columns[i]`, between gids smaller
+        than `number_gids`.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        order = np.argsort(rows * number_gids + columns, kind="stable")
+        return cls(
+            offsets=np.concatenate([
+                [0], np.cumsum(np.bincount(rows, minlength=number_gids))
+            ]).astype(np.int64),
+            gids=columns[order],
+            synapse_counts=np.asarray(synapse_counts)[order])
+
+    @property
+    def number_gids(self):
+        """..."""
+        return len(self.offsets) - 1
+
+    @lazyfield
+    def rows(self):
+        """
+        Row gid of each connection.
+        """
+        return\
+            np.repeat(
+                np.arange(self.number_gids, dtype=np.int64),
+                np.diff(self.offsets))
+
+    @lazyfield
+    def keys(self):
+        """
+        Sorted keys `row * number_gids + column` of the connections.
+        """
+        return self.rows * self.number_gids + self.gids
+
+    def _valid(self, gids):
+        """..."""
+        gids = np.asarray(gids, dtype=np.int64)
+        return gids[(gids >= 0) & (gids < self.number_gids)]
+
+    def get_gids(self, gid):
+        """
+        Column gids connected to row `gid`, as an array.
+        """
+        if gid < 0 or gid >= self.number_gids:
+            return self.gids[0:0]
+        return self.gids[self.offsets[gid]:self.offsets[gid + 1]]
+
+    def get_degrees(self, gids):
+        """
+        Number of connections of each of the row `gids`.
+        """
+        gids = np.asarray(gids, dtype=np.int64)
+        degrees = np.zeros(gids.shape, dtype=np.int64)
+        valid = (gids >= 0) & (gids < self.number_gids)
+        degrees[valid] =\
+            self.offsets[gids[valid] + 1] - self.offsets[gids[valid]]
+        return degrees
+
+    def get_positions(self, gids):
+        """
+        Positions of the connections of all the row `gids`,
+        in the order of `gids`.
+        """
+        gids = self._valid(gids)
+        starts = self.offsets[gids]
+        return _concatenate_ranges(starts, self.offsets[gids + 1] - starts)
+
+    def find(self, rows, columns):
+        """
+        Positions of connections `rows --> columns`,
+        found by binary search, or -1 for gids that are not connected.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        positions = np.full(rows.shape, -1, dtype=np.int64)
+        if len(self.keys) == 0:
+            return positions
+        valid =\
+            (rows >= 0) & (rows < self.number_gids)\
+            & (columns >= 0) & (columns < self.number_gids)
+        keys = rows[valid] * self.number_gids + columns[valid]
+        found =\
+            np.minimum(
+                np.searchsorted(self.keys, keys),
+                len(self.keys) - 1)
+        positions[valid] = np.where(self.keys[found] == keys, found, -1)
+        return positions
+
+
 class Connectome(WithFields):
     """
     The connectome of a circuit.
@@ -142,50 +267,46 @@ class Connectome(WithFields):
 
 
     @lazyfield
-    def afferent_connections(self):
-        """..."""
-        return\
-            self.connections\
-                .set_index("post_gid")\
-                .sort_index()
-    @lazyfield
-    def afferent_adjacency(self):
+    def number_gids(self):
         """
-        List of 2-tuples giving afferent cell gid and synapse count,
-        for each  cell in a circuit.  We can build other connectome properties
-        from this list.
+        One more than the largest gid of a cell or a connection.
         """
-        raise NotImplementedError
+        gids =[
+            self.connections.pre_gid.to_numpy(),
+            self.connections.post_gid.to_numpy()]
+        try:
+            gids.append(np.asarray(self.cells.gids))
+        except AttributeError:
+            pass
+        return 1 + max(
+            [int(np.max(values)) for values in gids if len(values) > 0],
+            default=-1)
 
     @lazyfield
-    def efferent_adjacency(self):
+    def afferent_adjacency(self):
         """
-        dict mapping gids to 2-tuples giving efferent cell gid and synapse count,
-        for each cell in a circuit. We will set this field to an empty dict, and
-        fill it lazily.
+        Afferent connections of each cell, as an `Adjacency` with
+        post-synaptic gids as rows, and pre-synaptic gids as columns.
         """
-        raise NotImplementedError
-
-
-    @lazyfield
-    def efferent_connections(self):
-        """..."""
         return\
-            self.connections\
-                .set_index("pre_gid")\
-                .sort_index()
+            Adjacency.from_edges(
+                self.connections.post_gid.to_numpy(),
+                self.connections.pre_gid.to_numpy(),
+                self.connections.synapse_count.to_numpy(),
+                self.number_gids)
 
     @lazyfield
-    def synapse_counts(self):
-        """..."""
-        LOGGER.info("Loading synapse counts.")
-        levels_index =[
-            "pre_gid", "post_gid"]
+    def efferent_adjacency(self):
+        """
+        Efferent connections of each cell, as an `Adjacency` with
+        pre-synaptic gids as rows, and post-synaptic gids as columns.
+        """
         return\
-            self.connections\
-                .set_index(levels_index)\
-                .synapse_count\
-                .sort_index(level=levels_index)
+            Adjacency.from_edges(
+                self.connections.pre_gid.to_numpy(),
+                self.connections.post_gid.to_numpy(),
+                self.connections.synapse_count.to_numpy(),
+                self.number_gids)
 
     def synapse_properties(self,
             synapse_ids,
@@ -224,8 +345,22 @@ class Connectome(WithFields):
         """
         All the incoming connected cell gids of the cell with 'gid'.
         """
-        return\
-            self.afferent_connections.loc[gid].pre_gid.values
+        return self.afferent_adjacency.get_gids(gid)
+
+    def get_afferent_gids(self, gids):
+        """
+        Incoming connected cell gids of all the cells with `gids`,
+        concatenated in the order of `gids`.
+        Use `get_afferent_degrees(gids)` to split them by cell.
+        """
+        adjacency = self.afferent_adjacency
+        return adjacency.gids[adjacency.get_positions(gids)]
+
+    def get_afferent_degrees(self, gids):
+        """
+        Number of incoming connections of each of the cells with `gids`.
+        """
+        return self.afferent_adjacency.get_degrees(gids)
 
     def afferent_synapses(self, gid, properties=None):
         """
@@ -257,8 +392,7 @@ class Connectome(WithFields):
         """
         All the outcoming connected cell gids of the cell with 'gid'.
         """
-        return\
-            self.efferent_connections.loc[gid].post_gid.values
+        return self.efferent_adjacency.get_gids(gid)
 
         # def __contains(xs, y):
         #     """
@@ -273,6 +407,21 @@ class Connectome(WithFields):
         #         if self.__in_sorted(self.afferent_gids(post_gid), gid)])
         # return self.efferent_adjacency[gid]
 
+    def get_efferent_gids(self, gids):
+        """
+        Outgoing connected cell gids of all the cells with `gids`,
+        concatenated in the order of `gids`.
+        Use `get_efferent_degrees(gids)` to split them by cell.
+        """
+        adjacency = self.efferent_adjacency
+        return adjacency.gids[adjacency.get_positions(gids)]
+
+    def get_efferent_degrees(self, gids):
+        """
+        Number of outgoing connections of each of the cells with `gids`.
+        """
+        return self.efferent_adjacency.get_degrees(gids)
+
     def efferent_synapses(self, gid, properties=None):
         """
         Get efferent synapses for given 'gid'.
@@ -295,41 +444,87 @@ class Connectome(WithFields):
         """
         Get number of synapses pre_gid to post_gid.
         """
-        return\
-            self.synapse_counts.loc[(pre_gid, post_gid)]
+        return int(self.get_synapse_counts([pre_gid], [post_gid])[0])
         # pre_gids = self.afferent_gids(post_gid)
         # i = np.searchsorted(pre_gids, pre_gid)
         # return 0 if i >= len(pre_gids) or pre_gids[i] != pre_gid\
         #     else self.afferent_adjacency[post_gid][i, 1]
 
-    def _read_synapses(self, pre_gid=None, post_gid=None):
+    def get_synapse_counts(self, pre_gids, post_gids):
         """
-        Read synapses connecting pre_gid to post_gid.
-        The mock-circuit knows only the pre_gid and post_gid of synapses.
-        We will read other properties when we have implemented them.
+        Number of synapses of each of the pairs `pre_gids --> post_gids`,
+        zero for pairs that are not connected.
         """
-        assert not (pre_gid is None and post_gid is None)
+        adjacency = self.afferent_adjacency
+        positions = adjacency.find(post_gids, pre_gids)
+        counts = np.zeros(positions.shape, dtype=adjacency.synapse_counts.dtype)
+        found = positions >= 0
+        counts[found] = adjacency.synapse_counts[positions[found]]
+        return counts
 
-        if post_gid is None:
-            return\
-                pd.concat([
-                    self._read_synapses(pre_gid, _post_gid)
-                    for _post_gid in self.efferent_gids(pre_gid)])
-        if pre_gid is None:
-            return\
-                pd.concat([
-                    self._read_synapses(_pre_gid, post_gid)
-                    for _pre_gid in self.afferent_gids(post_gid)])
+    @lazyfield
+    def synapse_offsets(self):
+        """
+        Synapses, numbered consecutively in the order of connections in
+        `self.afferent_adjacency`, with the synapses of its `i`-th connection
+        numbered from `synapse_offsets[i]` to `synapse_offsets[i + 1]`.
+        """
+        return\
+            np.concatenate([
+                [0], np.cumsum(self.afferent_adjacency.synapse_counts)
+            ]).astype(np.int64)
+
+    def _get_connection_positions(self, pre_gids=None, post_gids=None):
+        """
+        Positions in `self.afferent_adjacency` of connections
+        `pre_gids --> post_gids`, sorted and without repetitions.
+        """
+        adjacency, rows, columns, rows_pre =\
+            self._get_sides_of_gids(pre_gids, post_gids)
+        positions = adjacency.get_positions(rows)
+        if columns is not None:
+            positions =\
+                positions[np.isin(adjacency.gids[positions], columns)]
+        if rows_pre:
+            positions =\
+                self.afferent_adjacency.find(
+                    adjacency.gids[positions], adjacency.rows[positions])
+        return np.unique(positions)
+
+    def _get_synapse_table(self, positions):
+        """
+        Synapses of the connections at `positions` in
+        `self.afferent_adjacency`, as a dataframe indexed by
+        (pre_gid, post_gid, synapse_index), in the order of their positions.
+        """
+        adjacency = self.afferent_adjacency
+        synapse_counts = adjacency.synapse_counts[positions]
+        starts = self.synapse_offsets[positions]
+        synapse_ids = _concatenate_ranges(starts, synapse_counts)
+        def _repeated(values):
+            return np.repeat(values, synapse_counts)
         return\
             pd.DataFrame({
-                "pre_gid": pre_gid,
-                "post_gid": post_gid,
-                "synapse_index": np.arange(
-                    self._get_pair_synapse_count(pre_gid, post_gid))})\
+                "pre_gid": _repeated(adjacency.gids[positions]),
+                "post_gid": _repeated(adjacency.rows[positions]),
+                "synapse_index": synapse_ids - _repeated(starts)})\
               .set_index(
                   ["pre_gid", "post_gid", "synapse_index"],
                   drop=False)
 
+    def _read_synapses(self, pre_gid=None, post_gid=None):
+        """
+        Read synapses connecting pre_gid to post_gid.
+        The mock-circuit knows only the pre_gid and post_gid of synapses.
+        We will read other properties when we have implemented them.
+        """
+        assert not (pre_gid is None and post_gid is None)
+        return\
+            self._get_synapse_table(
+                self._get_connection_positions(
+                    pre_gids=None if pre_gid is None else [pre_gid],
+                    post_gids=None if post_gid is None else [post_gid]))
+
     def _get_cached(self, pre_gid=None, post_gid=None):
         """
         Get cached synapses pre_gid --> post_gid
@@ -395,22 +590,6 @@ class Connectome(WithFields):
                 self._get_synapses(pre_gid, post_gid),
                 properties=properties)
 
-    def _filter_connected(self,
-            gid,
-            candidate_gids,
-            direction=terminology.direction.afferent):
-        """
-        Filter gids from  list of 'possible_pre_gids' that make a synapse
-        onto the post-synaptic neuron with given 'gid'.
-        """
-        connected_gids =\
-            self.afferent_gids(gid)\
-            if direction == terminology.bluebrain.afferent else\
-               self.efferent_gids(gid)
-        return\
-            candidate_gids[
-                np.in1d(candidate_gids, connected_gids)]
-
     def pathway_synapses(self,
             pre_gids=np.array([]),
             post_gids=np.array([]),
@@ -421,29 +600,12 @@ class Connectome(WithFields):
         if len(pre_gids) == 0 and len(post_gids) == 0:
             raise NotImplementedError(
                 "There may be too many synapses to handle.")
-        def __stacked(datas):
-            """
-            Stack either a list of arrays, or dataframes
-            """
-            if len(datas) == 0:
-                return\
-                    self.empty_synapse_holder() if properties\
-                    else np.array([], np.integer)
-            return (pd.concat if properties else np.hstack)(datas)
-
-        if len(pre_gids) == 0:
-            return __stacked([
-                self.afferent_synapses(gid)
-                for gid in post_gids])
-        if len(post_gids) == 0:
-            return __stacked([
-                self.efferent_synapses(gid)
-                for gid in pre_gids])
-        return\
-            __stacked([
-                self.pair_synapses(_pre_gid, _post_gid, properties=properties)
-                for _post_gid in post_gids
-                for _pre_gid in self._filter_connected(_post_gid, pre_gids)])
+        synapses =\
+            self._get_synapse_table(
+                self._get_connection_positions(
+                    pre_gids=pre_gids if len(pre_gids) > 0 else None,
+                    post_gids=post_gids if len(post_gids) > 0 else None))
+        return self._get_properties(synapses, properties=properties)
 
     def _resolve_gids(self, group_cells):
         cells_subset = self.cells.get(group_cells)
@@ -451,6 +613,100 @@ class Connectome(WithFields):
             return group_cells
         return cells_subset.index.values
 
+    def _get_sides(self, pre, post):
+        """
+        Adjacency to read connections `pre --> post` from, choosing the side
+        with fewer connections to expand, and filtering by the other side.
+
+        Returns
+        ------------
+        A tuple (adjacency, row gids, column gids to keep or `None` for all,
+        whether the rows are pre-synaptic)
+        """
+        return\
+            self._get_sides_of_gids(
+                None if pre is None else self._resolve_gids(pre),
+                None if post is None else self._resolve_gids(post))
+
+    def _get_sides_of_gids(self, pre_gids, post_gids):
+        """
+        Like `_get_sides`, for cells given by their gids.
+        """
+        if pre_gids is None and post_gids is None:
+            return (
+                self.afferent_adjacency,
+                np.arange(self.number_gids, dtype=np.int64),
+                None,
+                False)
+        if pre_gids is not None:
+            pre_gids = np.atleast_1d(pre_gids).astype(np.int64)
+        if post_gids is not None:
+            post_gids = np.atleast_1d(post_gids).astype(np.int64)
+        if pre_gids is None or (
+                post_gids is not None
+                and np.sum(self.get_afferent_degrees(post_gids))
+                < np.sum(self.get_efferent_degrees(pre_gids))):
+            return (self.afferent_adjacency, post_gids, pre_gids, False)
+        return (self.efferent_adjacency, pre_gids, post_gids, True)
+
+    @staticmethod
+    def _select_connections(adjacency, rows, columns, rows_pre):
+        """
+        Connections of `rows` in `adjacency` to `columns`,
+        as pre-gids, post-gids, and synapse counts.
+        """
+        positions = adjacency.get_positions(rows)
+        if columns is not None:
+            positions =\
+                positions[np.isin(adjacency.gids[positions], columns)]
+        row_gids = adjacency.rows[positions]
+        column_gids = adjacency.gids[positions]
+        return (
+            row_gids if rows_pre else column_gids,
+            column_gids if rows_pre else row_gids,
+            adjacency.synapse_counts[positions])
+
+    def get_connections(self, pre=None, post=None):
+        """
+        Connections `pre --> post`, in bulk.
+        Connections are grouped by the cells of the side (`pre` or `post`)
+        that has fewer of them, in the order of that side's gids, and
+        sorted by the gids of the other side.
+
+        Arguments
+        -------------
+        pre :: cells to connect from, as a gid, a list of gids, or a mapping
+        ~      cell property --> value. All cells if `None`.
+        post :: cells to connect to, specified like `pre`.
+
+        Returns
+        -------------
+        A tuple (`np.ndarray` pre-gids, `np.ndarray` post-gids,
+        ~        `np.ndarray` synapse counts).
+        """
+        return self._select_connections(*self._get_sides(pre, post))
+
+    def iter_connection_arrays(self, pre=None, post=None, size_chunk=2**20):
+        """
+        Connections `pre --> post`, as `self.get_connections(pre, post)` would
+        return them, in chunks of about `size_chunk` connections.
+        A cell's connections are never split across chunks.
+        """
+        adjacency, rows, columns, rows_pre = self._get_sides(pre, post)
+        ends = np.cumsum(adjacency.get_degrees(rows))
+        if len(ends) == 0 or ends[-1] == 0:
+            return
+        splits =\
+            np.unique(
+                np.searchsorted(
+                    ends,
+                    np.arange(size_chunk, ends[-1], size_chunk),
+                    side="left")
+                + 1)
+        for rows_chunk in np.split(rows, splits[splits < len(rows)]):
+            yield self._select_connections(
+                adjacency, rows_chunk, columns, rows_pre)
+
     def iter_connections(self,
             pre=None, post=None,
             unique_gids=False,
@@ -459,43 +715,10 @@ class Connectome(WithFields):
             return_synapse_count=False):
         """
         Iterate through pre -> post connections.
+        Prefer `get_connections(pre, post)` to get connections as arrays.
         """
         result = lambda xyz: xyz if return_synapse_count else xyz[0:2]
-        if pre is None:
-            if post is None:
-                for _, connection in self.connections.iterrows():
-                    yield result((
-                        connection.pre_gid,
-                        connection.post_gid,
-                        connection.synapse_count))
-            else:
-                for post_gid in self._resolve_gids(post):
-                    afferent_connections =\
-                        self.afferent_connections.loc[post_gid]
-                    for _, connection in afferent_connections.iterrows():
-                        yield result((
-                            connection.pre_gid,
-                            post_gid,
-                            connection.synapse_count))
-        elif post is None:
-            for pre_gid in self._resolve_gids(pre):
-                efferent_connections =\
-                    self.efferent_connections.loc[pre_gid]
-                for _, connection in efferent_connections.iterrows():
-                    yield result((
-                        pre_gid,
-                        connection.post_gid,
-                        connection.synapse_count))
-        else:
-            for pre_gid in tqdm(self._resolve_gids(pre)):
-                efferent_synapse_count =\
-                    self.synapse_counts\
-                        .loc[pre_gid]\
-                        .reindex(self._resolve_gids(post))\
-                        .dropna()
-                for post_gid, synapse_count in efferent_synapse_count.iteritems():
-                    yield result((
-                        pre_gid,
-                        post_gid,
-                        synapse_count))
-
+        for pre_gids, post_gids, synapse_counts\
+            in self.iter_connection_arrays(pre, post):
+            for connection in zip(pre_gids, post_gids, synapse_counts):
+                yield result(connection)
@@ -0,0 +1,81 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test building the cells of a mock circuit column by column.
+"""
+
+import numpy as np
+import pandas as pd
+from neuro_dmt.utils.geometry import Position
+from ..cell import Cell
+from ..composition import CircuitComposition
+from ..connectivity import SimpleUniformRandomConnectivity
+from ..builder import CircuitBuilder
+
+MTYPES = ["L1_DAC", "L2_TPC", "L2_MC"]
+
+
+def _builder():
+    """..."""
+    return CircuitBuilder(
+        composition=CircuitComposition(
+            layers=(1, 2),
+            layers_ordered=(1, 2),
+            regions=("S1HL", "S1FL"),
+            thickness_layer={1: 100., 2: 200.},
+            length_base=50.,
+            mtypes=MTYPES,
+            cell_density=pd.DataFrame([
+                {"region": region, "layer": layer, "mtype": mtype,
+                 "mean": 1.e4 * (1 + MTYPES.index(mtype)) * layer,
+                 "std": 0.}
+                for region in ("S1HL", "S1FL")
+                for layer in (1, 2)
+                for mtype in MTYPES]
+            ).set_index(["mtype", "region", "layer"])),
+        connectivity=SimpleUniformRandomConnectivity(
+            mean_afferent_degree=10, mean_synapse_count=2))
+
+
+def test_cells_as_built_from_cell_objects():
+    """
+    Cells assembled by columns should be the same as cells created
+    one `Cell` at a time, for the same random state.
+    """
+    builder = _builder()
+    composition = builder.composition
+
+    np.random.seed(0)
+    expected =\
+        pd.DataFrame([
+            Cell(
+                region=region,
+                layer=layer,
+                position=Position.sample(
+                    composition.bounding_box(layer, mtype)),
+                mtype=mtype,
+                etype=etype).as_dict
+            for region in composition.regions
+            for layer in composition.layers
+            for mtype in composition.mtypes
+            for etype in composition.etypes
+            for _ in range(builder.get_number_cells(region, layer, mtype))])
+
+    np.random.seed(0)
+    cells = builder.get_cells()
+
+    assert cells.shape[0] == builder.get_cell_counts().sum() > 0
+    pd.testing.assert_frame_equal(cells, expected)
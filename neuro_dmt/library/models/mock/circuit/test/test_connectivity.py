@@ -0,0 +1,92 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test generating the connections of a mock circuit in bulk.
+"""
+
+import numpy as np
+import pandas as pd
+from ..connectivity import\
+    sample_without_replacement,\
+    SimpleUniformRandomConnectivity,\
+    SimpleUniformRandomConnectivityWithMtypeDependence
+
+MTYPES = ["L2_TPC", "L4_SS", "L5_TPC"]
+
+
+def _cells(number=2000):
+    """..."""
+    random = np.random.RandomState(0)
+    return pd.DataFrame(
+        {"mtype": random.choice(MTYPES, number)},
+        index=pd.Index(random.permutation(number) + 10, name="gid"))
+
+
+def test_sample_without_replacement():
+    """
+    Each row should sample distinct positions, as many as requested,
+    up to the number of values.
+    """
+    sizes = np.array([0, 5, 10, 12, 3])
+    rows, positions =\
+        sample_without_replacement(10, sizes, np.random.RandomState(0))
+    assert np.array_equal(np.bincount(rows, minlength=5), [0, 5, 10, 10, 3])
+    assert np.array_equal(
+        np.unique(rows * 10 + positions), rows * 10 + positions)
+    assert np.all((positions >= 0) & (positions < 10))
+
+
+def test_bulk_connections():
+    """
+    Connections should be distinct, sorted, and have the expected in-degrees
+    and synapse counts.
+    """
+    np.random.seed(0)
+    cells = _cells()
+    connectivity =\
+        SimpleUniformRandomConnectivityWithMtypeDependence(
+            afferent_degree_mtype={"L2_TPC": 10, "L4_SS": 50, "L5_TPC": 200},
+            synapse_count_pathway={
+                pre_mtype: {
+                    post_mtype: 1 + MTYPES.index(pre_mtype)
+                    for post_mtype in MTYPES}
+                for pre_mtype in MTYPES})
+    connections = connectivity.get_connections(cells)
+
+    assert list(connections.columns) == ["pre_gid", "post_gid", "synapse_count"]
+    pairs = connections[["post_gid", "pre_gid"]].to_numpy()
+    assert np.all(
+        (pairs[1:, 0] > pairs[:-1, 0])
+        | ((pairs[1:, 0] == pairs[:-1, 0]) & (pairs[1:, 1] > pairs[:-1, 1])))
+    assert np.all(connections.pre_gid.isin(cells.index))
+
+    degree =\
+        connections.groupby(
+            cells.mtype.loc[connections.post_gid].values
+        ).size() / cells.mtype.value_counts()
+    assert np.allclose(degree[MTYPES], [10, 50, 200], rtol=0.05)
+    synapse_count =\
+        connections.synapse_count.groupby(
+            cells.mtype.loc[connections.pre_gid].values
+        ).mean()
+    assert np.allclose(synapse_count[MTYPES], [2, 3, 4], rtol=0.05)
+
+    uniform =\
+        SimpleUniformRandomConnectivity(
+            mean_afferent_degree=20, mean_synapse_count=3)\
+        .get_connections(cells)
+    assert np.isclose(uniform.shape[0] / cells.shape[0], 20, rtol=0.05)
+    assert np.isclose(uniform.synapse_count.mean(), 4, rtol=0.05)
@@ -0,0 +1,221 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test lookups of connections in a mock connectome.
+"""
+
+import numpy as np
+import pandas as pd
+from ..cell import CellCollection
+from ..connectome import Connectome
+
+NUMBER_CELLS = 50
+
+
+def _connectome():
+    """
+    A connectome with a cell that has a single afferent connection,
+    and cells without any connections.
+    """
+    random = np.random.RandomState(0)
+    pairs =\
+        np.unique(
+            random.randint(0, NUMBER_CELLS - 2, size=(400, 2)),
+            axis=0)
+    pairs =\
+        np.concatenate([
+            pairs[pairs[:, 1] != 0],
+            [[5, 0]]])
+    connections =\
+        pd.DataFrame({
+            "pre_gid": pairs[:, 0],
+            "post_gid": pairs[:, 1],
+            "synapse_count": random.randint(1, 10, size=pairs.shape[0])}
+        ).sample(frac=1., random_state=random)
+    cells =\
+        CellCollection(
+            pd.DataFrame({"mtype": NUMBER_CELLS * ["L1_DAC"]}))
+    return Connectome(cells=cells, connections=connections)
+
+
+def test_neighbor_lookups():
+    """
+    Afferent and efferent gids should be arrays of the connected gids,
+    for a single cell, and for many cells at once.
+    """
+    connectome = _connectome()
+    connections = connectome.connections
+    gids = np.array([0, 3, NUMBER_CELLS - 1, 3, 17])
+
+    for gid in gids:
+        afferent = connectome.afferent_gids(gid)
+        assert isinstance(afferent, np.ndarray)
+        assert np.array_equal(
+            afferent,
+            np.sort(connections.pre_gid[connections.post_gid == gid]))
+        assert np.array_equal(
+            connectome.efferent_gids(gid),
+            np.sort(connections.post_gid[connections.pre_gid == gid]))
+    assert np.array_equal(connectome.afferent_gids(0), [5])
+
+    assert np.array_equal(
+        connectome.get_afferent_gids(gids),
+        np.concatenate([connectome.afferent_gids(gid) for gid in gids]))
+    assert np.array_equal(
+        connectome.get_afferent_degrees(gids),
+        [len(connectome.afferent_gids(gid)) for gid in gids])
+    assert np.array_equal(
+        connectome.get_efferent_gids(gids),
+        np.concatenate([connectome.efferent_gids(gid) for gid in gids]))
+    assert np.array_equal(
+        connectome.get_efferent_degrees(gids),
+        [len(connectome.efferent_gids(gid)) for gid in gids])
+
+
+def test_pair_synapse_counts():
+    """
+    Synapse counts of pairs should be found for connected pairs,
+    and be zero for the others.
+    """
+    connectome = _connectome()
+    expected =\
+        connectome.connections\
+                  .set_index(["pre_gid", "post_gid"])\
+                  .synapse_count
+    pre_gids, post_gids =\
+        np.meshgrid(np.arange(NUMBER_CELLS), np.arange(NUMBER_CELLS))
+    synapse_counts =\
+        connectome.get_synapse_counts(pre_gids.ravel(), post_gids.ravel())
+    assert np.array_equal(
+        synapse_counts,
+        expected.reindex(
+            pd.MultiIndex.from_arrays([pre_gids.ravel(), post_gids.ravel()])
+        ).fillna(0).to_numpy())
+    assert connectome._get_pair_synapse_count(5, 0) == expected.loc[(5, 0)]
+    assert connectome._get_pair_synapse_count(0, NUMBER_CELLS) == 0
+
+    assert [
+        (pre_gid, post_gid)
+        for pre_gid, post_gid in connectome.iter_connections(post=[0])
+    ] == [(5, 0)]
+
+
+def _as_frame(pre_gids, post_gids, synapse_counts):
+    """..."""
+    return\
+        pd.DataFrame({
+            "pre_gid": pre_gids,
+            "post_gid": post_gids,
+            "synapse_count": synapse_counts})\
+          .sort_values(["pre_gid", "post_gid"])\
+          .reset_index(drop=True)
+
+
+def test_bulk_connections():
+    """
+    Connections in bulk, and in chunks, should be those selected from
+    the table of all connections.
+    """
+    connectome = _connectome()
+    connections = connectome.connections
+    pre = [3, 5, 11, 40]
+    post = list(range(0, NUMBER_CELLS, 2))
+
+    for kwargs, selected in [
+            ({},
+             np.ones(connections.shape[0], dtype=bool)),
+            ({"pre": pre},
+             connections.pre_gid.isin(pre)),
+            ({"post": post},
+             connections.post_gid.isin(post)),
+            ({"pre": pre, "post": post},
+             connections.pre_gid.isin(pre) & connections.post_gid.isin(post)),
+            ({"pre": post, "post": pre},
+             connections.pre_gid.isin(post) & connections.post_gid.isin(pre))]:
+        expected =\
+            connections[selected].sort_values(["pre_gid", "post_gid"])\
+                                 .reset_index(drop=True)
+        pd.testing.assert_frame_equal(
+            _as_frame(*connectome.get_connections(**kwargs)),
+            expected,
+            check_dtype=False)
+        chunks = list(connectome.iter_connection_arrays(size_chunk=16, **kwargs))
+        assert len(chunks) > 1
+        pd.testing.assert_frame_equal(
+            _as_frame(*[
+                np.concatenate([chunk[i] for chunk in chunks])
+                for i in range(3)]),
+            expected,
+            check_dtype=False)
+        assert sorted(
+            connectome.iter_connections(return_synapse_count=True, **kwargs)
+        ) == sorted(
+            expected.itertuples(index=False, name=None))
+
+
+def _synapses_of_pairs(connectome, pairs):
+    """
+    Synapses of (pre_gid, post_gid) pairs, one pair at a time.
+    """
+    synapse_counts = connectome.connections.set_index(["pre_gid", "post_gid"])
+    return\
+        pd.DataFrame(
+            [(pre_gid, post_gid, index)
+             for pre_gid, post_gid in pairs
+             if (pre_gid, post_gid) in synapse_counts.index
+             for index in range(
+                     synapse_counts.synapse_count.loc[(pre_gid, post_gid)])],
+            columns=["pre_gid", "post_gid", "synapse_index"])\
+          .sort_values(["post_gid", "pre_gid", "synapse_index"])\
+          .reset_index(drop=True)
+
+
+def test_pathway_synapses():
+    """
+    Synapses of a pathway should be selected in bulk, with those of each
+    connection numbered from zero.
+    """
+    connectome = _connectome()
+    pre_gids = np.array([3, 5, 11, 40])
+    post_gids = np.arange(0, NUMBER_CELLS, 2)
+    all_gids = np.arange(NUMBER_CELLS)
+
+    for pres, posts, pairs_pres, pairs_posts in [
+            (pre_gids, post_gids, pre_gids, post_gids),
+            (post_gids, pre_gids, post_gids, pre_gids),
+            (pre_gids, np.array([]), pre_gids, all_gids),
+            (np.array([]), post_gids, all_gids, post_gids)]:
+        synapses =\
+            connectome.pathway_synapses(
+                pres, posts, properties=["pre_gid", "post_gid", "synapse_index"])
+        expected =\
+            _synapses_of_pairs(
+                connectome,
+                [(pre_gid, post_gid)
+                 for pre_gid in pairs_pres for post_gid in pairs_posts])
+        assert synapses.shape[0] > 0
+        pd.testing.assert_frame_equal(
+            synapses.reset_index(drop=True), expected, check_dtype=False)
+        assert list(connectome.pathway_synapses(pres, posts)) ==\
+            list(expected.itertuples(index=False, name=None))
+
+    pd.testing.assert_frame_equal(
+        connectome.efferent_synapses(5, properties=["post_gid"]),
+        connectome.pathway_synapses([5], [], properties=["post_gid"]))
+    assert list(connectome.pair_synapses(5, 0)) ==\
+        list(_synapses_of_pairs(connectome, [(5, 0)])\
+             .itertuples(index=False, name=None))
+    assert len(connectome.pair_synapses(NUMBER_CELLS - 1, 0)) == 0
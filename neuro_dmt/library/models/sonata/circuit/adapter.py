@@ -22,6 +22,7 @@ from copy import deepcopy
 from collections.abc import Set, Mapping, Iterable
 import numpy as np
 import pandas as pd
+from bluepysnap.sonata_constants import Edge
 from dmt.model.interface import implements
 from dmt.model.adapter import adapts
 from dmt.tk.journal import Logger
@@ -32,7 +33,10 @@ from neuro_dmt.analysis.circuit.composition.interfaces import\
 from neuro_dmt.library.models.sonata.circuit.model import\
     SonataCircuitModel
 from neuro_dmt import terminology
-from neuro_dmt.utils.geometry.roi import Cuboid
+from neuro_dmt.utils.geometry.distance import\
+    bin_soma_distances, get_bin_mids
+from neuro_dmt.utils.geometry.roi import Cuboid, Sphere
+from .thickness import LayerThicknessGrid
 
 X = terminology.bluebrain.cell.x
 Y = terminology.bluebrain.cell.y
@@ -109,7 +113,7 @@ class SonataCircuitAdapter(WithFields):
 
     def get_sub_regions(self, circuit_model):
         """..."""
-        return circuit_model.cells.region.unique()\
+        return circuit_model.brain_regions\
             if self.model_has_subregions else\
                [self.get_brain_region(circuit_model)]
     @staticmethod
@@ -124,7 +128,7 @@ class SonataCircuitAdapter(WithFields):
             "Bad type {} of layer value {} ".format(type(layer), layer))
 
     def get_layers(self, circuit_model):
-        return [self._prefix_L(layer) for layer in circuit_model.cells.layer.unique()]
+        return [self._prefix_L(layer) for layer in circuit_model.layers]
 
     def get_layer_type(self, circuit_model):
         try:
@@ -134,11 +138,11 @@ class SonataCircuitAdapter(WithFields):
 
     def get_mtypes(self, circuit_model):
         """..."""
-        return circuit_model.cells.mtype.unique()
+        return np.array(circuit_model.mtypes)
 
     def get_etypes(self, circuit_model):
         """..."""
-        return circuit_model.cells.etype.unique()
+        return circuit_model.etypes
 
     def get_base_morphology(self, mtype):
         """
@@ -257,7 +261,7 @@ class SonataCircuitAdapter(WithFields):
         """
         A bounding box containing the circuit.
         """
-        df = self.get_cells(circuit_model)[XYZ]\
+        df = self.get_cells(circuit_model, properties=XYZ)[XYZ]\
                  .agg(["min", "max"])
         return Cuboid(df["min"].values, df["max"].values)
 
@@ -267,13 +271,17 @@ class SonataCircuitAdapter(WithFields):
             **spatial_query):
         """
         Get layer thickness sample for regions specified by a spatial query.
-        Thicknesses will be computed for all voxels visible for the spatial
-        query. Another possibility is to compute thickness for a random sample
-        of visible voxels.
+        Thickness of layers will be the apparent thickness in columns of the
+        circuit that span it along the y-axis, and that have a cross-section
+        of twice the bounding box size in the (x, z) plane.
+        Cells of the circuit are binned into columns on a grid once, and
+        the columns at sampled positions in the specified region are looked up.
 
-        Because there can be too many (voxel) positions in a region,
-        measurement will be made on a sample of positions in the specified
-        region.
+        Arguments
+        -------------
+        sample_size :: Number of positions to sample in the specified region.
+        ~              If `None`, thicknesses will be returned for all the
+        ~              columns that contain a cell in the specified region.
 
         Note
         ------
@@ -281,54 +289,29 @@ class SonataCircuitAdapter(WithFields):
         with layers along the y-axis.
         Change this for an atlas based circuit.
         """
-        cells = self.get_cells(
-            circuit_model, **spatial_query
-        ).assign(layer=lambda df: df.layer.apply(self._prefix_L))
-        bbox_circuit = cells[XYZ].agg(["min", "max"])
-        ymin_circuit = bbox_circuit.loc["min"].y
-        ymax_circuit = bbox_circuit.loc["max"].y
-
-        def _get_column(position):
-            """
-            Get a column spanning the circuit with its axis passing through
-            a given position.
-            """
-            return Cuboid(
-                np.array(
-                    [position[0], ymin_circuit, position[2]]
-                ) - self.bounding_box_size,
-                np.array(
-                    [position[0], ymax_circuit, position[2]]
-                ) + self.bounding_box_size
-            )
-
-        def _apparent_thickness(position):
-            """
-            Thickness of layers as apparent from a position in the column.
-            """
-            column = _get_column(position)
-            return\
-                self.get_cells(circuit_model, roi=column)[[LAYER, Y]]\
-                    .assign(**{LAYER: lambda df: df[LAYER].apply(self._prefix_L)})\
-                    .groupby(LAYER)\
-                    .agg(["min", "max"])[Y]\
-                    .apply(lambda ys: ys["max"] - ys["min"], axis=1)
-
-        positions = cells.sample(n=sample_size)[XYZ]
-        return positions.apply(_apparent_thickness, axis=1)
-        # return\
-        #     self.get_cells(circuit_model, **spatial_query)\
-        #         .groupby(terminology.bluebrain.cell.layer)\
-        #         .agg(["min", "max"])\
-        #         .y\
-        #         .apply(lambda ys: ys["max"] - ys["min"], axis=1)
+        grid =\
+            LayerThicknessGrid.for_circuit(
+                circuit_model, self,
+                column_size=2. * np.asarray(self.bounding_box_size)[[0, 2]])
+        positions =\
+            self.get_cells(circuit_model, properties=XYZ, **spatial_query)[XYZ]
+        if sample_size is None:
+            thickness =\
+                grid.get_thickness(
+                    np.unique(grid.get_columns(positions.to_numpy())))
+        else:
+            positions = positions.sample(n=sample_size)
+            thickness =\
+                grid.get_thickness_at(positions.to_numpy())\
+                    .set_index(positions.index)
+        return thickness.rename(columns=self._prefix_L)
 
     def get_height(self, circuit_model, depth):
         """
         Get height for model of a cortical column.
         """
-        cells = self.get_cells(circuit_model)
-        return cells.y.max() - depth
+        cells = self.get_cells(circuit_model, properties=[Y])
+        return cells[Y].max() - depth
 
     @terminology.use(*(
         terminology.circuit.terms + terminology.cell.terms))
@@ -422,17 +405,42 @@ class SonataCircuitAdapter(WithFields):
         """
         Get cells in a pandas.DataFrame
         """
+        roi = query.get(terminology.circuit.roi, None)
+        query = terminology.bluebrain.cell.filter(**query)
+        sphere = roi if isinstance(roi, Sphere) else None
+        if roi is not None and sphere is None:
+            query[terminology.circuit.roi] = roi
         cell_query =\
             self.get_cell_query(
                 self._resolve_query_region(
                     self.get_brain_region(circuit_model),
-                    **terminology.bluebrain.cell.filter(**query)))
+                    **query))
         if isinstance(target, str):
             cell_query["$target"] = target
 
-        cells =\
-            circuit_model.cell_collection\
-                         .get(group=cell_query, properties=properties)
+        engine = circuit_model.cell_query_engine
+        if engine.can_resolve(cell_query):
+            box = self._pop_box(cell_query)
+            roi = sphere if sphere is not None else box
+            cells =\
+                engine.get(
+                    cell_query,
+                    properties=[
+                        column for column in (
+                            properties if properties is not None
+                            else engine.property_names)
+                        if column != "gid"],
+                    gids=circuit_model.soma_position_grid.get_gids_in(roi)\
+                         if roi is not None else None)
+        else:
+            cells =\
+                circuit_model.cell_collection\
+                             .get(group=cell_query, properties=properties)
+            if sphere is not None:
+                cells =\
+                    cells.loc[np.intersect1d(
+                        cells.index.values,
+                        circuit_model.soma_position_grid.get_gids_in(sphere))]
         if isinstance(target, Iterable):
             if isinstance(target, str):
                 cells = cells.assign(group=target)
@@ -444,12 +452,57 @@ class SonataCircuitAdapter(WithFields):
         return cells.assign(gid=cells.index.values)\
             if with_gid_column else cells
 
+    def get_cells_all_populations(self,
+            circuit_model,
+            properties=None,
+            with_gid_column=True):
+        """
+        Get cells of all the node populations of the circuit, in a
+        pandas.DataFrame with a column `population`. Cells of the population
+        that `get_cells(...)` reads from keep their gids. Cells of the other
+        populations follow them, so that they can be measured together with
+        the synapses from `iter_population_synapses(...)`.
+        """
+        cells = circuit_model.get_cells_all_populations(properties)
+        return cells.assign(gid=cells.index.values)\
+            if with_gid_column else cells
+
+    @staticmethod
+    def _pop_box(cell_query):
+        """
+        Remove the ranges of soma position coordinates from a cell query,
+        and return them as a box, if the query has ranges for all of them.
+        """
+        if not all(
+                isinstance(cell_query.get(axis), tuple)
+                and len(cell_query[axis]) == 2
+                for axis in XYZ):
+            return None
+        ranges = [cell_query.pop(axis) for axis in XYZ]
+        return (
+            np.array([lower for lower, _ in ranges], dtype=np.float64),
+            np.array([upper for _, upper in ranges], dtype=np.float64))
+
+    def get_cell_counts(self, circuit_model, rois):
+        """
+        Number of cells in each of several regions of interest.
+
+        Arguments
+        -------------
+        rois :: Sequence of `Cuboid`s, `Sphere`s, or bounding boxes given as
+        ~       pairs of opposite corners.
+        """
+        return\
+            circuit_model.soma_position_grid.count_in([
+                _get_bounding_box(roi) if isinstance(roi, Cuboid) else roi
+                for roi in rois])
+
     def get_soma_positions(self, circuit_model, cells):
         """..."""
         try:
             return cells[XYZ]
         except KeyError:
-            return self.get_cells(circuit_model)\
+            return self.get_cells(circuit_model, properties=XYZ)\
                        .loc[cells.index.to_numpy(np.int32)]\
                        [XYZ]
 
@@ -459,16 +512,13 @@ class SonataCircuitAdapter(WithFields):
             cell_group,
             bin_size=100):
         """..."""
-        delta_positions =\
-            cell_group[XYZ].to_numpy(np.float)\
-            - cell[XYZ].to_numpy(np.float)
-        distances =\
-            np.linalg.norm(delta_positions, axis=1)
-        bin_starts =\
-            bin_size * np.floor(distances / bin_size)
-        return np.array([
-            bin_start + bin_size / 2.
-            for bin_start in bin_starts])
+        return\
+            get_bin_mids(
+                bin_soma_distances(
+                    cell[XYZ].to_numpy(np.float64),
+                    cell_group[XYZ].to_numpy(np.float64),
+                    bin_size),
+                bin_size)
 
     def get_cell_gids(self, circuit_model, cells=None):
         """..."""
@@ -498,7 +548,7 @@ class SonataCircuitAdapter(WithFields):
             try:
                 gids = np.array([cell_group.gid])
             except AttributeError:
-                gids = self.get_cells(circuit_model, **cell_group).gid.values
+                gids = self.get_cells(circuit_model, properties=[], **cell_group).gid.values
         elif isinstance(cell_group, pd.DataFrame):
             gids = cell_group.gid.values
         else:
@@ -512,19 +562,35 @@ class SonataCircuitAdapter(WithFields):
             circuit_model,
             post_synaptic,
             with_synapse_ids=False,
-            with_synapse_count=True):
+            with_synapse_count=True,
+            pre_synaptic=None):
         """
         Arguments
         ----------------
         post_synaptic :: Either a pandas.Series representing a cell
         ~                or a pandas.DataFrame containing cells as rows
         ~                or a numpy.array of cell gids.,
+        pre_synaptic :: Optional, restrict connections to these pre-synaptic
+        ~               cells, which may be specified like `post_synaptic`.
         """
         post_synaptic_gids =\
             self._resolve_gids(circuit_model, post_synaptic)
+        pre_synaptic_gids =\
+            self._resolve_gids(circuit_model, pre_synaptic)\
+            if pre_synaptic is not None else None
+        if with_synapse_count and not with_synapse_ids:
+            post_gids, pre_gids, strength =\
+                circuit_model.afferent_index.get(
+                    post_synaptic_gids, pre_synaptic_gids)
+            return\
+                pd.DataFrame({
+                    "pre_gid": pre_gids.astype(np.int32),
+                    "post_gid": post_gids.astype(np.int32),
+                    "strength": strength})
         iter_connections =\
             circuit_model.connectome\
                          .iter_connections(
+                             source=pre_synaptic_gids,
                              target=post_synaptic_gids,
                              return_edge_ids=with_synapse_ids,
                              return_edge_count=with_synapse_count)
@@ -547,7 +613,8 @@ class SonataCircuitAdapter(WithFields):
             circuit_model,
             pre_synaptic,
             with_synapse_ids=False,
-            with_synapse_count=True):
+            with_synapse_count=True,
+            post_synaptic=None):
         """
 
         Arguments
@@ -555,13 +622,28 @@ class SonataCircuitAdapter(WithFields):
         pre_synaptic :: Either a pandas.Series representing a cell
         ~               or a pandas.DataFrame containing cells as rows
         ~               or a numpy.array of cell gids.,
+        post_synaptic :: Optional, restrict connections to these post-synaptic
+        ~                cells, which may be specified like `pre_synaptic`.
         """
         pre_synaptic_gids =\
             self._resolve_gids(circuit_model, pre_synaptic)
+        post_synaptic_gids =\
+            self._resolve_gids(circuit_model, post_synaptic)\
+            if post_synaptic is not None else None
+        if with_synapse_count and not with_synapse_ids:
+            pre_gids, post_gids, strength =\
+                circuit_model.efferent_index.get(
+                    pre_synaptic_gids, post_synaptic_gids)
+            return\
+                pd.DataFrame({
+                    "pre_gid": pre_gids.astype(np.int32),
+                    "post_gid": post_gids.astype(np.int32),
+                    "strength": strength})
         iter_connections =\
             circuit_model.connectome\
                          .iter_connections(
                              source=pre_synaptic_gids,
+                             target=post_synaptic_gids,
                              return_edge_ids = with_synapse_ids,
                              return_edge_count=with_synapse_count)
         connections =\
@@ -579,13 +661,96 @@ class SonataCircuitAdapter(WithFields):
             return pd.DataFrame([], columns=["post_gid"])
         return pd.DataFrame({"post_gid": connections[:, 1]})
 
+    def iter_synapse_properties(self,
+            circuit_model,
+            properties,
+            cell_group=None,
+            direction="AFF",
+            cell_group_other=None,
+            size_chunk=None):
+        """
+        Stream properties of synapses, in columnar chunks of bounded size.
+
+        Arguments
+        ----------------
+        properties :: list of edge properties to read for each synapse.
+        cell_group :: cells whose synapses will be read, specified as for
+        ~             `get_connections`, or `None` for all the synapses.
+        direction :: "AFF" to read the synapses onto `cell_group`, "EFF" to
+        ~            read the synapses from it.
+        cell_group_other :: Optional, keep only the synapses with cells in
+        ~                   this group on the other side.
+        size_chunk :: maximum number of synapses to read at a time.
+
+        Yields
+        ----------------
+        `pandas.DataFrame` with columns `pre_gid`, `post_gid`, and the
+        requested properties, indexed by synapse (edge) id. Synapses of a
+        `cell_group` are read for a chunk of its cells at a time, and are
+        sorted by id within each chunk of cells.
+        """
+        chunks_edge_ids =\
+            circuit_model.iter_edge_ids(
+                self._resolve_gids(circuit_model, cell_group),
+                "AFF" if direction in ("AFF", "afferent", "aff") else "EFF")\
+            if cell_group is not None else [None]
+        gids_other =\
+            np.sort(self._resolve_gids(circuit_model, cell_group_other))\
+            if cell_group_other is not None else None
+        label_other =\
+            "pre_gid" if direction in ("AFF", "afferent", "aff") else "post_gid"
+        for edge_ids in chunks_edge_ids:
+            for edges in circuit_model.iter_edge_properties(
+                    properties, edge_ids=edge_ids, size_chunk=size_chunk):
+                synapses =\
+                    edges.rename(columns={
+                        Edge.SOURCE_NODE_ID: "pre_gid",
+                        Edge.TARGET_NODE_ID: "post_gid"})
+                if gids_other is not None:
+                    synapses =\
+                        synapses[np.in1d(
+                            synapses[label_other].to_numpy(np.int64),
+                            gids_other)]
+                yield synapses
+
+    def iter_population_synapses(self,
+            circuit_model,
+            population,
+            properties=(),
+            size_chunk=None):
+        """
+        Stream properties of the synapses of an edge population, that may
+        connect cells of different node populations, in columnar chunks
+        of bounded size.
+
+        Arguments
+        ----------------
+        population :: name of the edge population.
+        properties :: list of edge properties to read for each synapse.
+        size_chunk :: maximum number of synapses to read at a time.
+
+        Yields
+        ----------------
+        `pandas.DataFrame` with columns `pre_gid`, `post_gid`, and the
+        requested properties, indexed by synapse (edge) id. Gids are those
+        of `get_cells_all_populations(...)`.
+        """
+        return\
+            circuit_model.iter_population_edges(
+                population, properties, size_chunk=size_chunk)
+
     def get_connections(self,
             circuit_model,
             cell_group,
             direction,
             with_synapse_ids=False,
-            with_synapse_count=True):
-        """..."""
+            with_synapse_count=True,
+            cell_group_other=None):
+        """
+        Connections of cells in `cell_group` in a given direction,
+        restricted to cells in `cell_group_other` on the other side
+        if it is provided.
+        """
         if with_synapse_ids and with_synapse_count:
             raise TypeError(
                 """
@@ -596,11 +761,13 @@ class SonataCircuitAdapter(WithFields):
             self.get_afferent_connections(
                 circuit_model, cell_group,
                 with_synapse_ids=with_synapse_ids,
-                with_synapse_count=with_synapse_count)\
+                with_synapse_count=with_synapse_count,
+                pre_synaptic=cell_group_other)\
             if direction in ("AFF", "afferent", "aff") else\
                self.get_efferent_connections(
                    circuit_model,
                    cell_group,
                    with_synapse_ids,
-                   with_synapse_count)
+                   with_synapse_count,
+                   post_synaptic=cell_group_other)
 
@@ -20,6 +20,8 @@ Circuit models implementing SONATA
 """
 
 import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from collections.abc import Iterable
 import yaml
@@ -28,12 +30,20 @@ import pandas as pd
 import neurom
 from bluepysnap.circuit import Circuit as SnapCircuit
 from bluepysnap.exceptions import BluepySnapError
+from bluepysnap.sonata_constants import Edge
 from dmt.tk import collections
 from dmt.tk.field import NA, Field, LambdaField, lazyfield, WithFields
 from dmt.tk.journal import Logger
 from dmt.tk.collections import take
 from neuro_dmt import terminology
 from neuro_dmt.analysis.reporting import CircuitProvenance
+from neuro_dmt.analysis.circuit.tools.spatial import SomaPositionGrid
+from .edge_index import EdgeIndex
+from .populations import load_populations, PopulationIndex
+from .cache import\
+    save_index, load_index, saved_columns, save_columns, load_column,\
+    is_column_of_strings, decode_strings
+from ..query import CellQueryEngine
 
 X = terminology.bluebrain.cell.x
 Y = terminology.bluebrain.cell.y
@@ -94,6 +104,38 @@ class SonataCircuitModel(WithFields):
         Number of cells to sample for measurements.
         """,
         __default_value__=20)
+    path_cache = Field(
+        """
+        Path to a directory where the circuit's cells, and indexes of its
+        data, will be saved, to be reused by later runs.
+        Set to `None` to read the circuit's data afresh in every run.
+        """,
+        __required__=False,
+        __default_value__=os.path.join(os.path.expanduser("~"), ".cache", "dmt"))
+    voxel_size_soma_positions = Field(
+        """
+        Length of the side of voxels to index soma positions in.
+        Queries for regions of interest will be fastest for regions of
+        a size close to the voxel size.
+        """,
+        __default_value__=50.)
+    size_chunk_edges = Field(
+        """
+        Number of edges to read at a time to index the connectome.
+        """,
+        __default_value__=10000000)
+    size_chunk_nodes = Field(
+        """
+        Number of nodes whose edges to resolve at a time, when reading
+        the edges of a group of nodes.
+        """,
+        __default_value__=1000)
+    number_threads_loading = Field(
+        """
+        Number of threads to load the circuit's node and edge
+        populations in.
+        """,
+        __default_value__=8)
 
     def __init__(self, circuit=None, *args, **kwargs):
         """
@@ -126,15 +168,72 @@ class SonataCircuitModel(WithFields):
                            self.path_config_file))
 
 
+    @lazyfield
+    def node_populations(self):
+        """
+        All the node populations in the circuit, loaded concurrently.
+        """
+        return\
+            load_populations(
+                self.bluepysnap_circuit.nodes, self.number_threads_loading)
+
+    @lazyfield
+    def edge_populations(self):
+        """
+        All the edge populations in the circuit, loaded concurrently.
+        """
+        return\
+            load_populations(
+                self.bluepysnap_circuit.edges, self.number_threads_loading)
+
+    @lazyfield
+    def population_index(self):
+        """
+        Index of the nodes of all the populations by global gid.
+        The population of `self.cell_collection` comes first, so that the
+        global gids of its nodes are the gids of its cells everywhere else.
+        """
+        return\
+            PopulationIndex.from_populations(
+                self.node_populations,
+                first=self.name_cell_population\
+                if self.node_populations else None)
+
+    @staticmethod
+    def _get_main_population_name(populations, names):
+        """
+        The first population found among `names`, or the first population
+        if none of them are.
+        """
+        for name in names:
+            if name in populations:
+                return name
+        name_main = next(iter(populations))
+        if len(populations) > 1:
+            LOGGER.warn(
+                LOGGER.get_source_info(),
+                """
+                None of the populations {} found in {}.
+                Population {} will be used.
+                """.format(names, list(populations), name_main))
+        return name_main
+
+    @lazyfield
+    def name_cell_population(self):
+        """
+        Name of the node population of `self.cell_collection`.
+        """
+        return\
+            self._get_main_population_name(self.node_populations, ["All"])
+
     @lazyfield
     def cell_collection(self):
         """
         Cells in the circuit.
         """
         try:
-            bp = self.bluepysnap_circuit
-            return bp.nodes["All"]
-        except BluepySnapError as error:
+            return self.node_populations[self.name_cell_population]
+        except (BluepySnapError, StopIteration) as error:
             LOGGER.warn(
                 LOGGER.get_source_info(),
                 """Circuit does not have cells.
@@ -142,26 +241,239 @@ class SonataCircuitModel(WithFields):
                 \t{}""".format(error))
         return None
 
+    def get_cells_all_populations(self, properties):
+        """
+        Cells of all the node populations, read concurrently, and indexed
+        by their global gid in `self.population_index`.
+
+        Arguments
+        ------------
+        properties :: cell properties to read, from the populations that
+        ~             have them, or `None` to read all of their properties.
+        """
+        def _cells(name, population):
+            available =\
+                sorted(population.property_names) if properties is None else[
+                    variable for variable in properties
+                    if variable in population.property_names]
+            cells = population.get(properties=available)
+            cells.index =\
+                pd.Index(
+                    self.population_index.to_global(name, cells.index.values),
+                    name="gid")
+            return cells.assign(population=name)
+
+        with ThreadPoolExecutor(
+                max_workers=max(1, self.number_threads_loading)) as executor:
+            cells =\
+                list(executor.map(
+                    lambda name: _cells(name, self.node_populations[name]),
+                    self.population_index.names))
+        cells = pd.concat(cells, sort=False)
+        return cells.assign(
+            population=pd.Categorical(
+                cells.population.values,
+                categories=self.population_index.names))
+
+    def iter_population_edges(self,
+            population,
+            properties=(),
+            size_chunk=None):
+        """
+        Stream the edges of an edge population, in chunks, with the
+        nodes on both sides identified by their global gids in
+        `self.population_index`, so that edges between different node
+        populations can be grouped with the cells of all the populations.
+
+        Yields
+        ------------
+        `pandas.DataFrame` with columns `pre_gid`, `post_gid`, and
+        the requested properties, indexed by edge id.
+        """
+        edges = self.edge_populations[population]
+        size_chunk = size_chunk if size_chunk else self.size_chunk_edges
+        columns =\
+            [Edge.SOURCE_NODE_ID, Edge.TARGET_NODE_ID] + list(properties)
+        for begin in range(0, edges.size, size_chunk):
+            chunk =\
+                edges.get(
+                    np.arange(
+                        begin, min(begin + size_chunk, edges.size),
+                        dtype=np.int64),
+                    columns)
+            yield chunk.assign(**{
+                Edge.SOURCE_NODE_ID: self.population_index.to_global(
+                    edges.source.name, chunk[Edge.SOURCE_NODE_ID].values),
+                Edge.TARGET_NODE_ID: self.population_index.to_global(
+                    edges.target.name, chunk[Edge.TARGET_NODE_ID].values)
+            }).rename(columns={
+                Edge.SOURCE_NODE_ID: "pre_gid",
+                Edge.TARGET_NODE_ID: "post_gid"})
+
+    @lazyfield
+    def paths_nodes(self):
+        """
+        Paths to the files that contain the circuit's nodes.
+        """
+        try:
+            return[
+                path
+                for nodes in self.bluepysnap_circuit.config["networks"]["nodes"]
+                for path in (nodes["nodes_file"], nodes.get("node_types_file"))
+                if path]
+        except (KeyError, TypeError):
+            return []
+
+    @lazyfield
+    def cell_property_names(self):
+        """
+        Names of the properties that the circuit's cells have.
+        """
+        return sorted(self.cell_collection.property_names)
+
+    @lazyfield
+    def path_cache_cells(self):
+        """
+        Directory to cache the circuit's cells in, column by column.
+        """
+        return\
+            self.get_path_cache(
+                "cell_columns", [self.path_config_file] + self.paths_nodes)\
+            if self.caches_data else None
+
+    @lazyfield
+    def cell_index(self):
+        """
+        `pandas.Index` of the node ids of the circuit's cells.
+        """
+        path = self.path_cache_cells
+        if path is not None:
+            try:
+                return load_index(path)
+            except FileNotFoundError:
+                pass
+        index = pd.Index(self.cell_collection.ids())
+        if path is not None:
+            save_index(path, index)
+        return index
+
+    @lazyfield
+    def cell_columns(self):
+        """
+        Values of the cell properties that have been loaded, by name.
+        """
+        return {}
+
+    @lazyfield
+    def cell_columns_of_strings(self):
+        """
+        Names of the loaded cell properties whose strings were cached,
+        and loaded, as categoricals.
+        """
+        return set()
+
+    def get_cell_column(self, name):
+        """
+        Values of a property for all the circuit's cells.
+        A property is read from the circuit's nodes only the first time it is
+        needed, and is then cached in `self.path_cache`, where other processes
+        will find it without reading the circuit's nodes again.
+        """
+        if name not in self.cell_columns:
+            path = self.path_cache_cells
+            if path is not None and name in saved_columns(path):
+                values = load_column(path, name)
+                if is_column_of_strings(path, name):
+                    self.cell_columns_of_strings.add(name)
+            else:
+                column =\
+                    self.cell_collection.get(properties=[name])\
+                                        .reindex(self.cell_index)
+                if path is not None:
+                    LOGGER.status(
+                        LOGGER.get_source_info(),
+                        "Cache cell property {} of circuit {} at {}".format(
+                            name, self.label, path))
+                    save_columns(path, column)
+                    values = load_column(path, name)
+                    if is_column_of_strings(path, name):
+                        self.cell_columns_of_strings.add(name)
+                else:
+                    values = column[name].values
+            self.cell_columns[name] = values
+        return self.cell_columns[name]
+
+    def get_cell_values(self, name, positions=None):
+        """
+        Values of a property for the cells at `positions`, or for all the
+        circuit's cells, with the same type as the values read from the
+        circuit's nodes, whether the property was cached or not.
+        Strings that were cached as a categorical are decoded back to strings,
+        only for the cells selected.
+        """
+        values = self.get_cell_column(name)
+        if positions is not None:
+            values = values[positions]
+        return\
+            decode_strings(values)\
+            if name in self.cell_columns_of_strings else\
+               values
+
+    def get_cell_properties(self, properties):
+        """
+        Pandas data-frame with only the listed `properties` of all the cells.
+        """
+        return pd.DataFrame(
+            {name: self.get_cell_values(name) for name in properties},
+            columns=list(properties),
+            index=self.cell_index)
+
     @lazyfield
     def cells(self):
         """
-        Pandas data-frame with cells in rows.
+        Pandas data-frame with cells in rows, and all their properties.
+        Prefer `self.get_cell_properties`, that loads only the properties
+        that are needed.
         """
-        cells = self.cell_collection.get()
+        cells = self.get_cell_properties(self.cell_property_names)
         return cells.assign(gid=cells.index.values)
 
+    @lazyfield
+    def cell_query_engine(self):
+        """
+        Query engine over the cells, that loads properties as they are
+        queried, or requested.
+        """
+        return\
+            CellQueryEngine(
+                index=self.cell_index,
+                property_names=self.cell_property_names,
+                get_column=self.get_cell_column,
+                get_values=self.get_cell_values)
+
+    @lazyfield
+    def soma_position_grid(self):
+        """
+        Spatial index of the cells' soma positions.
+        """
+        cells = self.get_cell_properties(XYZ)
+        cells = cells.assign(gid=cells.index.values)
+        return\
+            SomaPositionGrid.from_cells(
+                cells, cells,
+                voxel_size=self.voxel_size_soma_positions)
+
     @lazyfield
     def connectome(self):
         """
         Connectome for the circuit.
         """
-        bp = self.bluepysnap_circuit
-        edges = bp.edges
         try:
-            return edges["All"]
-        except KeyError:
-            return edges["default"]
-        except BluepySnapError as error:
+            return\
+                self.edge_populations[
+                    self._get_main_population_name(
+                        self.edge_populations, ["All", "default"])]
+        except (BluepySnapError, StopIteration) as error:
             LOGGER.warn(
                 LOGGER.get_source_info(),
                 """Circuit does not have edges,
@@ -174,25 +486,187 @@ class SonataCircuitModel(WithFields):
         """
         Brain regions (or sub regions) that the circuit models.
         """
-        return self.cells.region.unique()
+        return pd.unique(self.get_cell_column("region"))
 
     @lazyfield
     def layers(self):
         """
         All the layers used in this circuit.
         """
-        return self.cells.layer.unique()
+        return pd.unique(self.get_cell_column("layer"))
 
     @lazyfield
     def mtypes(self):
         """
         All the mtypes used in this circuit.
         """
-        return list(self.cells.mtype.unique())
+        return list(pd.unique(self.get_cell_column("mtype")))
 
     @lazyfield
     def etypes(self):
         """
         All the etypes in this circuit.
         """
-        return self.cells.etype.unique()
+        return pd.unique(self.get_cell_column("etype"))
+
+    @property
+    def caches_data(self):
+        """
+        Is data derived from the circuit saved in `self.path_cache`?
+        """
+        return bool(getattr(self, "path_cache", None))
+
+    def get_path_cache(self, name, paths_data):
+        """
+        Directory to cache data named `name` derived from files at
+        `paths_data`. The directory is keyed by the paths to the files,
+        and their size and time of modification, so that data cached
+        for an older version of the files will not be used.
+        """
+        def _stamp(path):
+            try:
+                status = os.stat(path)
+            except OSError:
+                return "{}:missing".format(path)
+            return "{}:{}:{}".format(path, status.st_size, status.st_mtime_ns)
+
+        key =\
+            hashlib.sha1(
+                "\n".join(
+                    _stamp(os.path.abspath(path)) for path in paths_data
+                ).encode("utf-8")
+            ).hexdigest()
+        return os.path.join(self.path_cache, name, key)
+
+    @lazyfield
+    def paths_edges(self):
+        """
+        Paths to the files that contain the circuit's edges.
+        """
+        try:
+            return[
+                edges["edges_file"]
+                for edges in self.bluepysnap_circuit.config["networks"]["edges"]]
+        except (KeyError, TypeError):
+            return [self.path_config_file]
+
+    def _iter_edges(self, direction):
+        """
+        Stream the (key, neighbor) node ids of the edges, in chunks.
+        """
+        connectome = self.connectome
+        key, neighbor =\
+            (Edge.TARGET_NODE_ID, Edge.SOURCE_NODE_ID)\
+            if direction == "AFF" else\
+               (Edge.SOURCE_NODE_ID, Edge.TARGET_NODE_ID)
+        for begin in range(0, connectome.size, self.size_chunk_edges):
+            edges =\
+                connectome.get(
+                    np.arange(
+                        begin, min(begin + self.size_chunk_edges, connectome.size)),
+                    [key, neighbor])
+            yield edges[key].to_numpy(np.int64), edges[neighbor].to_numpy(np.int64)
+
+    def iter_edge_ids(self, gids, direction):
+        """
+        Stream sorted ids of the edges of nodes with `gids`, in a direction,
+        resolving the edges of at most `self.size_chunk_nodes` nodes at a
+        time, so that the edges of a large group of nodes are never all
+        held in memory.
+
+        Arguments
+        ------------
+        direction :: "AFF" for the edges to the nodes, "EFF" for those
+        ~            from the nodes.
+        """
+        gids = np.unique(np.asarray(gids, dtype=np.int64))
+        get_edges =\
+            self.connectome.afferent_edges\
+            if direction == "AFF" else\
+               self.connectome.efferent_edges
+        for begin in range(0, gids.shape[0], self.size_chunk_nodes):
+            edge_ids =\
+                get_edges(gids[begin:begin + self.size_chunk_nodes])
+            yield np.unique(np.asarray(edge_ids, dtype=np.int64))
+
+    def iter_edge_properties(self,
+            properties,
+            edge_ids=None,
+            size_chunk=None):
+        """
+        Stream properties of edges, in chunks of at most `size_chunk`
+        edges. Sorted edge ids are read from the edge file in contiguous
+        ranges, so that reading all of a node's edges is sequential.
+
+        Arguments
+        ------------
+        properties :: list of edge properties to read.
+        edge_ids :: sorted ids of the edges to read, all edges by default.
+        size_chunk :: number of edges to read at a time,
+        ~             `self.size_chunk_edges` by default.
+
+        Yields
+        ------------
+        `pandas.DataFrame` with the source and target node ids of the
+        edges, and the requested properties, indexed by edge id.
+        """
+        connectome = self.connectome
+        size_chunk = size_chunk if size_chunk else self.size_chunk_edges
+        number_edges =\
+            connectome.size if edge_ids is None else edge_ids.shape[0]
+        columns =\
+            [Edge.SOURCE_NODE_ID, Edge.TARGET_NODE_ID] + [
+                variable for variable in properties
+                if variable not in (Edge.SOURCE_NODE_ID, Edge.TARGET_NODE_ID)]
+        for begin in range(0, number_edges, size_chunk):
+            end = min(begin + size_chunk, number_edges)
+            yield\
+                connectome.get(
+                    np.arange(begin, end, dtype=np.int64)
+                    if edge_ids is None else edge_ids[begin:end],
+                    columns)
+
+    def get_edge_index(self, direction):
+        """
+        Index of connections in a direction, built from the edges once,
+        and cached as memory-mapped `.npy` files.
+
+        Arguments
+        ------------
+        direction :: "AFF" to index connections by post-synaptic node,
+        ~            or "EFF" to index them by pre-synaptic node.
+        """
+        number_nodes =\
+            self.connectome.target.size if direction == "AFF" else\
+            self.connectome.source.size
+        if not self.caches_data:
+            return\
+                EdgeIndex.from_edges(
+                    self._iter_edges(direction), number_nodes=number_nodes)
+        path =\
+            os.path.join(
+                self.get_path_cache("edge_index", self.paths_edges),
+                "{}_{}".format(self.connectome.name, direction))
+        if not EdgeIndex.exists(path):
+            LOGGER.status(
+                LOGGER.get_source_info(),
+                "Index {} connections of circuit {}, to be saved at {}".format(
+                    direction, self.label, path))
+            EdgeIndex.from_edges(
+                self._iter_edges(direction), number_nodes=number_nodes
+            ).save(path)
+        return EdgeIndex.load(path)
+
+    @lazyfield
+    def afferent_index(self):
+        """
+        Connections indexed by post-synaptic node.
+        """
+        return self.get_edge_index("AFF")
+
+    @lazyfield
+    def efferent_index(self):
+        """
+        Connections indexed by pre-synaptic node.
+        """
+        return self.get_edge_index("EFF")
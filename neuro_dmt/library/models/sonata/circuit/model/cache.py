@@ -0,0 +1,234 @@
+# Copyright (c) 2019, EPFL/Blue Brain Project
+
+# This file is part of BlueBrain SNAP library <https://github.com/BlueBrain/snap>
+
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+Save a dataframe column by column, to be loaded quickly by other processes,
+one column at a time if required.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from .files import write_replacing
+
+
+def _path_array(path, name):
+    """..."""
+    return os.path.join(path, "{}.npy".format(name))
+
+
+def _save_array(path, name, array):
+    """
+    Save an array, replacing any saved before only once it is written.
+    """
+    write_replacing(
+        _path_array(path, name),
+        lambda file_array: np.save(
+            file_array, array, allow_pickle=(array.dtype == object)))
+
+
+def _load_array(path, name, mmap_mode):
+    """
+    Load an array, memory-mapped unless it contains python objects.
+    """
+    try:
+        return np.load(_path_array(path, name), mmap_mode=mmap_mode)
+    except ValueError:
+        return np.load(_path_array(path, name), allow_pickle=True)
+
+
+def _values(values):
+    """
+    Values as an array that can be saved without pickling,
+    if all of them are strings.
+    """
+    values = np.asarray(values)
+    if values.dtype == object and all(isinstance(v, str) for v in values):
+        return values.astype(str)
+    return values
+
+
+def _label(column):
+    """
+    Label of the files of a column, that can be used in a path whatever
+    the name of the column.
+    """
+    return "column_{}".format(
+        hashlib.sha1(json.dumps(column).encode("utf-8")).hexdigest()[:16])
+
+
+def has_dataframe(path):
+    """
+    Has (the index of) a dataframe been saved in directory `path`?
+    """
+    return os.path.exists(os.path.join(path, "index.json"))
+
+
+def save_index(path, index):
+    """
+    Save the index of a dataframe, to which columns may then be saved.
+    """
+    os.makedirs(path, exist_ok=True)
+    _save_array(path, "index", _values(index.values))
+    write_replacing(
+        os.path.join(path, "index.json"),
+        lambda file_index: json.dump({"name": index.name}, file_index),
+        mode='w')
+    return index
+
+
+def load_index(path, mmap_mode="r"):
+    """..."""
+    with open(os.path.join(path, "index.json"), 'r') as file_index:
+        description = json.load(file_index)
+    return pd.Index(
+        _load_array(path, "index", mmap_mode), name=description["name"])
+
+
+def saved_columns(path):
+    """
+    Names of the columns that have been saved in directory `path`.
+    """
+    if not os.path.isdir(path):
+        return []
+    columns = []
+    for name in os.listdir(path):
+        if name.startswith("column_") and name.endswith(".json"):
+            with open(os.path.join(path, name), 'r') as file_column:
+                columns.append(json.load(file_column)["name"])
+    return columns
+
+
+def save_columns(path, dataframe):
+    """
+    Save the columns of a dataframe in directory `path`, in which its index
+    has been saved, with a `.npy` file for each array.
+    Categorical columns are saved as integer codes and their categories,
+    and so are columns of strings, which `load_column` will load as
+    categoricals, and `load_dataframe` will decode back to strings.
+    The description of a column is written last, to mark it as completely
+    saved.
+    """
+    for name, column in dataframe.items():
+        label = _label(name)
+        if pd.api.types.is_categorical_dtype(column.dtype):
+            kind = "categorical"
+        elif column.dtype == object:
+            kind = "object"
+            column = column.astype("category")
+        else:
+            kind = "values"
+            _save_array(path, label, column.to_numpy())
+        if kind != "values":
+            #codes are saved with the integer type that pandas uses for
+            #them, so that they will be memory-mapped without a copy.
+            _save_array(path, label, column.cat.codes.to_numpy())
+            _save_array(
+                path, "{}_categories".format(label),
+                _values(column.cat.categories))
+        description ={
+            "name": name,
+            "kind": kind,
+            "ordered": kind != "values" and bool(column.cat.ordered)}
+        write_replacing(
+            os.path.join(path, "{}.json".format(label)),
+            lambda file_column: json.dump(description, file_column),
+            mode='w')
+    return dataframe
+
+
+def _load_description(path, name):
+    """
+    Description of a column saved in directory `path`.
+    """
+    with open(os.path.join(path, "{}.json".format(_label(name))), 'r')\
+         as file_column:
+        return json.load(file_column)
+
+
+def is_column_of_strings(path, name):
+    """
+    Was the column saved in directory `path` a column of strings,
+    that will be loaded as a categorical?
+    """
+    return _load_description(path, name)["kind"] == "object"
+
+
+def load_column(path, name, mmap_mode="r"):
+    """
+    Load a column saved in directory `path`.
+    Arrays of numbers, and the codes of categorical columns, are
+    memory-mapped by default, so that processes loading the same column
+    will share its pages.
+
+    Returns
+    ------------
+    `np.ndarray`, or `pandas.Categorical` for a categorical column,
+    or a column of strings. Use `decode_strings` to get back the strings
+    of a column of strings.
+    """
+    label = _label(name)
+    description = _load_description(path, name)
+    values = _load_array(path, label, mmap_mode)
+    if description["kind"] == "values":
+        return values
+    return\
+        pd.Categorical.from_codes(
+            values,
+            categories=_load_array(path, "{}_categories".format(label), None),
+            ordered=description["ordered"])
+
+
+def decode_strings(values):
+    """
+    Strings of (a selection of) a column of strings loaded as a categorical,
+    in an array of objects, as they were before they were saved.
+    Group-bys on the strings will not add groups for the categories
+    that were not observed.
+    """
+    return np.asarray(values, dtype=object)
+
+
+def save_dataframe(path, dataframe):
+    """
+    Save a dataframe, its index and all of its columns,
+    in directory `path`.
+    """
+    save_index(path, dataframe.index)
+    return save_columns(path, dataframe)
+
+
+def load_dataframe(path, columns=None, mmap_mode="r"):
+    """
+    Load a dataframe saved in directory `path`, with all the columns saved,
+    or only those among `columns`.
+    """
+    if columns is None:
+        columns = saved_columns(path)
+
+    def _load(name):
+        values = load_column(path, name, mmap_mode)
+        return\
+            decode_strings(values)\
+            if is_column_of_strings(path, name) else\
+               values
+
+    return pd.DataFrame(
+        {name: _load(name) for name in columns},
+        index=load_index(path, mmap_mode))
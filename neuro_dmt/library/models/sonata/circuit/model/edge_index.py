@@ -0,0 +1,172 @@
+# Copyright (c) 2019, EPFL/Blue Brain Project
+
+# This file is part of BlueBrain SNAP library <https://github.com/BlueBrain/snap>
+
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+Index of the connections of a circuit, to query connections of many cells
+at once.
+"""
+
+import os
+import numpy as np
+from dmt.tk.field import Field, WithFields
+from dmt.tk.journal import Logger
+from .files import write_replacing
+
+LOGGER = Logger(client=__file__)
+
+#node ids are packed into a single int64 (key, neighbor) code
+#to sort connections, with the neighbor in the lower bits.
+SHIFT_KEY = 31
+
+
+class EdgeIndex(WithFields):
+    """
+    Connections of a circuit, in compressed sparse row (CSR) layout.
+    Cells connected to the i-th node (on the other side of the connection),
+    and the number of synapses of these connections, are
+    `neighbors[offsets[i]:offsets[i+1]]` and `counts[offsets[i]:offsets[i+1]]`,
+    sorted by the neighbor's node id.
+
+    An index of afferent connections is keyed by post-synaptic node,
+    with pre-synaptic nodes as neighbors, and an index of efferent connections
+    the other way around.
+    """
+    offsets = Field(
+        """
+        `np.ndarray<int64>` of size (number of nodes + 1), offsets of each
+        node's connections in `neighbors` and `counts`.
+        """)
+    neighbors = Field(
+        """
+        `np.ndarray<int64>` node ids of the connected nodes.
+        """)
+    counts = Field(
+        """
+        `np.ndarray<int32>` number of synapses of each connection.
+        """)
+
+    files = ("offsets", "neighbors", "counts")
+
+    @classmethod
+    def from_edges(cls, edges, number_nodes=None):
+        """
+        Index synapses streamed in chunks.
+
+        Arguments
+        -------------
+        edges :: iterable of tuples (keys, neighbors), arrays of node ids
+        ~        of the synapses in a chunk: `keys` are the nodes to index
+        ~        connections by, and `neighbors` the nodes they connect to.
+        number_nodes :: Number of nodes to index, inferred from the node ids
+        ~               if not provided.
+        """
+        codes_chunks = []
+        counts_chunks = []
+        for keys, neighbors in edges:
+            codes, counts = np.unique(
+                (np.asarray(keys, dtype=np.int64) << SHIFT_KEY)
+                | np.asarray(neighbors, dtype=np.int64),
+                return_counts=True)
+            codes_chunks.append(codes)
+            counts_chunks.append(counts)
+
+        if codes_chunks:
+            codes, inverse = np.unique(
+                np.concatenate(codes_chunks), return_inverse=True)
+            counts = np.bincount(
+                inverse, weights=np.concatenate(counts_chunks),
+                minlength=codes.shape[0])
+        else:
+            codes = np.zeros(0, dtype=np.int64)
+            counts = np.zeros(0)
+        keys = codes >> SHIFT_KEY
+        neighbors = codes & ((1 << SHIFT_KEY) - 1)
+
+        if number_nodes is None:
+            number_nodes = keys[-1] + 1 if keys.shape[0] > 0 else 0
+        return cls(
+            offsets=np.concatenate([
+                [0],
+                np.cumsum(np.bincount(keys, minlength=number_nodes))
+            ]).astype(np.int64),
+            neighbors=neighbors,
+            counts=counts.astype(np.int32))
+
+    def save(self, path):
+        """
+        Save the index arrays as `.npy` files in directory `path`.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.files:
+            write_replacing(
+                os.path.join(path, "{}.npy".format(name)),
+                lambda file_array: np.save(file_array, getattr(self, name)))
+        return self
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Load an index saved in directory `path`, memory-mapping the arrays
+        by default.
+        """
+        return cls(**{
+            name: np.load(
+                os.path.join(path, "{}.npy".format(name)), mmap_mode=mmap_mode)
+            for name in cls.files})
+
+    @classmethod
+    def exists(cls, path):
+        """
+        Has an index been saved in directory `path`?
+        """
+        return all(
+            os.path.exists(os.path.join(path, "{}.npy".format(name)))
+            for name in cls.files)
+
+    @property
+    def number_nodes(self):
+        """..."""
+        return self.offsets.shape[0] - 1
+
+    def get(self, nodes, nodes_other=None):
+        """
+        Connections of `nodes`, optionally restricted to connections with
+        `nodes_other`.
+
+        Returns
+        ------------
+        A tuple of arrays (nodes, neighbors, counts), sorted by node and
+        then by neighbor, with each connection of a node counted once.
+        """
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        nodes = nodes[(nodes >= 0) & (nodes < self.number_nodes)]
+        begins = self.offsets[nodes]
+        lengths = self.offsets[nodes + 1] - begins
+        total = lengths.sum()
+        positions =\
+            np.repeat(begins - np.cumsum(lengths) + lengths, lengths)\
+            + np.arange(total)
+        keys = np.repeat(nodes, lengths)
+        neighbors = np.asarray(self.neighbors[positions], dtype=np.int64)
+        counts = np.asarray(self.counts[positions])
+        if nodes_other is not None:
+            connected = np.isin(
+                neighbors, np.asarray(nodes_other, dtype=np.int64))
+            keys = keys[connected]
+            neighbors = neighbors[connected]
+            counts = counts[connected]
+        return keys, neighbors, counts
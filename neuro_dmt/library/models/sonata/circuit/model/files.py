@@ -0,0 +1,49 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Write files that other processes may be writing, or reading, at the same time.
+"""
+
+import os
+import tempfile
+
+
+def write_replacing(path, write, mode="wb"):
+    """
+    Write a file through a uniquely named temporary file in the same
+    directory, that then replaces any file at `path`. Concurrent writers will
+    never write to the same file, and readers will never find a partial file.
+
+    Arguments
+    ------------
+    path :: Path of the file to write.
+    write :: Callable that writes the file's content to an open file object.
+    mode :: Mode to open the temporary file in.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    descriptor, path_tmp =\
+        tempfile.mkstemp(
+            dir=directory, prefix=".{}.".format(name), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, mode) as file_tmp:
+            write(file_tmp)
+        os.chmod(path_tmp, 0o644)
+        os.replace(path_tmp, path)
+    except BaseException:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+        raise
+    return path
@@ -0,0 +1,139 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Node and edge populations of a SONATA circuit, loaded concurrently,
+and an index of the nodes of all the populations by a global gid.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields
+
+
+def _opened(population):
+    """
+    Open a population's files, and read its metadata.
+    """
+    population.size
+    population.property_names
+    return population
+
+
+def load_populations(container, number_threads=8):
+    """
+    All the populations in a BluePySNAP `Nodes` or `Edges` container,
+    each opened in a pool of threads.
+
+    Returns
+    -----------
+    dict population name --> population, in the order of population names.
+    """
+    names = list(container.population_names)
+    if not names:
+        return {}
+    with ThreadPoolExecutor(
+            max_workers=max(1, min(number_threads, len(names)))) as executor:
+        populations =\
+            list(executor.map(
+                lambda name: _opened(container[name]),
+                names))
+    return dict(zip(names, populations))
+
+
+class PopulationIndex(WithFields):
+    """
+    Index the nodes of several populations by a global gid.
+    Nodes of each population are given consecutive gids, following those of
+    the previous populations, so that the global gid of a node is the offset
+    of its population added to its id in the population.
+    """
+    names = Field(
+        """
+        Names of the populations, in the order of their gids.
+        """)
+    sizes = Field(
+        """
+        Number of nodes in each of the populations.
+        """)
+
+    @classmethod
+    def from_populations(cls, populations, first=None):
+        """
+        Index the nodes of a mapping name --> population,
+        with the nodes of population `first` first, if it is provided.
+        """
+        names = list(populations.keys())
+        if first is not None:
+            names = [first] + [name for name in names if name != first]
+        return cls(
+            names=names,
+            sizes=np.array(
+                [populations[name].size for name in names],
+                dtype=np.int64))
+
+    @lazyfield
+    def offsets(self):
+        """
+        Global gid of the first node of each population,
+        followed by the total number of nodes.
+        """
+        return np.concatenate([[0], np.cumsum(self.sizes)]).astype(np.int64)
+
+    @lazyfield
+    def positions(self):
+        """
+        Mapping population name --> position in `self.names`.
+        """
+        return {name: position for position, name in enumerate(self.names)}
+
+    @property
+    def number_gids(self):
+        """..."""
+        return int(self.offsets[-1])
+
+    def to_global(self, population, ids):
+        """
+        Global gids of nodes with `ids` in a population.
+        """
+        position = self.positions[population]
+        return np.asarray(ids, dtype=np.int64) + self.offsets[position]
+
+    def to_local(self, gids):
+        """
+        Population and id in the population, of nodes with global `gids`.
+
+        Returns
+        -----------
+        A tuple (`pandas.Categorical` population names, `np.ndarray` ids)
+        """
+        gids = np.asarray(gids, dtype=np.int64)
+        if np.any((gids < 0) | (gids >= self.number_gids)):
+            raise ValueError(
+                "Gids outside the {} nodes of the populations."\
+                .format(self.number_gids))
+        positions = np.searchsorted(self.offsets, gids, side="right") - 1
+        return(
+            pd.Categorical.from_codes(positions, categories=self.names),
+            gids - self.offsets[positions])
+
+    def as_dataframe(self):
+        """
+        Size and offset of each population.
+        """
+        return pd.DataFrame(
+            {"size": self.sizes, "offset": self.offsets[:-1]},
+            index=pd.Index(self.names, name="population"))
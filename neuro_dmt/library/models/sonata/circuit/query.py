@@ -0,0 +1,233 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+# for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Query cells of a circuit, by their properties, without scanning all of them.
+"""
+
+from collections import OrderedDict
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields, Record
+
+
+class CellQueryEngine(WithFields):
+    """
+    Resolve queries for cells, with the semantics of a BluePySNAP node
+    query: a pair of values for a floating point property selects cells in
+    the closed range between them, while a value or a list of values for
+    any other property selects cells that have one of the values.
+
+    An inverted index (value --> sorted positions of the cells that have it)
+    is built, on first use, for each of the non floating point properties.
+    Queried ranges are resolved by masking only the cells that remain after
+    the inverted indexes have been consulted. Positions of the cells that
+    match recent queries are memoized in a bounded LRU.
+
+    Properties of the cells are accessed one column at a time, so that only
+    the properties that are queried, or requested, need to be loaded.
+    """
+    index = Field(
+        """
+        `pandas.Index` of the node ids of all the cells.
+        """)
+    property_names = Field(
+        """
+        Names of all the properties that the cells have.
+        """)
+    get_column = Field(
+        """
+        Callable that returns the values of a property for all the cells,
+        as a `np.ndarray` or a `pandas.Categorical`.
+        """)
+    get_values = Field(
+        """
+        Callable on (property, positions) that returns the values of
+        a property for the cells at `positions`, as they should be returned.
+        By default, the values of `get_column` are returned as they are.
+        """,
+        __required__=False)
+    size_cache = Field(
+        """
+        Maximum number of queries whose results will be remembered.
+        """,
+        __default_value__=256)
+
+    @classmethod
+    def from_dataframe(cls, cells, **kwargs):
+        """
+        Query engine over cells already loaded in a dataframe.
+        """
+        return cls(
+            index=cells.index,
+            property_names=list(cells.columns),
+            get_column=lambda variable: cells[variable].values,
+            **kwargs)
+
+    @property
+    def number_cells(self):
+        """..."""
+        return self.index.shape[0]
+
+    @lazyfield
+    def inverted_indexes(self):
+        """
+        Inverted index of each property that has been queried.
+        """
+        return {}
+
+    @lazyfield
+    def cache(self):
+        """
+        Positions of cells that matched a query, most recent last.
+        """
+        return OrderedDict()
+
+    def is_range(self, variable):
+        """
+        Will values of a variable be queried as ranges?
+        """
+        return np.issubdtype(self.get_column(variable).dtype.type, np.floating)
+
+    def get_inverted_index(self, variable):
+        """
+        Inverted index of the values of a (non floating point) property.
+        The positions of cells with the k-th value are
+        `order[starts[k]:starts[k+1]]`, in ascending order.
+        """
+        if variable not in self.inverted_indexes:
+            codes, values = pd.factorize(self.get_column(variable))
+            order = np.argsort(codes, kind="stable")
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            self.inverted_indexes[variable] =\
+                Record(
+                    values=pd.Index(values),
+                    order=order[np.sum(codes < 0):],
+                    starts=np.concatenate([[0], np.cumsum(counts)]))
+        return self.inverted_indexes[variable]
+
+    def _positions_with_values(self, variable, values):
+        """
+        Sorted positions of cells that have one of the `values` of
+        a variable.
+        """
+        index = self.get_inverted_index(variable)
+        values = np.atleast_1d(np.asarray(values, dtype=object))
+        try:
+            codes = index.values.get_indexer(values)
+        except (TypeError, ValueError):
+            codes = np.array([
+                index.values.get_loc(value) if value in index.values else -1
+                for value in values])
+        codes = np.unique(codes[codes >= 0])
+        return np.sort(np.concatenate(
+            [index.order[index.starts[code]:index.starts[code + 1]]
+             for code in codes]
+            + [np.array([], dtype=np.int64)]))
+
+    @staticmethod
+    def _hashable(value):
+        """..."""
+        if isinstance(value, (list, set, np.ndarray, pd.Index)):
+            return ("values", tuple(value))
+        return value
+
+    def can_resolve(self, query):
+        """
+        Can `query` be resolved without BluePySNAP?
+        Queries for node sets, with operators ('$or', '$regex', ...),
+        or for properties that the cells do not have, cannot.
+        """
+        return all(
+            variable in self.property_names and not isinstance(value, Mapping)
+            for variable, value in query.items())
+
+    def get_positions(self, query):
+        """
+        Sorted positions of the cells matching `query`.
+        """
+        key = tuple(sorted(
+            (variable, self._hashable(value))
+            for variable, value in query.items()))
+        try:
+            positions = self.cache[key]
+        except KeyError:
+            pass
+        else:
+            self.cache.move_to_end(key)
+            return positions
+
+        positions = None
+        ranges = []
+        for variable, value in query.items():
+            if self.is_range(variable):
+                ranges.append((variable, value))
+                continue
+            matching = self._positions_with_values(variable, value)
+            positions =\
+                matching if positions is None else\
+                   np.intersect1d(positions, matching, assume_unique=True)
+
+        for variable, (lower, upper) in ranges:
+            values = np.asarray(self.get_column(variable))
+            if positions is None:
+                positions = np.flatnonzero((values >= lower) & (values <= upper))
+            else:
+                values = values[positions]
+                positions = positions[(values >= lower) & (values <= upper)]
+
+        if positions is None:
+            positions = np.arange(self.number_cells)
+
+        self.cache[key] = positions
+        while len(self.cache) > self.size_cache:
+            self.cache.popitem(last=False)
+        return positions
+
+    def get(self, query, properties=None, gids=None):
+        """
+        Cells matching a query, ordered by node id.
+
+        Arguments
+        -------------
+        query :: Mapping property --> value(s)
+        properties :: Properties of the cells to return, all by default.
+        gids :: Sorted node ids to restrict the cells to, for example those
+        ~       found by a spatial index.
+
+        Returns
+        ------------
+        `pandas.DataFrame` with only the requested properties, loaded only
+        for the matching cells.
+        """
+        positions = self.get_positions(query)
+        if gids is not None:
+            positions =\
+                np.intersect1d(
+                    positions, self.index.get_indexer(gids),
+                    assume_unique=True)
+        if properties is None:
+            properties = self.property_names
+        get_values =\
+            getattr(self, "get_values", None)\
+            or (lambda variable, positions:
+                self.get_column(variable)[positions])
+        return pd.DataFrame(
+            {variable: get_values(variable, positions)
+             for variable in properties},
+            columns=properties,
+            index=self.index[positions])
@@ -0,0 +1,216 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test caching dataframes of cells.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from neuro_dmt import terminology
+from neuro_dmt.analysis.circuit.tools import PathwayMeasurement
+from ..model import SonataCircuitModel
+from ..adapter import SonataCircuitAdapter
+from ..model.cache import\
+    has_dataframe, save_dataframe, load_dataframe,\
+    save_index, save_columns, saved_columns, load_column
+
+
+def _is_memory_mapped(array):
+    """
+    Is `array` a view of a memory-mapped array?
+    """
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def test_save_load(tmpdir):
+    """
+    A saved dataframe should load with the same values and dtypes,
+    with numeric columns, and codes of strings, memory-mapped.
+    """
+    cells = pd.DataFrame(
+        {"mtype": pd.Categorical(["L2_TPC", "L4_SS", "L2_TPC", "L6_BPC"]),
+         "layer": [2, 4, 2, 6],
+         "region": ["SSp-ll", "SSp-ll", np.nan, "SSp-ul"],
+         "x": [1., 2., 3., 4.]},
+        index=pd.Index(np.arange(4, dtype=np.int64), name="node_ids"))
+    path = str(tmpdir.join("cells"))
+    assert not has_dataframe(path)
+    save_dataframe(path, cells)
+    assert has_dataframe(path)
+
+    loaded = load_dataframe(path, columns=list(cells.columns))
+    pd.testing.assert_frame_equal(loaded, cells)
+    assert list(loaded.mtype.cat.categories) == ["L2_TPC", "L4_SS", "L6_BPC"]
+    assert isinstance(load_column(path, "x"), np.memmap)
+    for name in ("mtype", "region"):
+        assert _is_memory_mapped(load_column(path, name).codes)
+
+
+def test_save_columns_incrementally(tmpdir):
+    """
+    Columns saved one at a time should load as the same dataframe.
+    """
+    cells = pd.DataFrame(
+        {"mtype": ["L2_TPC", "L4_SS", "L2_TPC"],
+         ("position", "y"): [1., 2., 3.]},
+        index=pd.Index(np.arange(3), name="node_ids"))
+    path = str(tmpdir)
+    save_index(path, cells.index)
+    assert saved_columns(path) == []
+    save_columns(path, cells[["mtype"]])
+    assert saved_columns(path) == ["mtype"]
+    save_columns(path, cells[[("position", "y")]])
+    pd.testing.assert_frame_equal(
+        load_dataframe(path, columns=["mtype", ("position", "y")]),
+        cells)
+
+
+def test_concurrent_saves(tmpdir):
+    """
+    Dataframes saved concurrently to the same directory should load intact,
+    with no temporary files left behind.
+    """
+    cells = pd.DataFrame(
+        {"mtype": np.repeat(["L2_TPC", "L4_SS", "L6_BPC"], 1000),
+         "x": np.arange(3000, dtype=np.float64)},
+        index=pd.Index(np.arange(3000, dtype=np.int64), name="node_ids"))
+    path = str(tmpdir)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: save_dataframe(path, cells), range(8)))
+    assert not [
+        name for name in os.listdir(path) if name.endswith(".tmp")]
+    pd.testing.assert_frame_equal(
+        load_dataframe(path, columns=["mtype", "x"]),
+        cells)
+
+
+class _Nodes:
+    """
+    A node population, as read by BluePySNAP.
+    """
+    name = "All"
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    @property
+    def size(self):
+        return self.cells.shape[0]
+
+    @property
+    def property_names(self):
+        return set(self.cells.columns)
+
+    def ids(self):
+        return self.cells.index.values
+
+    def get(self, group=None, properties=None):
+        return self.cells[
+            properties if properties is not None else list(self.cells.columns)]
+
+
+class _Container(dict):
+    """
+    BluePySNAP `Nodes` or `Edges`.
+    """
+    @property
+    def population_names(self):
+        return sorted(self)
+
+
+class _Adapter(SonataCircuitAdapter):
+    """
+    Adapter that finds connections in a table.
+    """
+    def __init__(self, connections, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = connections
+
+    def get_connections(self, circuit_model, cell_group, direction, **kwargs):
+        gids =\
+            cell_group.gid.values if isinstance(cell_group, pd.DataFrame)\
+            else np.atleast_1d(cell_group)
+        return\
+            self.connections[
+                np.in1d(self.connections.pre_gid.values, gids)
+            ].assign(strength=1.)
+
+
+def _circuit_model(cells, path_cache):
+    """..."""
+    class _CircuitModel(SonataCircuitModel):
+        bluepysnap_circuit = type(
+            "Circuit", (), {
+                "nodes": _Container(All=_Nodes(cells)),
+                "edges": _Container(),
+                "config": {}})()
+
+    return _CircuitModel(path_config_file=__file__, path_cache=path_cache)
+
+
+def test_cells_do_not_depend_on_cache(tmpdir):
+    """
+    Cells, and the measurements of their pathways, should be the same
+    whether the circuit caches its cells or not.
+    """
+    random = np.random.RandomState(0)
+    cells =\
+        pd.DataFrame({
+            "mtype": random.choice(["L2_TPC", "L4_SS", "L5_TPC", "L6_BPC"], 50),
+            "x": random.uniform(0., 100., 50),
+            "y": random.uniform(0., 100., 50),
+            "z": random.uniform(0., 100., 50)})
+    connections =\
+        pd.DataFrame({
+            "pre_gid": random.randint(0, 50, 60),
+            "post_gid": random.randint(0, 50, 60)}
+        ).drop_duplicates()
+    adapter = _Adapter(connections, model_has_subregions=False)
+    pathway_measurement =\
+        PathwayMeasurement(
+            direction="EFF",
+            value={"number": lambda connections: 1.},
+            specifiers_cell_type=["mtype"],
+            sampling_methodology=terminology.sampling_methodology.exhaustive,
+            processing_methodology=terminology.processing_methodology.batch,
+            batch_size=10,
+            return_primary_info=True)
+
+    def _measured(circuit_model):
+        return pd.concat(list(
+            pathway_measurement.sample(circuit_model, adapter)))
+
+    expected_cells =\
+        adapter.get_cells(_circuit_model(cells, None), properties=["mtype"])
+    expected = _measured(_circuit_model(cells, None))
+    for _ in range(2):
+        circuit_model = _circuit_model(cells, str(tmpdir))
+        pd.testing.assert_frame_equal(
+            adapter.get_cells(circuit_model, properties=["mtype"]),
+            expected_cells)
+        pd.testing.assert_frame_equal(
+            adapter.get_cells(circuit_model, properties=["mtype"], mtype="L4_SS"),
+            expected_cells[expected_cells.mtype == "L4_SS"])
+        pd.testing.assert_frame_equal(
+            circuit_model.get_cell_properties(["mtype"]),
+            cells[["mtype"]])
+        pd.testing.assert_frame_equal(_measured(circuit_model), expected)
@@ -0,0 +1,185 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test indexing connections.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+import pandas as pd
+from bluepysnap.sonata_constants import Edge
+from ..model import SonataCircuitModel
+from ..model.edge_index import EdgeIndex
+from ..model.files import write_replacing
+
+
+def _edges(number_nodes=50, number_synapses=2000, seed=0):
+    """..."""
+    random = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "source": random.randint(0, number_nodes, number_synapses),
+        "target": random.randint(0, number_nodes - 5, number_synapses)})
+
+
+def _expected(edges, nodes, nodes_other=None):
+    """
+    Connections, with their synapse counts, counted by pandas.
+    """
+    connections =\
+        edges[edges.target.isin(nodes)]\
+        .groupby(["target", "source"]).size()\
+        .rename("count").reset_index()
+    if nodes_other is not None:
+        connections = connections[connections.source.isin(nodes_other)]
+    return connections
+
+
+def test_afferent_connections(tmpdir):
+    """
+    Connections gathered from an index built from chunks of synapses,
+    and saved as memory-mapped arrays, should be the same as those counted
+    from all the synapses.
+    """
+    edges = _edges()
+    size_chunk = 300
+    edge_index =\
+        EdgeIndex.from_edges(
+            ((edges.target.values[begin:begin + size_chunk],
+              edges.source.values[begin:begin + size_chunk])
+             for begin in range(0, edges.shape[0], size_chunk)),
+            number_nodes=50)
+    assert edge_index.offsets.shape[0] == 51
+    assert edge_index.counts.sum() == edges.shape[0]
+
+    edge_index.save(str(tmpdir))
+    assert EdgeIndex.exists(str(tmpdir))
+    loaded = EdgeIndex.load(str(tmpdir))
+    assert isinstance(loaded.neighbors, np.memmap)
+
+    nodes = np.array([3, 47, 0, 12, 3, 49, 1000])
+    nodes_other = np.arange(0, 50, 3)
+    for other in (None, nodes_other):
+        keys, neighbors, counts = loaded.get(nodes, other)
+        expected = _expected(edges, nodes, other)
+        np.testing.assert_array_equal(keys, expected.target.values)
+        np.testing.assert_array_equal(neighbors, expected.source.values)
+        np.testing.assert_array_equal(counts, expected["count"].values)
+
+
+def test_empty():
+    """
+    An index without edges should have no connections.
+    """
+    edge_index = EdgeIndex.from_edges([], number_nodes=3)
+    keys, neighbors, counts = edge_index.get([0, 1, 2])
+    assert keys.shape[0] == neighbors.shape[0] == counts.shape[0] == 0
+
+
+class _Population:
+    """..."""
+    def __init__(self, size):
+        self.size = size
+
+
+class _Edges:
+    """
+    Edges of a population, as read by BluePySNAP.
+    """
+    name = "default"
+
+    def __init__(self, edges, number_nodes=50):
+        self.edges =\
+            edges.rename(columns={
+                "source": Edge.SOURCE_NODE_ID,
+                "target": Edge.TARGET_NODE_ID})
+        self.source = _Population(number_nodes)
+        self.target = _Population(number_nodes)
+
+    @property
+    def size(self):
+        return self.edges.shape[0]
+
+    def get(self, edge_ids, properties):
+        return self.edges.iloc[edge_ids][properties]
+
+
+def test_index_without_cache(tmpdir):
+    """
+    A circuit model with `path_cache` set to `None` should index its
+    connections in memory, without saving them.
+    """
+    edges = _edges()
+
+    class _CircuitModel(SonataCircuitModel):
+        connectome = _Edges(edges)
+
+    circuit_model =\
+        _CircuitModel(
+            path_config_file=str(tmpdir.join("circuit_config.json")),
+            path_cache=None,
+            size_chunk_edges=300)
+    assert not circuit_model.caches_data
+
+    edge_index = circuit_model.get_edge_index("AFF")
+    assert not isinstance(edge_index.neighbors, np.memmap)
+    assert tmpdir.listdir() == []
+
+    nodes = np.array([3, 47, 0, 12])
+    keys, neighbors, counts = edge_index.get(nodes)
+    expected = _expected(edges, nodes)
+    np.testing.assert_array_equal(keys, expected.target.values)
+    np.testing.assert_array_equal(neighbors, expected.source.values)
+    np.testing.assert_array_equal(counts, expected["count"].values)
+
+
+def test_concurrent_saves(tmpdir):
+    """
+    Indexes saved concurrently to the same directory should not corrupt
+    each other, and leave no temporary files behind.
+    """
+    edges = _edges()
+    edge_index =\
+        EdgeIndex.from_edges(
+            [(edges.target.values, edges.source.values)], number_nodes=50)
+    path = str(tmpdir)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: edge_index.save(path), range(8)))
+    assert sorted(name.basename for name in tmpdir.listdir()) ==\
+        sorted("{}.npy".format(name) for name in EdgeIndex.files)
+    loaded = EdgeIndex.load(path)
+    for name in EdgeIndex.files:
+        np.testing.assert_array_equal(
+            getattr(loaded, name), getattr(edge_index, name))
+
+
+def test_failed_write_keeps_file(tmpdir):
+    """
+    A write that fails should neither replace the file, nor leave
+    a temporary file behind.
+    """
+    path = str(tmpdir.join("data.txt"))
+    write_replacing(path, lambda file_data: file_data.write("saved"), mode="w")
+
+    def _fail(file_data):
+        file_data.write("partial")
+        raise RuntimeError("Write failed.")
+
+    with pytest.raises(RuntimeError):
+        write_replacing(path, _fail, mode="w")
+    assert [name.basename for name in tmpdir.listdir()] == ["data.txt"]
+    with open(path) as file_data:
+        assert file_data.read() == "saved"
@@ -0,0 +1,191 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test loading, and indexing, several populations.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from bluepysnap.sonata_constants import Edge
+from ..model import SonataCircuitModel
+from ..adapter import SonataCircuitAdapter
+from ..model.populations import load_populations, PopulationIndex
+
+
+class _Nodes:
+    """
+    A node population, as read by BluePySNAP.
+    """
+    def __init__(self, name, size):
+        self.name = name
+        self.cells =\
+            pd.DataFrame({
+                "mtype": ["{}_{}".format(name, i % 3) for i in range(size)],
+                "x": np.arange(size, dtype=np.float64)})
+        self.threads = []
+
+    @property
+    def size(self):
+        self.threads.append(threading.current_thread())
+        return self.cells.shape[0]
+
+    @property
+    def property_names(self):
+        return set(self.cells.columns)
+
+    def get(self, properties):
+        return self.cells[properties]
+
+
+class _Edges:
+    """
+    An edge population between two node populations.
+    """
+    def __init__(self, source, target, size=30, seed=0):
+        random = np.random.RandomState(seed)
+        self.source = source
+        self.target = target
+        self.edges =\
+            pd.DataFrame({
+                Edge.SOURCE_NODE_ID: random.randint(0, source.size, size),
+                Edge.TARGET_NODE_ID: random.randint(0, target.size, size),
+                "delay": random.random_sample(size)})
+
+    @property
+    def size(self):
+        return self.edges.shape[0]
+
+    @property
+    def property_names(self):
+        return {"delay"}
+
+    def get(self, edge_ids, properties):
+        return self.edges.iloc[edge_ids][properties]
+
+
+class _Container(dict):
+    """
+    BluePySNAP `Nodes` or `Edges`.
+    """
+    @property
+    def population_names(self):
+        return sorted(self)
+
+
+def _circuit_model(nodes, edges):
+    """..."""
+    class _CircuitModel(SonataCircuitModel):
+        bluepysnap_circuit = type(
+            "Circuit", (), {"nodes": nodes, "edges": edges})()
+
+    return _CircuitModel(path_config_file=__file__, path_cache="")
+
+
+def _populations():
+    """..."""
+    nodes =\
+        _Container(
+            thalamus=_Nodes("thalamus", 7),
+            cortex=_Nodes("cortex", 10))
+    edges =\
+        _Container(
+            thalamocortical=_Edges(nodes["thalamus"], nodes["cortex"]))
+    return nodes, edges
+
+
+def test_population_index():
+    """
+    Global gids should map back to the population and id of each node.
+    """
+    nodes, _ = _populations()
+    for population in nodes.values():
+        del population.threads[:]
+    populations = load_populations(nodes, number_threads=2)
+    assert list(populations) == ["cortex", "thalamus"]
+    assert all(
+        threading.main_thread() not in population.threads
+        for population in populations.values())
+
+    index = PopulationIndex.from_populations(populations)
+    assert index.number_gids == 17
+    gids = index.to_global("thalamus", [0, 6])
+    assert list(gids) == [10, 16]
+    names, ids = index.to_local(np.array([0, 9, 10, 16]))
+    assert list(names) == ["cortex", "cortex", "thalamus", "thalamus"]
+    assert list(ids) == [0, 9, 0, 6]
+
+
+def test_cross_population_edges():
+    """
+    Edges between populations should refer to cells of all the populations
+    by their global gids.
+    """
+    nodes, edges = _populations()
+
+    circuit_model = _circuit_model(nodes, edges)
+    cells = circuit_model.get_cells_all_populations(["mtype"])
+    assert list(cells.index) == list(range(17))
+    assert list(cells.population.cat.categories) == ["cortex", "thalamus"]
+
+    synapses =\
+        pd.concat(circuit_model.iter_population_edges(
+            "thalamocortical", ["delay"], size_chunk=8))
+    expected = edges["thalamocortical"].edges
+    assert np.array_equal(
+        cells.mtype.loc[synapses.pre_gid].values,
+        nodes["thalamus"].cells.mtype.values[expected[Edge.SOURCE_NODE_ID]])
+    assert np.array_equal(
+        cells.mtype.loc[synapses.post_gid].values,
+        nodes["cortex"].cells.mtype.values[expected[Edge.TARGET_NODE_ID]])
+    assert circuit_model.connectome is edges["thalamocortical"]
+
+
+def test_gids_of_main_population():
+    """
+    Cells of the main population should keep their gids among the cells
+    of all the populations, even when its name does not come first.
+    """
+    nodes =\
+        _Container(
+            All=_Nodes("All", 10),
+            AUD=_Nodes("AUD", 7))
+    edges =\
+        _Container(
+            All=_Edges(nodes["All"], nodes["All"], seed=1),
+            AUD__All=_Edges(nodes["AUD"], nodes["All"], seed=2))
+    circuit_model = _circuit_model(nodes, edges)
+    adapter = SonataCircuitAdapter(model_has_subregions=False)
+    assert nodes.population_names == ["AUD", "All"]
+    assert circuit_model.population_index.names == ["All", "AUD"]
+
+    cells = adapter.get_cells_all_populations(circuit_model, ["mtype"])
+    assert list(cells.gid) == list(range(17))
+    assert np.array_equal(
+        cells.mtype.loc[:9].values,
+        circuit_model.cell_collection.get(properties=["mtype"]).mtype.values)
+    assert list(cells.population.loc[10:].unique()) == ["AUD"]
+
+    synapses =\
+        pd.concat(adapter.iter_population_synapses(
+            circuit_model, "AUD__All", ["delay"], size_chunk=8))
+    expected = edges["AUD__All"].edges
+    assert np.array_equal(
+        synapses.post_gid.values, expected[Edge.TARGET_NODE_ID].values)
+    assert np.array_equal(
+        cells.mtype.loc[synapses.pre_gid].values,
+        nodes["AUD"].cells.mtype.values[expected[Edge.SOURCE_NODE_ID]])
+    assert circuit_model.connectome is edges["All"]
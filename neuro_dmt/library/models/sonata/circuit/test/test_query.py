@@ -0,0 +1,102 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test querying cells.
+"""
+
+import numpy as np
+import pandas as pd
+from ..query import CellQueryEngine
+
+
+def _cells(number_cells=1000, seed=0):
+    """..."""
+    random = np.random.RandomState(seed)
+    return pd.DataFrame(
+        {"layer": random.randint(1, 7, number_cells),
+         "mtype": pd.Categorical(
+             random.choice(["L2_TPC", "L4_SS", "L5_TPC:A", "L6_BPC"],
+                           number_cells)),
+         "region": random.choice(["SSp-ll", "SSp-ul", "SSp-bfd"], number_cells),
+         "x": random.uniform(0., 1000., number_cells),
+         "y": random.uniform(0., 2000., number_cells)},
+        index=pd.Index(np.arange(number_cells), name="node_ids"))
+
+
+def _matching(cells, query):
+    """
+    Cells that match a query, as BluePySNAP finds them: floating point
+    properties in a closed range, and other properties among values.
+    """
+    mask = np.ones(cells.shape[0], dtype=bool)
+    for variable, value in query.items():
+        values = cells[variable]
+        if isinstance(value, tuple):
+            lower, upper = value
+            mask &= ((values >= lower) & (values <= upper)).values
+        else:
+            mask &= values.isin(np.atleast_1d(value)).values
+    return cells[mask]
+
+
+def test_queries_as_bluepysnap():
+    """
+    Cells found by the query engine should be the same as those that
+    BluePySNAP would find.
+    """
+    cells = _cells()
+    engine = CellQueryEngine.from_dataframe(cells, size_cache=2)
+    queries = [
+        {},
+        {"layer": 2},
+        {"layer": [2, 3], "mtype": "L2_TPC"},
+        {"mtype": ["L5_TPC:A", "L6_BPC"], "region": "SSp-ll",
+         "x": (100., 400.), "y": (500., 1500.)},
+        {"x": (100., 400.)},
+        {"mtype": "unknown"},
+        {"layer": [2, 3], "mtype": "L2_TPC"}]
+    for query in queries:
+        pd.testing.assert_frame_equal(
+            engine.get(query), _matching(cells, query))
+    assert len(engine.cache) == 2
+
+
+def test_queried_gids():
+    """
+    Cells found by the query engine should have the expected gids.
+    """
+    cells =\
+        pd.DataFrame(
+            {"layer": [1, 2, 2, 3, 2, 3],
+             "mtype": ["L1_DAC", "L2_TPC", "L2_IPC", "L3_TPC", "L2_TPC", "L3_TPC"],
+             "x": [0., 10., 20., 30., 40., 50.]},
+            index=pd.Index(np.arange(6), name="node_ids"))
+    engine = CellQueryEngine.from_dataframe(cells)
+    assert list(engine.get({"layer": 2}).index) == [1, 2, 4]
+    assert list(engine.get({"layer": [2, 3], "mtype": "L2_TPC"}).index) == [1, 4]
+    assert list(engine.get({"mtype": "L3_TPC", "x": (30., 45.)}).index) == [3]
+    assert list(engine.get({"x": (10., 20.)}).index) == [1, 2]
+    assert list(engine.get({"mtype": "unknown"}).index) == []
+
+
+def test_unresolvable_queries():
+    """
+    Queries that need BluePySNAP should be recognized.
+    """
+    engine = CellQueryEngine.from_dataframe(_cells())
+    assert engine.can_resolve({"layer": 2, "x": (0., 1.)})
+    assert not engine.can_resolve({"$target": "Mosaic"})
+    assert not engine.can_resolve({"mtype": {"$regex": "L2.*"}})
@@ -0,0 +1,101 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test reading synapse properties in chunks.
+"""
+
+import numpy as np
+import pandas as pd
+from bluepysnap.sonata_constants import Edge
+from ..model import SonataCircuitModel
+from ..adapter import SonataCircuitAdapter
+
+
+class _Edges:
+    """
+    Edges of a population, as read by BluePySNAP.
+    """
+    def __init__(self, number_nodes=40, number_synapses=1000, seed=0):
+        random = np.random.RandomState(seed)
+        self.edges =\
+            pd.DataFrame({
+                Edge.SOURCE_NODE_ID: random.randint(0, number_nodes, number_synapses),
+                Edge.TARGET_NODE_ID: random.randint(0, number_nodes, number_synapses),
+                "conductance": random.random_sample(number_synapses)})
+        self.sizes_read = []
+        self.numbers_nodes_resolved = []
+
+    @property
+    def size(self):
+        return self.edges.shape[0]
+
+    def afferent_edges(self, gids):
+        self.numbers_nodes_resolved.append(len(gids))
+        return np.flatnonzero(self.edges[Edge.TARGET_NODE_ID].isin(gids))
+
+    def efferent_edges(self, gids):
+        self.numbers_nodes_resolved.append(len(gids))
+        return np.flatnonzero(self.edges[Edge.SOURCE_NODE_ID].isin(gids))
+
+    def get(self, edge_ids, properties):
+        self.sizes_read.append(len(edge_ids))
+        return self.edges.iloc[edge_ids][properties]
+
+
+def _circuit_model(edges, **kwargs):
+    """..."""
+    class _CircuitModel(SonataCircuitModel):
+        connectome = edges
+    return _CircuitModel(path_config_file=__file__, path_cache="", **kwargs)
+
+
+def test_iter_synapse_properties():
+    """
+    Synapse properties should be read in chunks of bounded size,
+    and restricted to the requested synapses, resolving the synapses
+    of a few cells at a time.
+    """
+    edges = _Edges()
+    circuit_model = _circuit_model(edges, size_chunk_nodes=4)
+    adapter = SonataCircuitAdapter(model_has_subregions=False)
+    gids = np.arange(10, 20)
+    gids_other = np.arange(0, 30)
+
+    chunks =\
+        list(adapter.iter_synapse_properties(
+            circuit_model, ["conductance"],
+            cell_group=gids, direction="AFF",
+            cell_group_other=gids_other,
+            size_chunk=50))
+    assert max(edges.sizes_read) <= 50
+    assert edges.numbers_nodes_resolved == [4, 4, 2]
+    synapses = pd.concat(chunks)
+    assert list(synapses.columns) == ["pre_gid", "post_gid", "conductance"]
+
+    expected =\
+        edges.edges[
+            edges.edges[Edge.TARGET_NODE_ID].isin(gids)
+            & edges.edges[Edge.SOURCE_NODE_ID].isin(gids_other)]
+    synapses = synapses.sort_index()
+    assert np.array_equal(synapses.index.values, expected.index.values)
+    assert np.array_equal(
+        synapses.conductance.values, expected.conductance.values)
+
+    all_synapses =\
+        pd.concat(adapter.iter_synapse_properties(
+            circuit_model, ["conductance"], size_chunk=300))
+    assert all_synapses.shape[0] == edges.size
+    assert max(edges.sizes_read[-4:]) == 300
@@ -0,0 +1,61 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published by the 
+# Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along with
+# DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test layer thickness in columns.
+"""
+
+import numpy as np
+import pandas as pd
+from ..thickness import LayerThicknessGrid
+
+
+def test_thickness_in_columns():
+    """
+    Thickness of layers looked up in the grid should be the extent of
+    layers of cells in the same column, found by brute force.
+    """
+    random = np.random.RandomState(3)
+    number_cells = 5000
+    layers = random.randint(1, 7, number_cells)
+    positions = np.stack([
+        random.uniform(0., 500., number_cells),
+        (layers - 1) * 100. + random.uniform(0., 100., number_cells),
+        random.uniform(0., 400., number_cells)], axis=1)
+    column_size = np.array([100., 80.])
+    grid = LayerThicknessGrid(
+        positions=positions, layers=layers, column_size=column_size)
+
+    samples = positions[random.choice(number_cells, 10)]
+    thickness = grid.get_thickness_at(samples)
+    assert list(thickness.columns) == [1, 2, 3, 4, 5, 6]
+    for sample, (_, measured) in zip(samples, thickness.iterrows()):
+        lower =\
+            grid.origin\
+            + np.floor((sample[[0, 2]] - grid.origin) / column_size) * column_size
+        in_column = np.all(
+            (positions[:, [0, 2]] >= lower)
+            & (positions[:, [0, 2]] < lower + column_size),
+            axis=1)
+        expected =\
+            pd.DataFrame({"layer": layers[in_column],
+                          "y": positions[in_column, 1]})\
+              .groupby("layer").y.agg(lambda ys: ys.max() - ys.min())
+        np.testing.assert_allclose(
+            measured[expected.index].values, expected.values)
+
+    all_columns = grid.get_thickness(grid.columns_occupied)
+    assert all_columns.shape == (np.prod(grid.shape), 6)
+    assert grid.get_thickness_at(np.array([[-1.e3, 0., 0.]])).isna().all(axis=None)
@@ -0,0 +1,170 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+# for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Thickness of layers in columns of a circuit, with layers along the y-axis.
+"""
+
+import weakref
+import numpy as np
+import pandas as pd
+from dmt.tk.field import Field, lazyfield, WithFields
+from neuro_dmt import terminology
+
+X = terminology.bluebrain.cell.x
+Y = terminology.bluebrain.cell.y
+Z = terminology.bluebrain.cell.z
+XYZ = [X, Y, Z]
+LAYER = terminology.bluebrain.cell.layer
+
+#grids computed for a circuit model, by column size.
+_CACHE_CIRCUIT = weakref.WeakKeyDictionary()
+
+
+class LayerThicknessGrid(WithFields):
+    """
+    Cells binned into columns, on a 2D grid in the (x, z) plane,
+    with the extent along the y-axis of each layer in each column reduced
+    once, so that thickness of layers in any number of columns can be
+    looked up.
+    """
+    positions = Field(
+        """
+        `np.ndarray<float>` of shape (number cells, 3) with soma positions.
+        """)
+    layers = Field(
+        """
+        Layer of each cell.
+        """)
+    column_size = Field(
+        """
+        Widths of a column along the x-axis and the z-axis.
+        """)
+
+    @classmethod
+    def for_circuit(cls, circuit_model, adapter, column_size):
+        """
+        Grid of all the cells in a circuit, computed once for a circuit model.
+        """
+        cache = _CACHE_CIRCUIT.setdefault(circuit_model, {})
+        key = tuple(np.asarray(column_size, dtype=np.float64))
+        if key not in cache:
+            cells = adapter.get_cells(circuit_model, properties=XYZ + [LAYER])
+            cache[key] = cls(
+                positions=cells[XYZ].to_numpy(np.float64),
+                layers=cells[LAYER].to_numpy(),
+                column_size=np.asarray(column_size, dtype=np.float64))
+        return cache[key]
+
+    @lazyfield
+    def origin(self):
+        """
+        Lowest (x, z) of the grid.
+        """
+        if self.positions.shape[0] == 0:
+            return np.zeros(2)
+        return np.min(self.positions[:, [0, 2]], axis=0)
+
+    def _coordinates(self, positions):
+        """..."""
+        return np.floor(
+            (np.asarray(positions, dtype=np.float64)[:, [0, 2]] - self.origin)
+            / self.column_size
+        ).astype(np.int64)
+
+    @lazyfield
+    def shape(self):
+        """
+        Number of columns along the x-axis and the z-axis.
+        """
+        if self.positions.shape[0] == 0:
+            return np.ones(2, dtype=np.int64)
+        return 1 + np.max(self._coordinates(self.positions), axis=0)
+
+    def get_columns(self, positions):
+        """
+        Flat index of the column containing each position, -1 for positions
+        outside the grid.
+        """
+        coordinates = self._coordinates(positions)
+        inside = np.all((coordinates >= 0) & (coordinates < self.shape), axis=1)
+        columns = np.full(coordinates.shape[0], -1, dtype=np.int64)
+        columns[inside] = np.ravel_multi_index(coordinates[inside].T, self.shape)
+        return columns
+
+    @lazyfield
+    def layer_values(self):
+        """
+        Sorted values of layers.
+        """
+        return pd.factorize(self.layers, sort=True)[1]
+
+    @lazyfield
+    def extents(self):
+        """
+        Minimum and maximum y of cells in each (column, layer),
+        as arrays of shape (number of columns, number of layers),
+        NaN where a column has no cells of a layer.
+        """
+        codes_layer = pd.factorize(self.layers, sort=True)[0]
+        number_layers = len(self.layer_values)
+        number_columns = int(np.prod(self.shape))
+        keys =\
+            self.get_columns(self.positions) * number_layers + codes_layer
+        order = np.argsort(keys, kind="stable")
+        keys_sorted = keys[order]
+        ys = self.positions[order, 1]
+        groups, begins = np.unique(keys_sorted, return_index=True)
+        y_min = np.full(number_columns * number_layers, np.nan)
+        y_max = np.full(number_columns * number_layers, np.nan)
+        if groups.shape[0] > 0:
+            y_min[groups] = np.minimum.reduceat(ys, begins)
+            y_max[groups] = np.maximum.reduceat(ys, begins)
+        return (
+            y_min.reshape(number_columns, number_layers),
+            y_max.reshape(number_columns, number_layers))
+
+    @lazyfield
+    def columns_occupied(self):
+        """
+        Flat indices of the columns that contain cells.
+        """
+        return np.unique(self.get_columns(self.positions))
+
+    def get_thickness(self, columns):
+        """
+        Apparent thickness of each layer in each of the columns.
+
+        Returns
+        -----------
+        `pandas.DataFrame` with a row for each column, and a column for
+        each layer.
+        """
+        columns = np.asarray(columns, dtype=np.int64)
+        y_min, y_max = self.extents
+        thickness = np.full((columns.shape[0], len(self.layer_values)), np.nan)
+        inside = columns >= 0
+        thickness[inside] = y_max[columns[inside]] - y_min[columns[inside]]
+        return pd.DataFrame(
+            thickness,
+            columns=pd.Index(self.layer_values, name=LAYER))
+
+    def get_thickness_at(self, positions):
+        """
+        Apparent thickness of each layer in the columns containing positions.
+        """
+        return self.get_thickness(self.get_columns(positions))
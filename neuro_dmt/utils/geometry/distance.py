@@ -0,0 +1,127 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published 
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT 
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License 
+# for more details.
+
+# You should have received a copy of the GNU Lesser General Public License 
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Bin distances between points, such as the somas of pairs of cells.
+"""
+
+import numpy as np
+
+
+def _block(values, begin, end, indices, out):
+    """
+    Rows `begin:end` of `values`, or of `values[indices]` gathered into `out`.
+    A single row is shared by all the blocks.
+    """
+    if values.ndim == 1:
+        return values
+    if indices is not None:
+        return np.take(values, indices[begin:end], axis=0, out=out)
+    return values[begin:end]
+
+
+def bin_distances(distances, bin_size, out=None):
+    """
+    Index of the bin of each of the `distances`, for bins of `bin_size`
+    starting at 0.
+    """
+    bins = np.floor(np.asarray(distances) / bin_size)
+    if out is None:
+        return bins.astype(np.int64)
+    out[:] = bins
+    return out
+
+
+def get_bin_mids(bins, bin_size):
+    """
+    Mid-points of distance bins with indices `bins`.
+    """
+    return bin_size * np.asarray(bins, dtype=np.float64) + bin_size / 2.
+
+
+def bin_soma_distances(
+        positions_from,
+        positions_to,
+        bin_size,
+        indices_from=None,
+        indices_to=None,
+        dtype=np.float64,
+        size_block=2 ** 12,
+        out=None):
+    """
+    Index of the soma-distance bin of cell pairs, computed for blocks of
+    pairs small enough to stay in the processor's cache, and written
+    directly to an integer array.
+
+    Arguments
+    --------------
+    positions_from :: np.ndarray of shape (number pairs, 3), or a single
+    ~                 position of shape (3,) shared by all the pairs.
+    positions_to :: like `positions_from`
+    bin_size :: size of soma-distance bins
+    indices_from :: rows of `positions_from` for each of the pairs,
+    ~               gathered one block at a time, if provided.
+    indices_to :: like `indices_from`, for `positions_to`
+    dtype :: floating point type to compute distances in. `np.float32`
+    ~        halves the memory traffic, but distances within a few ulps of a
+    ~        bin boundary may be binned differently than with `np.float64`.
+    size_block :: number of pairs to compute the distances of at a time.
+    out :: `np.ndarray<int>` to write bin indices into.
+
+    Returns
+    --------------
+    `np.ndarray<int64>`, (or `out`), with a bin index for each pair.
+    """
+    positions_from = np.asarray(positions_from)
+    positions_to = np.asarray(positions_to)
+
+    def _number(positions, indices):
+        if indices is not None:
+            return indices.shape[0]
+        return positions.shape[0] if positions.ndim == 2 else 1
+
+    number_pairs =\
+        max(_number(positions_from, indices_from),
+            _number(positions_to, indices_to))
+    if out is None:
+        out = np.empty(number_pairs, dtype=np.int64)
+
+    size_buffer = min(size_block, number_pairs)
+    gathered_from = np.empty((size_buffer, 3), dtype=positions_from.dtype)
+    gathered_to = np.empty((size_buffer, 3), dtype=positions_to.dtype)
+    delta = np.empty((size_buffer, 3), dtype=dtype)
+    distance = np.empty(size_buffer, dtype=dtype)
+    for begin in range(0, number_pairs, size_block):
+        end = min(begin + size_block, number_pairs)
+        delta_block = delta[:end - begin]
+        distance_block = distance[:end - begin]
+        np.subtract(
+            _block(
+                positions_to, begin, end,
+                indices_to, gathered_to[:end - begin]),
+            _block(
+                positions_from, begin, end,
+                indices_from, gathered_from[:end - begin]),
+            out=delta_block,
+            casting="same_kind")
+        np.multiply(delta_block, delta_block, out=delta_block)
+        np.add(delta_block[:, 0], delta_block[:, 1], out=distance_block)
+        np.add(distance_block, delta_block[:, 2], out=distance_block)
+        np.sqrt(distance_block, out=distance_block)
+        np.divide(distance_block, bin_size, out=distance_block)
+        np.floor(distance_block, out=distance_block)
+        out[begin:end] = distance_block
+    return out
@@ -0,0 +1,65 @@
+# Copyright (C) 2020 Blue Brain Project / EPFL
+
+# This file is part of BlueBrain DMT <https://github.com/BlueBrain/DMT>
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published 
+# by the Free Software Foundation.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT 
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License 
+# for more details.
+
+# You should have received a copy of the GNU Lesser General Public License 
+# along with DMT source-code.  If not, see <https://www.gnu.org/licenses/>. 
+
+"""
+Test binning distances.
+"""
+import numpy as np
+from ..distance import bin_soma_distances, get_bin_mids
+
+
+def test_bin_soma_distances():
+    """
+    Blocked binning of soma-distances should bin as the distances computed
+    for all the pairs at once.
+    """
+    random = np.random.RandomState(0)
+    positions_from = 1000. * random.random_sample((1001, 3))
+    positions_to = 1000. * random.random_sample((1001, 3))
+    expected =\
+        np.floor(
+            np.linalg.norm(positions_to - positions_from, axis=1) / 50.
+        ).astype(np.int64)
+    assert np.array_equal(
+        bin_soma_distances(positions_from, positions_to, 50., size_block=64),
+        expected)
+
+    bins_float32 =\
+        bin_soma_distances(
+            positions_from, positions_to, 50., dtype=np.float32)
+    assert np.all(np.abs(bins_float32 - expected) <= 1)
+    assert np.mean(bins_float32 == expected) > 0.99
+
+    assert np.array_equal(
+        bin_soma_distances(positions_from[0], positions_to, 50.),
+        np.floor(
+            np.linalg.norm(positions_to - positions_from[0], axis=1) / 50.
+        ).astype(np.int64))
+
+    indices = random.randint(0, 1001, size=5000)
+    assert np.array_equal(
+        bin_soma_distances(
+            positions_from, positions_to, 50.,
+            indices_from=indices, indices_to=indices[::-1],
+            size_block=128),
+        bin_soma_distances(
+            positions_from[indices], positions_to[indices[::-1]], 50.))
+
+    assert np.array_equal(
+        get_bin_mids(expected, 50.),
+        50. * np.floor(
+            np.linalg.norm(positions_to - positions_from, axis=1) / 50.)
+        + 25.)